@@ -1,6 +1,12 @@
 """Hong Kong transportation MCP Server package."""
 
 __version__ = "0.1.0"
-from .server import server
+
+# Installed before anything else is imported, so the profile covers the whole startup
+from .startup_profile import startup_profile
+
+startup_profile.install()
+
+from .server import server  # pylint: disable=wrong-import-position
 
 __all__ = ["server"]
@@ -7,6 +7,7 @@ from the server module to initialize and start the MCP server.
 
 from hkopenai_common.cli_utils import cli_main
 from .server import server
+from .workers import WORKERS, WorkerPool
 
 if __name__ == "__main__":
-    cli_main(server, "HK Transportation MCP Server")
+    cli_main(WorkerPool if WORKERS > 1 else server, "HK Transportation MCP Server")
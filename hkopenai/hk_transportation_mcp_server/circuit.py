@@ -0,0 +1,72 @@
+"""
+Per-host circuit breaking for upstream requests.
+
+After failure_threshold consecutive failures a breaker opens and rejects requests
+immediately with CircuitOpenError. Once reset_timeout seconds have passed it lets a
+single probe request through: success closes the breaker, failure opens it again.
+"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose breaker is open."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(
+            f"Upstream {host} is unavailable after repeated failures; "
+            f"retrying in {max(retry_after, 0):.0f}s"
+        )
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream host."""
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless a request may be sent now."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            retry_after = self._opened_at + self.reset_timeout - now
+            if retry_after <= 0:
+                # This caller becomes the recovery probe; should it never report back,
+                # another probe is let through after a further reset_timeout
+                self.state = HALF_OPEN
+                self._opened_at = now
+                return
+            raise CircuitOpenError(self.host, retry_after)
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the breaker at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                self.failure_threshold > 0 and self.failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
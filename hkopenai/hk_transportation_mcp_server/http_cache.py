@@ -0,0 +1,780 @@
+"""
+Shared HTTP fetch layer with a conditional-GET cache for upstream data sources.
+
+All tool modules fetch their upstream payloads through this module. Responses are kept
+in a per-URL cache that is served directly while fresh, revalidated with ETag /
+If-Modified-Since once the TTL expires, and evicted least-recently-used first when the
+cache grows beyond its byte cap. Within the stale window an expired entry is served
+immediately while it is revalidated in the background, and a per-host circuit breaker
+fails requests fast while an upstream keeps failing.
+
+Synchronous callers go through a pooled requests session. Asynchronous callers share one
+keep-alive httpx client per event loop, HTTP/2-capable when h2 is installed, with a
+per-host cap on concurrent connections and a per-host request rate limit. Concurrent
+misses for the same URL are coalesced into a single upstream request whose decoded
+result every caller shares.
+
+Payloads of URLs registered with persist() are snapshotted to disk once snapshots are
+enabled, so a restarted process can load them at startup and revalidate them in the
+background instead of starting cold. Worker processes of the multi-worker mode follow
+the snapshots written by the refreshing process instead of fetching those URLs.
+
+Every upstream request is counted in the metrics by host and status, and the time a tool
+call waits for the upstream or decodes a body is recorded as its fetch and parse phases.
+"""
+
+import asyncio
+import csv
+import importlib.util
+import io
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+
+from .circuit import CircuitBreaker, CircuitOpenError
+from .metrics import phase, record_upstream
+from .ratelimit import RateLimiter
+from .singleflight import SingleFlight
+from .snapshot import SnapshotStore
+from .storage import SHARED_READER, data_dir
+
+DEFAULT_TTL = float(os.environ.get("HK_TRANSPORT_CACHE_TTL", "300"))
+DEFAULT_MAX_BYTES = int(os.environ.get("HK_TRANSPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MAX_CONNECTIONS = int(os.environ.get("HK_TRANSPORT_MAX_CONNECTIONS", "100"))
+MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HK_TRANSPORT_MAX_CONNECTIONS_PER_HOST", "10"))
+# Requests per second sent to a single upstream host, sync and async callers together;
+# 0 disables the limit
+HOST_RATE_LIMIT = float(os.environ.get("HK_TRANSPORT_HOST_RATE_LIMIT", "20"))
+# Seconds past its TTL that an entry may still be served while it is revalidated
+STALE_WINDOW = float(os.environ.get("HK_TRANSPORT_STALE_WINDOW", "300"))
+# Longer window that callers pass as max_stale for reference data that changes rarely,
+# such as the bus route list and network; real-time feeds keep the short default
+REFERENCE_STALE_WINDOW = float(os.environ.get("HK_TRANSPORT_REFERENCE_STALE_WINDOW", "86400"))
+# Consecutive failures that open a host's circuit, and seconds before it is probed again
+BREAKER_THRESHOLD = int(os.environ.get("HK_TRANSPORT_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.environ.get("HK_TRANSPORT_BREAKER_RESET", "30"))
+# HTTP/2 is negotiated only when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Exceptions raised by fetch() and afetch() when the upstream request fails
+FETCH_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError, CircuitOpenError)
+
+
+class CacheEntry:
+    """A cached upstream response together with its validators and decoded forms."""
+
+    __slots__ = ("url", "content", "etag", "last_modified", "fetched_at", "decoded", "lock")
+
+    def __init__(
+        self,
+        url: str,
+        content: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        fetched_at: float,
+    ):
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        # Decoded payloads keyed by decoder name, dropped whenever the body changes
+        self.decoded: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Number of bytes held by the cached body."""
+        return len(self.content)
+
+
+class _LoopClient:
+    """The pooled async client and per-host connection limits of one event loop."""
+
+    __slots__ = ("client", "host_limits")
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            ),
+        )
+        self.host_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+class HttpCache:
+    """
+    Per-URL HTTP cache with TTL freshness, conditional revalidation and LRU eviction.
+
+    Decoded payloads are cached alongside the raw body, so callers receive the same
+    object until the upstream body changes. Callers must treat returned data as read-only.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        stale_window: float = STALE_WINDOW,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stale_window = stale_window
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_CONNECTIONS_PER_HOST)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClient]"
+        self._loop_clients = weakref.WeakKeyDictionary()
+        self._sync_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_rates: Dict[str, RateLimiter] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._refreshing: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._closers: Set[asyncio.Task] = set()
+        self._flight = SingleFlight()
+        self._snapshots: Optional[SnapshotStore] = None
+        self._persisted: Set[str] = set()
+        self._following = False
+        # Identity of the snapshot each followed entry was loaded from
+        self._followed: Dict[str, Tuple[int, int, int]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        self._stale = 0
+        self._short_circuited = 0
+
+    def fetch(
+        self,
+        url: str,
+        timeout: Optional[float] = None,
+        ttl: Optional[float] = None,
+        max_stale: Optional[float] = None,
+    ) -> CacheEntry:
+        """
+        Return the cache entry for url, downloading or revalidating it when stale.
+
+        An expired entry at most max_stale seconds (default stale_window) past a positive
+        TTL is returned at once and revalidated in a background thread. Pass max_stale=0
+        to wait for the upstream instead.
+
+        Raises requests.exceptions.RequestException if the upstream request fails, or
+        CircuitOpenError if the host is failing fast.
+        """
+        entry, fresh = self._lookup(url, ttl)
+        if fresh:
+            return entry
+        followed = self._load_followed(url, entry)
+        if followed is not None:
+            return followed
+        if self._serve_stale(entry, ttl, max_stale):
+            self._refresh_in_thread(url, entry, timeout)
+            return entry
+        with phase("fetch", url=url):
+            return self._flight.do(url, lambda: self._download(url, entry, timeout))
+
+    def _download(
+        self, url: str, entry: Optional[CacheEntry], timeout: Optional[float]
+    ) -> CacheEntry:
+        breaker = self._circuit(url)
+        self._host_rate_limiter(url).acquire()
+        try:
+            with self._host_slots(url):
+                started = time.perf_counter()
+                response = self._session.get(
+                    url, headers=self._conditional_headers(entry), timeout=timeout
+                )
+        except requests.exceptions.RequestException:
+            record_upstream(url, "error", time.perf_counter() - started)
+            breaker.record_failure()
+            raise
+        record_upstream(
+            url, str(response.status_code), time.perf_counter() - started, len(response.content)
+        )
+        self._record_status(breaker, response.status_code)
+        if entry is not None and response.status_code == 304:
+            return self._revalidate(url, entry)
+        response.raise_for_status()
+        return self._update(url, entry, response.content, response.headers)
+
+    async def afetch(
+        self,
+        url: str,
+        timeout: Optional[float] = None,
+        ttl: Optional[float] = None,
+        max_stale: Optional[float] = None,
+    ) -> CacheEntry:
+        """
+        Asynchronous fetch() over the shared pooled httpx client.
+
+        Stale entries are revalidated in a background task. Raises httpx.HTTPError if the
+        upstream request fails, or CircuitOpenError if the host is failing fast.
+        """
+        entry, fresh = self._lookup(url, ttl)
+        if fresh:
+            return entry
+        followed = self._load_followed(url, entry)
+        if followed is not None:
+            return followed
+        if self._serve_stale(entry, ttl, max_stale):
+            self._refresh_in_task(url, entry, timeout)
+            return entry
+        with phase("fetch", url=url):
+            return await self._flight.ado(url, lambda: self._adownload(url, entry, timeout))
+
+    async def _adownload(
+        self, url: str, entry: Optional[CacheEntry], timeout: Optional[float]
+    ) -> CacheEntry:
+        client = self._get_async_client()
+        breaker = self._circuit(url)
+        await self._host_rate_limiter(url).aacquire()
+        try:
+            async with self._host_semaphore(url):
+                started = time.perf_counter()
+                response = await client.get(
+                    url, headers=self._conditional_headers(entry), timeout=timeout
+                )
+        except httpx.HTTPError:
+            record_upstream(url, "error", time.perf_counter() - started)
+            breaker.record_failure()
+            raise
+        record_upstream(
+            url, str(response.status_code), time.perf_counter() - started, len(response.content)
+        )
+        self._record_status(breaker, response.status_code)
+        if entry is not None and response.status_code == 304:
+            return self._revalidate(url, entry)
+        response.raise_for_status()
+        return self._update(url, entry, response.content, response.headers)
+
+    def _lookup(self, url: str, ttl: Optional[float]) -> Tuple[Optional[CacheEntry], bool]:
+        """Return the cached entry for url and whether it is still fresh."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and time.monotonic() - entry.fetched_at < ttl:
+                self._entries.move_to_end(url)
+                self._hits += 1
+                return entry, True
+        return entry, False
+
+    def _serve_stale(
+        self, entry: Optional[CacheEntry], ttl: Optional[float], max_stale: Optional[float]
+    ) -> bool:
+        """Whether an expired entry may be served while it is revalidated."""
+        ttl = self.ttl if ttl is None else ttl
+        max_stale = self.stale_window if max_stale is None else max_stale
+        # A zero TTL asks for revalidation on every call, so never serve stale for it
+        if entry is None or ttl <= 0 or max_stale <= 0:
+            return False
+        if time.monotonic() - entry.fetched_at > ttl + max_stale:
+            return False
+        with self._lock:
+            self._stale += 1
+        return True
+
+    def _claim_refresh(self, url: str) -> bool:
+        """Mark url as being refreshed, returning False if a refresh is already running."""
+        with self._lock:
+            if url in self._refreshing:
+                return False
+            self._refreshing.add(url)
+            return True
+
+    def _release_refresh(self, url: str) -> None:
+        with self._lock:
+            self._refreshing.discard(url)
+
+    def _refresh_in_thread(
+        self, url: str, entry: CacheEntry, timeout: Optional[float]
+    ) -> None:
+        if not self._claim_refresh(url):
+            return
+
+        def refresh():
+            try:
+                self._flight.do(url, lambda: self._download(url, entry, timeout))
+            except FETCH_ERRORS:
+                pass  # The breaker has counted the failure; the stale entry stays cached
+            finally:
+                self._release_refresh(url)
+
+        threading.Thread(target=refresh, name="http-cache-refresh", daemon=True).start()
+
+    def _refresh_in_task(
+        self, url: str, entry: CacheEntry, timeout: Optional[float]
+    ) -> None:
+        if not self._claim_refresh(url):
+            return
+
+        async def refresh():
+            try:
+                await self._flight.ado(url, lambda: self._adownload(url, entry, timeout))
+            except FETCH_ERRORS:
+                pass  # The breaker has counted the failure; the stale entry stays cached
+            finally:
+                self._release_refresh(url)
+
+        # Keep a reference so the task is not garbage collected before it finishes
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _circuit(self, url: str) -> CircuitBreaker:
+        """Return the breaker of the host of url, raising CircuitOpenError if it is open."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(
+                    host, BREAKER_THRESHOLD, BREAKER_RESET
+                )
+        try:
+            breaker.check()
+        except CircuitOpenError:
+            with self._lock:
+                self._short_circuited += 1
+            raise
+        return breaker
+
+    @staticmethod
+    def _record_status(breaker: CircuitBreaker, status_code: int) -> None:
+        """Count server errors as failures; any other response shows the host is up."""
+        if status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def stale_age(self, url: str, ttl: Optional[float] = None) -> Optional[float]:
+        """Seconds since the cached payload of url was fetched, if it is past its TTL."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry.fetched_at
+        return age if age >= ttl > 0 else None
+
+    @staticmethod
+    def _conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def _revalidate(self, url: str, entry: CacheEntry) -> CacheEntry:
+        with self._lock:
+            entry.fetched_at = time.monotonic()
+            self._revalidated += 1
+            if url in self._entries:
+                self._entries.move_to_end(url)
+        self._touch_snapshot(url)
+        return entry
+
+    def _update(
+        self, url: str, entry: Optional[CacheEntry], content: bytes, headers
+    ) -> CacheEntry:
+        new_entry = CacheEntry(
+            url,
+            content,
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+            time.monotonic(),
+        )
+        # An unchanged body keeps its decoded payloads so callers can detect "no change"
+        if entry is not None and entry.content == new_entry.content:
+            new_entry.content = entry.content
+            new_entry.decoded = entry.decoded
+            self._touch_snapshot(url)
+        with self._lock:
+            self._misses += 1
+            self._store(new_entry)
+        return new_entry
+
+    def _loop_client(self) -> _LoopClient:
+        """
+        Return the client of the running event loop, creating it on first use.
+
+        The client is closed when the loop cancels its remaining tasks on shutdown, as
+        asyncio.run does, so its connections do not outlive the loop.
+        """
+        loop = asyncio.get_running_loop()
+        loop_client = self._loop_clients.get(loop)
+        if loop_client is None:
+            loop_client = self._loop_clients[loop] = _LoopClient()
+            task = loop.create_task(self._close_on_shutdown(loop, loop_client))
+            self._closers.add(task)
+            task.add_done_callback(self._closers.discard)
+        return loop_client
+
+    async def _close_on_shutdown(
+        self, loop: asyncio.AbstractEventLoop, loop_client: _LoopClient
+    ) -> None:
+        try:
+            await loop.create_future()
+        finally:
+            if self._loop_clients.get(loop) is loop_client:
+                del self._loop_clients[loop]
+            await loop_client.client.aclose()
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the pooled client for the running event loop."""
+        return self._loop_client().client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        host_limits = self._loop_client().host_limits
+        semaphore = host_limits.get(host)
+        if semaphore is None:
+            semaphore = host_limits[host] = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+        return semaphore
+
+    def _host_slots(self, url: str) -> threading.BoundedSemaphore:
+        """Return the semaphore capping concurrent sync requests to the host of url."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            slots = self._sync_host_limits.get(host)
+            if slots is None:
+                slots = self._sync_host_limits[host] = threading.BoundedSemaphore(
+                    MAX_CONNECTIONS_PER_HOST
+                )
+        return slots
+
+    def _host_rate_limiter(self, url: str) -> RateLimiter:
+        """Return the request rate limiter of the host of url, shared by sync and async."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._host_rates.get(host)
+            if limiter is None:
+                limiter = self._host_rates[host] = RateLimiter(HOST_RATE_LIMIT)
+        return limiter
+
+    async def aclose(self) -> None:
+        """Close the pooled async client of the running event loop, if one was created."""
+        loop_client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if loop_client is not None:
+            await loop_client.client.aclose()
+
+    def decode(self, entry: CacheEntry, name: str, decoder) -> Any:
+        """Return decoder(entry.content), computing it once per cached body."""
+        try:
+            return entry.decoded[name]
+        except KeyError:
+            pass
+        # Concurrent callers of a fresh body wait for one decode instead of repeating it
+        with entry.lock:
+            if name in entry.decoded:
+                return entry.decoded[name]
+            with phase("parse", url=entry.url, decoder=name):
+                entry.decoded[name] = decoded = decoder(entry.content)
+            self._save_snapshot(entry)
+            return decoded
+
+    def enable_snapshots(self, path: str) -> None:
+        """Snapshot the payloads of persisted URLs to the directory at path."""
+        self._snapshots = SnapshotStore(path)
+
+    def follow_snapshots(self, path: str) -> None:
+        """
+        Serve persisted URLs from the snapshots another process keeps in the directory.
+
+        Such URLs are only fetched from the upstream while there is no snapshot of them.
+        """
+        self._snapshots = SnapshotStore(path)
+        self._following = True
+
+    def persist(self, url: str) -> None:
+        """Keep a snapshot of the payload of url once snapshots are enabled."""
+        self._persisted.add(url)
+
+    def _load_followed(self, url: str, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        """
+        Return the entry of a followed URL as its latest snapshot holds it, or None.
+
+        The snapshot is loaded again only once it was replaced. Otherwise the entry takes
+        the time the refreshing process last confirmed it, so it is as fresh as theirs.
+        """
+        if not self._following or url not in self._persisted:
+            return None
+        state = self._snapshots.state(url)
+        if state is None:
+            return None
+        version, confirmed = state
+        if entry is None or self._followed.get(url) != version:
+            record = self._snapshots.load(url)
+            if record is None:
+                return None
+            entry = CacheEntry(
+                url, record["content"], record["etag"], record["last_modified"], 0.0
+            )
+            entry.decoded = record["decoded"]
+            with self._lock:
+                self._followed[url] = version
+                self._misses += 1
+                self._store(entry)
+        else:
+            with self._lock:
+                self._revalidated += 1
+        entry.fetched_at = time.monotonic() - max(0.0, time.time() - confirmed)
+        return entry
+
+    def _touch_snapshot(self, url: str) -> None:
+        """Record that the upstream confirmed the snapshotted payload of url just now."""
+        if self._snapshots is None or self._following or url not in self._persisted:
+            return
+        try:
+            self._snapshots.touch(url)
+        except OSError:
+            pass
+
+    def _save_snapshot(self, entry: CacheEntry) -> None:
+        """Snapshot a newly decoded payload of a persisted URL; failures only cost warmth."""
+        if self._snapshots is None or self._following or entry.url not in self._persisted:
+            return
+        try:
+            self._snapshots.save(
+                entry.url,
+                entry.content,
+                entry.etag,
+                entry.last_modified,
+                time.time() - (time.monotonic() - entry.fetched_at),
+                dict(entry.decoded),
+            )
+        except (OSError, ValueError):
+            pass
+
+    def load_snapshot(self, url: str) -> Optional[CacheEntry]:
+        """
+        Return the cached entry of a persisted URL, loading its snapshot if not cached.
+
+        A loaded entry keeps the age it had when it was fetched, so it is revalidated
+        as soon as its TTL has passed. A followed snapshot is as old as the refreshing
+        process last confirmed it.
+        """
+        if self._snapshots is None or url not in self._persisted:
+            return None
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None or self._following:
+            return entry or self._load_followed(url, None)
+        record = self._snapshots.load(url)
+        if record is None:
+            return None
+        age = max(0.0, time.time() - record["fetched_at"])
+        entry = CacheEntry(
+            url,
+            record["content"],
+            record["etag"],
+            record["last_modified"],
+            time.monotonic() - age,
+        )
+        entry.decoded = record["decoded"]
+        with self._lock:
+            if url in self._entries:
+                return self._entries[url]
+            self._store(entry)
+        return entry
+
+    def revalidate_in_background(
+        self, url: str, timeout: Optional[float] = None, ttl: Optional[float] = None
+    ) -> bool:
+        """
+        Start revalidating the cached entry of url if it is past its TTL.
+
+        A followed URL is only checked against its snapshot, in the calling thread.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None or time.monotonic() - entry.fetched_at < ttl:
+            return False
+        if self._load_followed(url, entry) is not None:
+            return False
+        self._refresh_in_thread(url, entry, timeout)
+        return True
+
+    def _store(self, entry: CacheEntry) -> None:
+        old = self._entries.pop(entry.url, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[entry.url] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def clear(self) -> None:
+        """Drop every cached entry, reset the counters and close every circuit."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._revalidated = 0
+            self._stale = self._short_circuited = 0
+            self._breakers.clear()
+            self._followed.clear()
+            self._flight.coalesced = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current cache occupancy."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "revalidated": self._revalidated,
+                "coalesced": self._flight.coalesced,
+                "stale": self._stale,
+                "short_circuited": self._short_circuited,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+http_cache = HttpCache()
+if SHARED_READER and data_dir("snapshots"):
+    http_cache.follow_snapshots(data_dir("snapshots"))
+
+
+def describe_request_error(url: str, err: Exception) -> str:
+    """Format a requests or httpx exception as a user-facing error message."""
+    if isinstance(err, CircuitOpenError):
+        return f"Skipped the request to {url}: {err}"
+    if isinstance(err, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
+        return f"HTTP error occurred while fetching {url}: {err}"
+    if isinstance(err, (requests.exceptions.Timeout, httpx.TimeoutException)):
+        return f"The request timed out while fetching {url}: {err}"
+    if isinstance(err, (requests.exceptions.ConnectionError, httpx.TransportError)):
+        return f"Connection error occurred while fetching {url}: {err}"
+    return f"An unexpected error occurred during the request to {url}: {err}"
+
+
+def _decode_json(content: bytes) -> Any:
+    return json.loads(content.decode("utf-8").lstrip("\ufeff"))
+
+
+def _csv_decoder(encoding: str):
+    def decode(content: bytes) -> List[Dict[str, str]]:
+        reader = csv.reader(io.StringIO(content.decode(encoding)))
+        header = [h.lstrip("\ufeff") for h in next(reader, [])]
+        rows = []
+        for values in reader:
+            # Blank lines, such as a trailing one, are skipped as csv.DictReader does
+            if not values:
+                continue
+            if len(values) != len(header):
+                raise csv.Error(f"expected {len(header)} fields, got {len(values)}")
+            rows.append(dict(zip(header, values)))
+        return rows
+
+    return decode
+
+
+def mark_stale(response: Dict, url: str, ttl: Optional[float] = None) -> Dict:
+    """
+    Flag a tool response built from a cached payload of url that is past its TTL.
+
+    Successful responses gain "stale": true and the payload age in "data_age_seconds";
+    error responses are returned unchanged.
+    """
+    if response.get("type") != "Error":
+        age = http_cache.stale_age(url, ttl)
+        if age is not None:
+            response["stale"] = True
+            response["data_age_seconds"] = round(age)
+    return response
+
+
+def warm_json_data(
+    url: str, timeout: Optional[float] = None, ttl: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Load the snapshot of a persisted JSON URL into the cache at startup.
+
+    Returns the decoded JSON, or None if there is no usable snapshot. A snapshot past
+    its TTL is revalidated in a background thread; nothing waits for the upstream.
+    """
+    entry = http_cache.load_snapshot(url)
+    if entry is None:
+        return None
+    try:
+        data = http_cache.decode(entry, "json", _decode_json)
+    except (UnicodeDecodeError, ValueError):
+        return None
+    http_cache.revalidate_in_background(url, timeout=timeout, ttl=ttl)
+    return data
+
+
+def fetch_json_data(
+    url: str,
+    timeout: Optional[float] = None,
+    ttl: Optional[float] = None,
+    max_stale: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch and decode a JSON document through the shared cache.
+
+    Returns the decoded JSON, or a dictionary with an 'error' key if an error occurs.
+    """
+    try:
+        entry = http_cache.fetch(url, timeout=timeout, ttl=ttl, max_stale=max_stale)
+        return http_cache.decode(entry, "json", _decode_json)
+    except FETCH_ERRORS as err:
+        return {"error": describe_request_error(url, err)}
+    except (UnicodeDecodeError, ValueError) as err:
+        return {"error": f"Invalid JSON response from {url}: {err}"}
+
+
+async def afetch_json_data(
+    url: str,
+    timeout: Optional[float] = None,
+    ttl: Optional[float] = None,
+    max_stale: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Asynchronous fetch_json_data() over the shared pooled httpx client."""
+    try:
+        entry = await http_cache.afetch(url, timeout=timeout, ttl=ttl, max_stale=max_stale)
+        return http_cache.decode(entry, "json", _decode_json)
+    except FETCH_ERRORS as err:
+        return {"error": describe_request_error(url, err)}
+    except (UnicodeDecodeError, ValueError) as err:
+        return {"error": f"Invalid JSON response from {url}: {err}"}
+
+
+def fetch_csv_from_url(
+    url: str,
+    encoding: str = "utf-8",
+    timeout: Optional[float] = None,
+    ttl: Optional[float] = None,
+    max_stale: Optional[float] = None,
+) -> Union[List[Dict[str, str]], Dict[str, str]]:
+    """
+    Fetch a CSV document through the shared cache and return its rows as dictionaries.
+
+    Returns a dictionary with an 'error' key if an error occurs.
+    """
+    try:
+        entry = http_cache.fetch(url, timeout=timeout, ttl=ttl, max_stale=max_stale)
+        return http_cache.decode(entry, f"csv:{encoding}", _csv_decoder(encoding))
+    except FETCH_ERRORS as err:
+        return {"error": describe_request_error(url, err)}
+    except UnicodeDecodeError as err:
+        return {"error": f"Failed to decode CSV content from {url} with encoding {encoding}: {err}"}
+    except csv.Error as err:
+        return {"error": f"Malformed CSV data from {url}: {err}"}
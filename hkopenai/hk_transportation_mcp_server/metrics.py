@@ -0,0 +1,307 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Tool calls are timed by phase:
+
+- fetch: waiting for the upstream, including 304 revalidations;
+- parse: decoding upstream bodies and building the indexes derived from them;
+- filter: selecting and formatting the rows of the response;
+- serialize: the rest of the call, mostly converting the response to MCP content.
+
+The MCP layer opens a CallRecord for every tool call (see metrics_endpoint) and code
+on the call path wraps its work in phase(), which costs a context variable lookup when
+no call is being recorded. Phases of upstream lookups made concurrently within one
+call add up, so they can exceed the call duration.
+
+Upstream requests are counted by host and status with their body bytes and duration,
+and the shared HTTP cache counters are read when the metrics are rendered.
+
+A call recorded with a trace (see tracing) also gets a span for each phase and upstream
+request.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .tracing import Trace
+
+# Set to 0 to stop recording metrics and serving them
+METRICS_ENABLED = os.environ.get("HK_TRANSPORT_METRICS", "1") != "0"
+
+# Upper bounds of the histogram buckets, in seconds and in bytes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = tuple(256 * 4**n for n in range(10))
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Add amount to the counter of the given label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Current value for the given label values."""
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        """Exposition lines of every label set."""
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Histogram:
+    """Cumulative bucket histogram per label values."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: one count per bucket plus the overflow, then the sum
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        """Number of observations for the given label values."""
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        """Exposition lines of every label set: cumulative buckets, sum and count."""
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics rendered together, plus collectors that report values at render time."""
+
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        """Add a metric and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+tool_duration = registry.register(
+    Histogram("hk_transport_tool_duration_seconds", "Tool call duration.", ("tool",))
+)
+tool_phase = registry.register(
+    Histogram(
+        "hk_transport_tool_phase_seconds",
+        "Time spent in each phase of a tool call: fetch, parse, filter or serialize.",
+        ("tool", "phase"),
+    )
+)
+tool_calls = registry.register(
+    Counter("hk_transport_tool_calls_total", "Tool calls by outcome.", ("tool", "outcome"))
+)
+tool_response_bytes = registry.register(
+    Histogram(
+        "hk_transport_tool_response_bytes",
+        "Size of the text content of tool responses.",
+        ("tool",),
+        SIZE_BUCKETS,
+    )
+)
+upstream_requests = registry.register(
+    Counter(
+        "hk_transport_upstream_requests_total",
+        "Upstream requests by host and HTTP status, or error if no response arrived.",
+        ("host", "status"),
+    )
+)
+upstream_bytes = registry.register(
+    Counter(
+        "hk_transport_upstream_response_bytes_total",
+        "Body bytes received from upstream hosts.",
+        ("host",),
+    )
+)
+upstream_duration = registry.register(
+    Histogram(
+        "hk_transport_upstream_request_duration_seconds",
+        "Duration of upstream requests.",
+        ("host",),
+    )
+)
+
+
+class CallRecord:
+    """Phase durations of one tool call, collected while the call runs."""
+
+    __slots__ = ("tool", "started", "phases", "closed", "trace")
+
+    def __init__(self, tool: str, trace: Optional["Trace"] = None):
+        self.tool = tool
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.closed = False
+        self.trace = trace
+
+    def add(self, phase_name: str, seconds: float) -> None:
+        """Add time to a phase; work outliving the call, like a background refresh, is dropped."""
+        if not self.closed:
+            self.phases[phase_name] = self.phases.get(phase_name, 0.0) + seconds
+
+    def finish(self, outcome: str, response_bytes: Optional[int] = None) -> None:
+        """Record the call and its phases; serialize gets the time no other phase claimed."""
+        self.closed = True
+        total = time.perf_counter() - self.started
+        if self.trace is not None:
+            self.trace.finish(outcome, response_bytes)
+        if not METRICS_ENABLED:
+            return
+        tool_duration.observe(total, self.tool)
+        tool_calls.inc(self.tool, outcome)
+        for phase_name in ("fetch", "parse"):
+            if phase_name in self.phases:
+                tool_phase.observe(self.phases[phase_name], self.tool, phase_name)
+        tool_phase.observe(self.phases.get("filter", 0.0), self.tool, "filter")
+        tool_phase.observe(max(total - sum(self.phases.values()), 0.0), self.tool, "serialize")
+        if response_bytes is not None:
+            tool_response_bytes.observe(response_bytes, self.tool)
+
+
+_call: ContextVar[Optional[CallRecord]] = ContextVar("hk_transport_call", default=None)
+_phase: ContextVar[Optional[str]] = ContextVar("hk_transport_phase", default=None)
+
+
+@contextlib.contextmanager
+def record_call(tool: str, trace: Optional["Trace"] = None) -> Iterator[CallRecord]:
+    """Collect the phases of the tool call running in this context, and trace them."""
+    record = CallRecord(tool, trace)
+    token = _call.set(record)
+    try:
+        yield record
+    finally:
+        _call.reset(token)
+
+
+@contextlib.contextmanager
+def phase(name: str, **attributes) -> Iterator[None]:
+    """
+    Time the enclosed work as a phase of the current tool call, if one is recorded.
+    Also usable as a decorator, timing every call of the function.
+
+    A phase nested in another is taken out of the outer one, so an index rebuilt while
+    formatting a response counts as parse rather than filter. Attributes are added to the
+    span of the phase when the call is traced.
+    """
+    record = _call.get()
+    if record is None or record.closed:
+        yield
+        return
+    outer = _phase.get()
+    token = _phase.set(name)
+    span = record.trace.start(name, attributes) if record.trace is not None else None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if span is not None:
+            record.trace.end(span)
+        _phase.reset(token)
+        record.add(name, elapsed)
+        if outer is not None:
+            record.add(outer, -elapsed)
+
+
+def record_upstream(url: str, status: str, seconds: float, body_bytes: int = 0) -> None:
+    """Count one upstream request of url, and trace it as part of the current call."""
+    host = url.split("/", 3)[2] if "://" in url else url
+    record = _call.get()
+    if record is not None and record.trace is not None:
+        record.trace.add(
+            "GET", seconds, {"url": url, "http.status": status, "response.bytes": body_bytes}
+        )
+    if not METRICS_ENABLED:
+        return
+    upstream_requests.inc(host, status)
+    upstream_duration.observe(seconds, host)
+    if body_bytes:
+        upstream_bytes.inc(host, amount=body_bytes)
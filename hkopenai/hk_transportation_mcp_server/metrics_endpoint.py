@@ -0,0 +1,110 @@
+"""
+Serving of the in-process metrics over MCP.
+
+register() adds a middleware that records every tool call (see metrics), a GET /metrics
+route in the Prometheus text format for the HTTP transports, and the same text as the
+metrics://prometheus resource for clients on stdio. The middleware also traces and
+profiles calls when enabled for the server, or requested by the client where the server
+allows it (see tracing).
+"""
+
+import sys
+from typing import List
+
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware
+
+from . import tracing
+from .metrics import METRICS_ENABLED, record_call, registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+RESOURCE_URI = "metrics://prometheus"
+
+# http_cache.stats() keys reported as counters; the others are gauges
+CACHE_EVENTS = ("hits", "misses", "revalidated", "coalesced", "stale", "short_circuited")
+
+
+def _request_meta(context) -> dict:
+    request_context = context.fastmcp_context and context.fastmcp_context.request_context
+    return (request_context and request_context.meta) or {}
+
+
+class ToolMetricsMiddleware(Middleware):
+    """Record the duration, phases, outcome and size of tool calls; trace and profile them."""
+
+    async def on_call_tool(self, context, call_next):
+        name = context.message.name
+        # The per-call switches of the client only count when the operator allows them
+        meta = _request_meta(context) if tracing.ALLOW_CLIENT else {}
+        traced = tracing.TRACE_ENABLED or bool(meta.get(tracing.TRACE_META_KEY))
+        trace = tracing.Trace(name) if traced else None
+        with record_call(name, trace) as record, tracing.profile_call(
+            name, bool(meta.get(tracing.PROFILE_META_KEY))
+        ):
+            try:
+                result = await call_next(context)
+            except Exception:
+                record.finish("error")
+                raise
+            content = result.structured_content or {}
+            outcome = "error" if content.get("type") == "Error" else "ok"
+            size = sum(
+                len(block.text.encode()) for block in result.content if hasattr(block, "text")
+            )
+            record.finish(outcome, size)
+            return result
+
+
+def cache_samples() -> List[str]:
+    """Exposition lines of the shared HTTP cache counters, once any tool has loaded it."""
+    module = sys.modules.get(f"{__package__}.http_cache")
+    if module is None:
+        return []
+    stats = module.http_cache.stats()
+    lines = [
+        "# HELP hk_transport_cache_events_total Upstream cache lookups by outcome.",
+        "# TYPE hk_transport_cache_events_total counter",
+    ]
+    lines.extend(
+        f'hk_transport_cache_events_total{{event="{event}"}} {stats[event]}'
+        for event in CACHE_EVENTS
+    )
+    for key, help_text in (
+        ("entries", "Cached upstream responses."),
+        ("bytes", "Bytes of cached upstream bodies."),
+    ):
+        lines.append(f"# HELP hk_transport_cache_{key} {help_text}")
+        lines.append(f"# TYPE hk_transport_cache_{key} gauge")
+        lines.append(f"hk_transport_cache_{key} {stats[key]}")
+    return lines
+
+
+registry.collectors.append(cache_samples)
+
+
+def register(mcp: FastMCP) -> None:
+    """
+    Record tool calls and serve the metrics, unless HK_TRANSPORT_METRICS is 0.
+
+    Calls are still recorded for tracing or profiling enabled by environment variable.
+    """
+    if METRICS_ENABLED or tracing.TRACE_ENABLED or tracing.PROFILE_THRESHOLD > 0:
+        mcp.add_middleware(ToolMetricsMiddleware())
+    if not METRICS_ENABLED:
+        return
+
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics(request):  # pylint: disable=unused-argument
+        from starlette.responses import Response  # pylint: disable=import-outside-toplevel
+
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+    @mcp.resource(
+        RESOURCE_URI,
+        name="metrics",
+        description="Tool latency by phase, upstream requests and cache counters of this "
+        "server, in the Prometheus text format",
+        mime_type="text/plain",
+    )
+    def metrics_resource() -> str:
+        return registry.render()
@@ -0,0 +1,108 @@
+"""
+Cursor pagination, field projection and response formats for list-valued tool responses.
+
+A cursor is an opaque URL-safe token holding the position a tool needs to resume a
+listing, so the caller just passes back the next_cursor of the previous page. Pages
+are cut from data the tools already hold in memory; paging never refetches upstream.
+
+The columnar format names the columns once and returns each row as a list of values,
+instead of repeating every key in every row.
+"""
+
+import base64
+import binascii
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bound on rows per page, so a single page still fits comfortably in a response
+MAX_LIMIT = 10000
+FORMATS = ("records", "columnar")
+
+
+def encode_cursor(position: Dict[str, int]) -> str:
+    """Encode a resume position as an opaque cursor."""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], keys: Sequence[str]) -> Optional[Dict[str, int]]:
+    """
+    Decode a cursor holding the given integer keys, or return None for no cursor.
+
+    Raises ValueError with a user message if the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (UnicodeError, binascii.Error, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(position, dict) or not all(
+        isinstance(position.get(key), int) and position[key] >= 0 for key in keys
+    ):
+        raise ValueError("Invalid cursor")
+    return {key: position[key] for key in keys}
+
+
+def validate_limit(limit: Optional[int]) -> Optional[int]:
+    """Check a page size, raising ValueError with a user message if out of range."""
+    if limit is None:
+        return None
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit
+
+
+def validate_fields(
+    fields: Optional[Iterable[str]], available: Sequence[str]
+) -> Optional[Tuple[str, ...]]:
+    """
+    Check a field projection against the available fields, keeping the requested order.
+
+    Returns None when every field is wanted. Raises ValueError with a user message if
+    a field is unknown.
+    """
+    if not fields:
+        return None
+    fields = tuple(dict.fromkeys(fields))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f"Invalid fields {unknown}. Use any of {', '.join(available)}")
+    return fields
+
+
+def validate_format(response_format: Optional[str]) -> str:
+    """Check a response format, defaulting to records; raises ValueError if unknown."""
+    if not response_format:
+        return "records"
+    if response_format not in FORMATS:
+        raise ValueError(f"Invalid format {response_format}. Use one of {', '.join(FORMATS)}")
+    return response_format
+
+
+def table(columns: Sequence[str], rows: List) -> Dict:
+    """Columnar payload: the column names once, then one value list per row."""
+    return {"columns": list(columns), "rows": rows}
+
+
+def parse_page(
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[Iterable[str]],
+    cursor_keys: Sequence[str],
+    available: Sequence[str],
+) -> Tuple[Optional[int], Optional[Dict[str, int]], Optional[Tuple[str, ...]]]:
+    """Validate a tool's limit, cursor and fields, raising ValueError with a user message."""
+    return (
+        validate_limit(limit),
+        decode_cursor(cursor, cursor_keys),
+        validate_fields(fields, available),
+    )
+
+
+def project(rows: Iterable[Dict], fields: Optional[Tuple[str, ...]]) -> List[Dict]:
+    """Keep only the given fields of each row; None keeps the rows as they are."""
+    if fields is None:
+        return list(rows)
+    return [{name: row[name] for name in fields} for row in rows]
@@ -0,0 +1,46 @@
+"""
+Token bucket rate limiting for upstream requests.
+
+Each limiter admits up to burst requests at once and then one request every 1/rate
+seconds. Every request reserves the next free slot before waiting for it, so waiters
+are served in arrival order, and threads and event loops can share one limiter.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket for threads and asyncio callers; a rate of 0 or less disables limiting."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, possibly one not refilled yet, and return the seconds until it is."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        """Wait until a request may be sent, without blocking the event loop."""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
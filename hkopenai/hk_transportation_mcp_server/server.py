@@ -2,24 +2,67 @@
 MCP Server module for transportation data in Hong Kong.
 
 This module provides the main server setup for the HK OpenAI Transportation MCP Server,
-including tools for fetching passenger statistics, bus routes, and land boundary wait times.
+including tools for fetching passenger statistics, bus routes, arrival times and journeys,
+and land boundary wait times.
+
+Only the tool definitions are imported at startup. The implementations, the HTTP client
+and the persisted datasets are loaded by the first tool call or by the warm start, which
+runs in the background so the server answers its first request without waiting for it.
 """
 
+# pylint: disable=import-outside-toplevel
+
+import os
+import threading
+
 from fastmcp import FastMCP
 
-from .tools import (
+from . import metrics_endpoint
+from .startup_profile import startup_profile
+from .tools.schemas import (
     passenger_traffic,
     bus_kmb,
+    bus_kmb_eta,
+    bus_kmb_journey,
     land_custom_wait_time,
 )
 
+# Set to 0 to start without loading or writing the on-disk snapshots of upstream data
+WARM_START = os.environ.get("HK_TRANSPORT_WARM_START", "1") != "0"
+
 
 def server():
     """Create and configure the MCP server"""
+    startup_profile.mark("imports")
     mcp = FastMCP(name="HK OpenAI transportation Server")
 
     passenger_traffic.register(mcp)
     bus_kmb.register(mcp)
+    bus_kmb_eta.register(mcp)
+    bus_kmb_journey.register(mcp)
     land_custom_wait_time.register(mcp)
+    metrics_endpoint.register(mcp)
+    startup_profile.mark("registration")
 
+    if WARM_START:
+        threading.Thread(target=_warm_start, name="warm-start", daemon=True).start()
+
+    startup_profile.report()
     return mcp
+
+
+def _warm_start():
+    """Load persisted datasets so the first requests are served warm"""
+    from .http_cache import http_cache
+    from .storage import SHARED_READER, data_dir
+    from .tools import bus_kmb as bus_kmb_tools
+    from .tools import land_custom_wait_time as land_tools
+    from .tools import passenger_traffic as passenger_tools
+
+    path = data_dir("snapshots")
+    # The snapshots of a worker are followed from the refreshing process instead
+    if path and not SHARED_READER:
+        http_cache.enable_snapshots(path)
+    passenger_tools.warm_start()
+    bus_kmb_tools.warm_start()
+    land_tools.warm_start()
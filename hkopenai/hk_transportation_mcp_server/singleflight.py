@@ -0,0 +1,80 @@
+"""
+Request coalescing for concurrent callers of the same upstream resource.
+
+While a call for a key is in flight, further callers for that key wait for it and share
+its result (or its exception) instead of starting their own. Thread-based callers use
+do() and asyncio callers use ado(). An async call runs in its own task, so cancelling
+any of its callers, the first one included, only stops that caller waiting.
+"""
+
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """An in-flight synchronous call and the outcome its followers wait for."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() for key, or wait for the call already in flight for key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() for key, or await the coroutine already in flight for key."""
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        if task is not None and task.get_loop() is loop:
+            self.coalesced += 1
+        else:
+            task = self._tasks[key] = loop.create_task(fn())
+            task.add_done_callback(functools.partial(self._finished, key))
+        # Shield so a cancelled caller does not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller was cancelled
+            task.exception()
@@ -0,0 +1,108 @@
+"""
+On-disk snapshots of cached upstream payloads for warm starts.
+
+A snapshot holds one cached response: its body, validators, the wall-clock time it was
+fetched and its decoded forms. Snapshots are written in the marshal format, which
+loads plain dicts, lists and strings several times faster than re-parsing JSON. They
+are an implementation detail of this package and are discarded whenever their layout
+or the Python version changes.
+
+Besides each snapshot file a marker file records, in its modification time, when the
+upstream last confirmed the payload, so processes sharing the directory can tell how
+fresh a snapshot is without reading it.
+"""
+
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from .storage import atomic_write
+
+# Set to 1 to memory-map snapshot files while loading them instead of reading them
+SNAPSHOT_MMAP = os.environ.get("HK_TRANSPORT_SNAPSHOT_MMAP", "0") == "1"
+
+# marshal output is only guaranteed to load on the interpreter version that wrote it
+_VERSION = (1, sys.version_info[:2])
+
+
+class SnapshotStore:
+    """Directory of snapshot files, one per URL."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, url: str, suffix: str = "snapshot") -> str:
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{name}.{suffix}")
+
+    def save(
+        self,
+        url: str,
+        content: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        fetched_at: float,
+        decoded: Dict[str, Any],
+    ) -> None:
+        """
+        Write the snapshot of url, replacing any previous one.
+
+        fetched_at is wall-clock time. Raises OSError if the file cannot be written and
+        ValueError if a decoded form holds types marshal cannot store.
+        """
+        record = {
+            "version": _VERSION,
+            "url": url,
+            "content": content,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+            "decoded": decoded,
+        }
+        atomic_write(self._file(url), marshal.dumps(record))
+
+    def touch(self, url: str) -> None:
+        """Record that the upstream confirmed the snapshotted payload of url just now."""
+        path = self._file(url, "fetched")
+        with open(path, "ab"):
+            pass
+        os.utime(path)
+
+    def state(self, url: str) -> Optional[Tuple[Tuple[int, int, int], float]]:
+        """
+        Return the identity of the snapshot of url and when its payload was last confirmed.
+
+        The identity changes whenever the file is replaced, and the time is wall-clock.
+        Returns None if there is no snapshot.
+        """
+        try:
+            stat = os.stat(self._file(url))
+        except OSError:
+            return None
+        try:
+            confirmed = max(stat.st_mtime, os.stat(self._file(url, "fetched")).st_mtime)
+        except OSError:
+            confirmed = stat.st_mtime
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns), confirmed
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the snapshot record of url, or None if missing, unreadable or outdated."""
+        try:
+            with open(self._file(url), "rb") as f:
+                if SNAPSHOT_MMAP:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        record = marshal.loads(mapped)
+                else:
+                    record = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (
+            not isinstance(record, dict)
+            or record.get("version") != _VERSION
+            or record.get("url") != url
+        ):
+            return None
+        return record
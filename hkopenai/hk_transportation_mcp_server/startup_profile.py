@@ -0,0 +1,146 @@
+"""
+Startup profile: where the time before the server is ready goes.
+
+Set HK_TRANSPORT_STARTUP_PROFILE=1 to time every module imported from the moment this
+package is imported, much like python -X importtime but limited to the server start,
+along with the startup phases. The report is written to stderr once the server is
+configured, since stdout carries the stdio transport.
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+# Set to 1 to print the startup profile report to stderr
+STARTUP_PROFILE = os.environ.get("HK_TRANSPORT_STARTUP_PROFILE", "0") == "1"
+# Modules listed in the report, slowest first
+REPORT_MODULES = 25
+
+
+class _TimedLoader:
+    """Loader wrapper that times exec_module of one module, then hands the module back."""
+
+    def __init__(self, profile: "StartupProfile", loader):
+        self._profile = profile
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        """Delegate module creation to the wrapped loader."""
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        """Execute the module with the wrapped loader, recording how long it took."""
+        # Restore the real loader first so the module never sees the wrapper
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profile._enter()  # pylint: disable=protected-access
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profile._leave(module.__name__)  # pylint: disable=protected-access
+
+
+class StartupProfile:
+    """
+    Import and phase timings of one server start.
+
+    install() puts a finder at the front of sys.meta_path that wraps the loader of every
+    module found by the finders behind it. Nested imports are subtracted from the
+    importing module, so each module has a self and a cumulative time. Only imports
+    made by the thread that installed the profile are timed.
+    """
+
+    def __init__(self, enabled: bool = STARTUP_PROFILE):
+        self.enabled = enabled
+        self.modules: Dict[str, Tuple[float, float]] = {}
+        self.phases: List[Tuple[str, float]] = []
+        self._started = 0.0
+        self._last_mark = 0.0
+        self._thread: Optional[int] = None
+        self._stack: List[List[float]] = []
+        self._finding = False
+
+    @property
+    def installed(self) -> bool:
+        """Whether imports are being timed."""
+        return self in sys.meta_path
+
+    def install(self) -> None:
+        """Start timing imports and phases, if the profile is enabled."""
+        if not self.enabled or self.installed:
+            return
+        self._started = self._last_mark = time.perf_counter()
+        self._thread = threading.get_ident()
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        """Stop timing imports."""
+        if self.installed:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        """Find the module with the finders behind this one and wrap its loader."""
+        if self._finding or threading.get_ident() != self._thread:
+            return None
+        self._finding = True
+        try:
+            for finder in sys.meta_path[sys.meta_path.index(self) + 1 :]:
+                find_spec = getattr(finder, "find_spec", None)
+                spec = find_spec(fullname, path, target) if find_spec else None
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding = False
+        # Built-in and frozen modules are loaded by classes rather than loader instances
+        if spec.loader is None or isinstance(spec.loader, type):
+            return spec
+        spec.loader = _TimedLoader(self, spec.loader)
+        return spec
+
+    def _enter(self) -> None:
+        # Each frame holds its start time and the cumulative time of the modules it imports
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _leave(self, name: str) -> None:
+        started, children = self._stack.pop()
+        cumulative = time.perf_counter() - started
+        self.modules[name] = (cumulative, cumulative - children)
+        if self._stack:
+            self._stack[-1][1] += cumulative
+
+    def mark(self, phase: str) -> None:
+        """Record the time since the previous mark, or since install(), as a phase."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last_mark))
+        self._last_mark = now
+
+    def report(self, stream: Optional[TextIO] = None) -> None:
+        """Stop timing and write the report, if the profile is enabled."""
+        if not self.enabled:
+            return
+        self.uninstall()
+        stream = stream or sys.stderr
+        total = self._last_mark - self._started
+        lines = ["Startup profile"]
+        lines += [f"  {phase:<22}{seconds * 1000:10.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"  {'total':<22}{total * 1000:10.1f} ms")
+        lines.append(f"Slowest of {len(self.modules)} imports")
+        lines.append(f"  {'cumulative ms':>13}  {'self ms':>9}  module")
+        slowest = sorted(self.modules.items(), key=lambda item: -item[1][0])
+        for name, (cumulative, own) in slowest[:REPORT_MODULES]:
+            lines.append(f"  {cumulative * 1000:13.1f}  {own * 1000:9.1f}  {name}")
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+
+startup_profile = StartupProfile()
@@ -0,0 +1,62 @@
+"""
+Local storage helpers shared by modules that persist data between processes.
+
+Persistent files live under the directory named by HK_TRANSPORT_DATA_DIR, defaulting to
+a per-user cache directory. Setting HK_TRANSPORT_DATA_DIR to an empty string disables
+persistence, as does a data directory that cannot be created.
+
+In the multi-worker mode (see workers) one process refreshes the persisted datasets and
+the worker processes, started with HK_TRANSPORT_SHARED_READER=1, only read them.
+"""
+
+import logging
+import os
+import tempfile
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DATA_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "hk_transportation_mcp_server"
+)
+
+# Set by the multi-worker launcher in its workers, which read the shared datasets
+SHARED_READER = os.environ.get("HK_TRANSPORT_SHARED_READER", "0") == "1"
+
+# Directories that could not be created, so the failure is only logged once each
+_unavailable: Set[str] = set()
+
+
+def data_dir(*parts: str) -> Optional[str]:
+    """
+    Return (and create) a directory under the data directory, or None if disabled.
+
+    A directory that cannot be created is logged and treated as disabled, so callers
+    keep their data in memory instead.
+    """
+    root = os.environ.get("HK_TRANSPORT_DATA_DIR", _DEFAULT_DATA_DIR)
+    if not root:
+        return None
+    path = os.path.join(root, *parts)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        if path not in _unavailable:
+            _unavailable.add(path)
+            logger.warning("Cannot create %s, not persisting its data: %s", path, e)
+        return None
+    return path
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write data to path so readers never observe a partially written file."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -5,65 +5,302 @@ This module provides functionality to retrieve and format bus route information
 supporting multiple languages for user accessibility.
 """
 
-from typing import Dict, List, Optional, Union
-from pydantic import Field
-from typing_extensions import Annotated
-from hkopenai_common.json_utils import fetch_json_data
+import json
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from ..http_cache import (
+    REFERENCE_STALE_WINDOW,
+    afetch_json_data,
+    fetch_json_data,
+    http_cache,
+    mark_stale,
+    warm_json_data,
+)
+from ..metrics import phase
+from ..pagination import encode_cursor, parse_page, project, table, validate_format
+from .kmb_route_index import BOUNDS, RouteIndex, normalize_bound
+from .schemas.bus_kmb import ROUTE_FIELDS, register  # pylint: disable=unused-import
 
+URL = "https://data.etabus.gov.hk/v1/transport/kmb/route/"
 
-def register(mcp):
-    """Registers the get_bus_kmb tool with the MCP server."""
+http_cache.persist(URL)
 
-    @mcp.tool(
-        description="All bus routes of Kowloon Motor Bus (KMB) and Long Win Bus Services Hong Kong. Data source: Kowloon Motor Bus and Long Win Bus Services"
-    )
-    def get_bus_kmb(
-        lang: Annotated[
-            Optional[str],
-            Field(
-                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
-                json_schema_extra={"enum": ["en", "tc", "sc"]},
-            ),
-        ] = "en",
-    ) -> Dict:
-        return _get_bus_kmb(lang)
+# While the upstream is down the last route list stays usable for a long time
+ROUTES_MAX_STALE = REFERENCE_STALE_WINDOW
+
+LANGUAGES = ("en", "tc", "sc")
+
+
+class RouteViews:
+    """
+    Everything derived from one decoded route list payload.
+
+    Holds the lookup index, one projection per language and, once asked for, one table
+    of ROUTE_FIELDS value tuples per language. They are shared by every caller until
+    the payload changes, so responses hand out copies of the projected rows. The
+    fingerprint identifies the route list across refreshes and worker processes, so a
+    cursor cut from one list is not resumed in another.
+    """
+
+    __slots__ = ("source", "fingerprint", "index", "projections", "_tables")
+
+    def __init__(self, data: Dict):
+        self.source = data
+        self.fingerprint = zlib.crc32(
+            json.dumps(data["data"], sort_keys=True, separators=(",", ":")).encode("utf-8")
+        )
+        self.index = RouteIndex(data["data"])
+        self.projections: Dict[str, Tuple[Dict, ...]] = {
+            lang: tuple(_format_route(route, lang) for route in data["data"])
+            for lang in LANGUAGES
+        }
+        self._tables: Dict[str, Tuple[Tuple, ...]] = {}
+
+    def table(self, lang: str) -> Tuple[Tuple, ...]:
+        """Rows of the columnar format in one language, built on first use."""
+        rows = self._tables.get(lang)
+        if rows is None:
+            # A concurrent first use builds identical rows twice at worst
+            rows = self._tables[lang] = tuple(
+                _route_values(route, lang) for route in self.source["data"]
+            )
+        return rows
+
+
+_views_lock = threading.Lock()
+_views: Optional[RouteViews] = None
+
+
+def _route_views(data: Dict) -> RouteViews:
+    """
+    Return the index and projections of a decoded route list.
 
+    The shared cache hands out the same decoded object until the upstream body changes,
+    so they are rebuilt only when a different payload arrives.
+    """
+    global _views  # pylint: disable=global-statement
+    with _views_lock:
+        if _views is None or data is not _views.source:
+            with phase("parse"):
+                _views = RouteViews(data)
+        return _views
 
 
+def warm_start() -> None:
+    """Load the route list snapshot and build its index and projections ahead of use."""
+    data = warm_json_data(URL)
+    if data is not None and "data" in data:
+        _route_views(data)
+
+
+def _languages(lang: Optional[Union[str, List[str]]]) -> Union[str, List[str]]:
+    """Validate the requested language(s), defaulting to English."""
+    if isinstance(lang, (list, tuple)):
+        langs = [code for code in dict.fromkeys(lang) if code in LANGUAGES]
+        return langs or ["en"]
+    return lang if lang in LANGUAGES else "en"
 
 
 def _get_bus_kmb(
-    lang: Annotated[
-        Optional[str],
-        Field(
-            description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
-            json_schema_extra={"enum": ["en", "tc", "sc"]},
-        ),
-    ] = "en",
+    lang: Optional[Union[str, List[str]]] = "en",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    response_format: Optional[str] = "records",
 ) -> Dict:
     """Get all bus routes of Kowloon Motor Bus (KMB) and Long Win Bus Services Hong Kong"""
-    url = "https://data.etabus.gov.hk/v1/transport/kmb/route/"
-    data = fetch_json_data(url)
+    try:
+        page = parse_page(limit, cursor, fields, ("offset", "fingerprint"), ROUTE_FIELDS)
+        response_format = validate_format(response_format)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+    data = fetch_json_data(URL, max_stale=ROUTES_MAX_STALE)
+    return mark_stale(_format_routes(data, lang, *page, response_format), URL)
+
+
+async def _aget_bus_kmb(
+    lang: Optional[Union[str, List[str]]] = "en",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    response_format: Optional[str] = "records",
+) -> Dict:
+    """Asynchronous _get_bus_kmb() over the shared pooled HTTP client"""
+    try:
+        page = parse_page(limit, cursor, fields, ("offset", "fingerprint"), ROUTE_FIELDS)
+        response_format = validate_format(response_format)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+    data = await afetch_json_data(URL, max_stale=ROUTES_MAX_STALE)
+    return mark_stale(_format_routes(data, lang, *page, response_format), URL)
 
+
+@phase("filter")
+def _format_routes(
+    data: Dict,
+    lang: Optional[Union[str, List[str]]],
+    limit: Optional[int] = None,
+    position: Optional[Dict] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+    response_format: str = "records",
+) -> Dict:
+    """
+    Serve the upstream route list from its cached per-language projections.
+
+    The requested page is sliced from them and copied, so callers may modify the rows.
+    A cursor from a different route list is rejected rather than resumed at its offset,
+    which would skip or repeat routes.
+    """
     if "error" in data:
         return {"type": "Error", "error": data["error"]}
 
-    # Validate language code, default to 'en' if invalid
-    valid_langs = ["en", "tc", "sc"]
-    if lang not in valid_langs:
-        lang = "en"
-
-    # Filter fields based on language
-    filtered_routes = []
-    for route in data["data"]:
-        filtered_routes.append(
-            {
-                "route": route["route"],
-                "bound": "outbound" if route["bound"] == "O" else "inbound",
-                "service_type": route["service_type"],
-                "origin": route[f"orig_{lang}"],
-                "destination": route[f"dest_{lang}"],
-            }
-        )
+    views = _route_views(data)
+    lang = _languages(lang)
+    codes = lang if isinstance(lang, list) else [lang]
+    total = len(data["data"])
+    if position and position["fingerprint"] != views.fingerprint:
+        return {
+            "type": "Error",
+            "error": "Invalid cursor: the route list has changed, start again without a cursor",
+        }
+    offset = position["offset"] if position else 0
+    end = total if limit is None else min(total, offset + limit)
+
+    if response_format == "columnar":
+        pages = {code: _table(views.table(code)[offset:end], fields) for code in codes}
+    else:
+        pages = {code: _records(views.projections[code][offset:end], fields) for code in codes}
+    response = {"type": "RouteList", "data": pages if isinstance(lang, list) else pages[lang]}
+    if end < total:
+        response["next_cursor"] = encode_cursor({"offset": end, "fingerprint": views.fingerprint})
+    return response
+
 
-    return {"type": "RouteList", "data": filtered_routes}
+def _records(rows: Sequence[Dict], fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+    """Copies of shared projected routes, keeping only the given fields"""
+    if fields is None:
+        return [dict(row) for row in rows]
+    return project(rows, fields)
+
+
+def _table(rows: Sequence[Tuple], fields: Optional[Tuple[str, ...]] = None) -> Dict:
+    """Columnar payload of route value tuples, keeping only the given fields"""
+    if fields is None:
+        return table(ROUTE_FIELDS, rows)
+    positions = [ROUTE_FIELDS.index(name) for name in fields]
+    return table(fields, [[row[i] for i in positions] for row in rows])
+
+
+def _route_values(route: Dict, lang: str) -> Tuple:
+    """ROUTE_FIELDS values of one upstream route in the requested language"""
+    return (
+        route["route"],
+        "outbound" if route["bound"] == "O" else "inbound",
+        route["service_type"],
+        route[f"orig_{lang}"],
+        route[f"dest_{lang}"],
+    )
+
+
+def _format_route(route: Dict, lang: str) -> Dict:
+    """Project one upstream route onto the requested language"""
+    return dict(zip(ROUTE_FIELDS, _route_values(route, lang)))
+
+
+def _search_bus_kmb_routes(
+    route: Optional[str] = None,
+    route_prefix: Optional[str] = None,
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    bound: Optional[str] = None,
+    service_type: Optional[str] = None,
+    lang: Optional[Union[str, List[str]]] = "en",
+    response_format: Optional[str] = "records",
+) -> Dict:
+    """Search bus routes of KMB and Long Win Bus Services over the route index"""
+    data = fetch_json_data(URL, max_stale=ROUTES_MAX_STALE)
+    return mark_stale(
+        _search_routes(
+            data, route, route_prefix, origin, destination, bound, service_type, lang,
+            response_format,
+        ),
+        URL,
+    )
+
+
+async def _asearch_bus_kmb_routes(
+    route: Optional[str] = None,
+    route_prefix: Optional[str] = None,
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    bound: Optional[str] = None,
+    service_type: Optional[str] = None,
+    lang: Optional[Union[str, List[str]]] = "en",
+    response_format: Optional[str] = "records",
+) -> Dict:
+    """Asynchronous _search_bus_kmb_routes() over the shared pooled HTTP client"""
+    data = await afetch_json_data(URL, max_stale=ROUTES_MAX_STALE)
+    return mark_stale(
+        _search_routes(
+            data, route, route_prefix, origin, destination, bound, service_type, lang,
+            response_format,
+        ),
+        URL,
+    )
+
+
+@phase("filter")
+def _search_routes(
+    data: Dict,
+    route: Optional[str],
+    route_prefix: Optional[str],
+    origin: Optional[str],
+    destination: Optional[str],
+    bound: Optional[str],
+    service_type: Optional[str],
+    lang: Optional[Union[str, List[str]]],
+    response_format: Optional[str] = "records",
+) -> Dict:
+    """Answer a route search from the index and projections of the decoded route list"""
+    if "error" in data:
+        return {"type": "Error", "error": data["error"]}
+    try:
+        response_format = validate_format(response_format)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    bound_code = normalize_bound(bound)
+    if bound is not None and bound_code is None:
+        return {
+            "type": "Error",
+            "error": f"Invalid bound {bound}. Use one of {', '.join(BOUNDS.values())}",
+        }
+
+    views = _route_views(data)
+    matches = views.index.match(
+        route=route,
+        route_prefix=route_prefix,
+        origin=origin,
+        destination=destination,
+        bound=bound_code,
+        service_type=service_type.strip() if service_type else None,
+    )
+    lang = _languages(lang)
+    if response_format == "columnar":
+        pages = {
+            code: _table([views.table(code)[i] for i in matches])
+            for code in (lang if isinstance(lang, list) else [lang])
+        }
+        return {"type": "RouteList", "data": pages if isinstance(lang, list) else pages[lang]}
+    if isinstance(lang, list):
+        return {
+            "type": "RouteList",
+            "data": {
+                code: _records([views.projections[code][i] for i in matches]) for code in lang
+            },
+        }
+    return {
+        "type": "RouteList",
+        "data": _records([views.projections[lang][i] for i in matches]),
+    }
@@ -0,0 +1,180 @@
+"""
+Module for fetching real-time arrival estimates of Kowloon Motor Bus (KMB) and Long Win Bus Services.
+
+This module fans a batch of (stop, route, service type) ETA lookups out to the KMB API
+concurrently and merges the results into one response. Each lookup is cached for a few
+seconds, so repeated queries for the same stop are served without another request.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import quote
+from ..http_cache import afetch_json_data, fetch_json_data, http_cache, mark_stale
+from ..metrics import phase
+from .schemas.bus_kmb_eta import MAX_BATCH, EtaKey, register  # pylint: disable=unused-import
+
+ETA_URL = "https://data.etabus.gov.hk/v1/transport/kmb/eta/{stop}/{route}/{service_type}"
+ROUTE_ETA_URL = "https://data.etabus.gov.hk/v1/transport/kmb/route-eta/{route}/{service_type}"
+
+# Seconds an ETA lookup is reused; upstream refreshes roughly every minute
+ETA_TTL = float(os.environ.get("HK_TRANSPORT_ETA_TTL", "15"))
+# Concurrent upstream lookups per batch
+ETA_MAX_WORKERS = int(os.environ.get("HK_TRANSPORT_ETA_WORKERS", "8"))
+# Arrival estimates older than this are useless, so stop serving them stale
+ETA_MAX_STALE = 120
+
+
+def _eta_url(key: EtaKey) -> str:
+    """Build the upstream URL of one stop/route/service type lookup."""
+    return ETA_URL.format(
+        stop=quote(key.stop.strip(), safe=""),
+        route=quote(key.route.strip().upper(), safe=""),
+        service_type=quote(key.service_type.strip(), safe=""),
+    )
+
+
+def _route_eta_url(route: str, service_type: str) -> str:
+    """Build the upstream URL of a whole-route lookup."""
+    return ROUTE_ETA_URL.format(
+        route=quote(route.strip().upper(), safe=""),
+        service_type=quote(service_type.strip(), safe=""),
+    )
+
+
+def _validate_lookups(lookups: List) -> List[EtaKey]:
+    """Coerce the batch into EtaKey objects, raising ValueError with a user message."""
+    if not lookups:
+        raise ValueError("At least one lookup is required")
+    if len(lookups) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} lookups are allowed per request")
+    keys = []
+    for index, item in enumerate(lookups):
+        key = item
+        if isinstance(item, dict):
+            try:
+                key = EtaKey(**item)
+            except (TypeError, ValueError):
+                key = None
+        if (
+            not isinstance(key, EtaKey)
+            or not key.stop.strip()
+            or not key.route.strip()
+            or not key.service_type.strip()
+        ):
+            raise ValueError(
+                f"Lookup {index} is malformed: each lookup needs a stop, route and service_type"
+            )
+        keys.append(key)
+    return keys
+
+
+def _language(lang: Optional[str]) -> str:
+    """Validate language code, default to 'en' if invalid."""
+    return lang if lang in ("en", "tc", "sc") else "en"
+
+
+def _get_bus_kmb_eta(lookups: List, lang: Optional[str] = "en") -> Dict:
+    """Get estimated arrival times for a batch of lookups using a bounded thread pool"""
+    try:
+        keys = _validate_lookups(lookups)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    def lookup(key: EtaKey) -> Dict:
+        return fetch_json_data(_eta_url(key), timeout=10, ttl=ETA_TTL, max_stale=ETA_MAX_STALE)
+
+    with ThreadPoolExecutor(max_workers=min(ETA_MAX_WORKERS, len(keys))) as pool:
+        results = list(pool.map(lookup, keys))
+    return _merge_etas(keys, results, _language(lang))
+
+
+async def _aget_bus_kmb_eta(lookups: List, lang: Optional[str] = "en") -> Dict:
+    """Asynchronous _get_bus_kmb_eta() over the shared pooled HTTP client"""
+    try:
+        keys = _validate_lookups(lookups)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    workers = asyncio.Semaphore(ETA_MAX_WORKERS)
+
+    async def lookup(key: EtaKey) -> Dict:
+        async with workers:
+            return await afetch_json_data(
+                _eta_url(key), timeout=10, ttl=ETA_TTL, max_stale=ETA_MAX_STALE
+            )
+
+    results = await asyncio.gather(*(lookup(key) for key in keys))
+    return _merge_etas(keys, results, _language(lang))
+
+
+@phase("filter")
+def _merge_etas(keys: List[EtaKey], results: List[Dict], lang: str) -> Dict:
+    """Combine per-lookup payloads into one response, keeping failures per lookup"""
+    merged = []
+    for key, data in zip(keys, results):
+        item = {"stop": key.stop, "route": key.route, "service_type": key.service_type}
+        if "error" in data:
+            item["error"] = data["error"]
+        else:
+            item["etas"] = [_format_eta(row, lang) for row in data.get("data", [])]
+            age = http_cache.stale_age(_eta_url(key), ETA_TTL)
+            if age is not None:
+                item["stale"] = True
+                item["data_age_seconds"] = round(age)
+        merged.append(item)
+    return {"type": "ETAList", "data": merged}
+
+
+def _format_eta(row: Dict, lang: str) -> Dict:
+    """Project one upstream ETA row onto the requested language"""
+    return {
+        "route": row.get("route"),
+        "bound": "outbound" if row.get("dir") == "O" else "inbound",
+        "service_type": row.get("service_type"),
+        "seq": row.get("seq"),
+        "destination": row.get(f"dest_{lang}"),
+        "eta_seq": row.get("eta_seq"),
+        "eta": row.get("eta"),
+        "remark": row.get(f"rmk_{lang}") or None,
+    }
+
+
+def _get_bus_kmb_route_eta(
+    route: str, service_type: Optional[str] = "1", lang: Optional[str] = "en"
+) -> Dict:
+    """Get estimated arrival times at every stop of a route"""
+    service_type = service_type or "1"
+    if not route or not route.strip():
+        return {"type": "Error", "error": "route is required"}
+    url = _route_eta_url(route, service_type)
+    data = fetch_json_data(url, timeout=10, ttl=ETA_TTL, max_stale=ETA_MAX_STALE)
+    return mark_stale(_format_route_eta(route, service_type, data, _language(lang)), url, ETA_TTL)
+
+
+async def _aget_bus_kmb_route_eta(
+    route: str, service_type: Optional[str] = "1", lang: Optional[str] = "en"
+) -> Dict:
+    """Asynchronous _get_bus_kmb_route_eta() over the shared pooled HTTP client"""
+    service_type = service_type or "1"
+    if not route or not route.strip():
+        return {"type": "Error", "error": "route is required"}
+    url = _route_eta_url(route, service_type)
+    data = await afetch_json_data(url, timeout=10, ttl=ETA_TTL, max_stale=ETA_MAX_STALE)
+    return mark_stale(_format_route_eta(route, service_type, data, _language(lang)), url, ETA_TTL)
+
+
+@phase("filter")
+def _format_route_eta(route: str, service_type: str, data: Dict, lang: str) -> Dict:
+    """Project a whole-route ETA payload onto the requested language"""
+    if "error" in data:
+        return {"type": "Error", "error": data["error"]}
+    return {
+        "type": "RouteETA",
+        "data": {
+            "route": route.strip().upper(),
+            "service_type": service_type,
+            "etas": [_format_eta(row, lang) for row in data.get("data", [])],
+        },
+    }
@@ -0,0 +1,240 @@
+"""
+Module for planning bus journeys on the Kowloon Motor Bus (KMB) and Long Win Bus Services network.
+
+This module loads the KMB route-stop and stop lists into a compact route-stop graph and
+searches it for direct routes and journeys with one transfer between two stops. A grid
+spatial index over the stop list answers nearest-stop queries.
+"""
+
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+from ..http_cache import REFERENCE_STALE_WINDOW, afetch_json_data, fetch_json_data
+from ..metrics import phase
+from .kmb_route_graph import Leg, RouteGraph
+from .kmb_stop_grid import StopGrid
+from .schemas.bus_kmb_journey import (  # pylint: disable=unused-import
+    MAX_NEAREST,
+    MAX_RESULTS,
+    register,
+)
+
+ROUTE_STOP_URL = "https://data.etabus.gov.hk/v1/transport/kmb/route-stop"
+STOP_URL = "https://data.etabus.gov.hk/v1/transport/kmb/stop"
+
+# The bulk lists change rarely; revalidating hourly keeps the graph current
+NETWORK_TTL = 3600
+# While the upstream is down the last network stays usable for a long time
+NETWORK_MAX_STALE = REFERENCE_STALE_WINDOW
+
+_graph_lock = threading.Lock()
+_graph: Optional[RouteGraph] = None
+_graph_sources: Tuple[Optional[Dict], Optional[Dict]] = (None, None)
+
+
+def _route_graph(route_stops: Dict, stops: Dict) -> RouteGraph:
+    """
+    Return the route-stop graph of the decoded bulk lists.
+
+    The shared cache hands out the same decoded objects until an upstream body changes,
+    so the graph is rebuilt only when a different payload arrives.
+    """
+    global _graph, _graph_sources  # pylint: disable=global-statement
+    with _graph_lock:
+        changed = _graph_sources[0] is not route_stops or _graph_sources[1] is not stops
+        if _graph is None or changed:
+            with phase("parse"):
+                _graph = RouteGraph(route_stops["data"], stops["data"])
+            _graph_sources = (route_stops, stops)
+        return _graph
+
+
+_grid_lock = threading.Lock()
+_grid: Optional[StopGrid] = None
+_grid_source: Optional[Dict] = None
+
+
+def _stop_grid(stops: Dict) -> StopGrid:
+    """Return the spatial index of the decoded stop list, rebuilt only when it changes."""
+    global _grid, _grid_source  # pylint: disable=global-statement
+    with _grid_lock:
+        if _grid is None or stops is not _grid_source:
+            with phase("parse"):
+                _grid = StopGrid(stops["data"])
+            _grid_source = stops
+        return _grid
+
+
+def _search_bus_kmb_journeys(
+    origin: str, destination: str, limit: Optional[int] = 5, lang: Optional[str] = "en"
+) -> Dict:
+    """Search direct and one-transfer journeys between two stops"""
+    route_stops = fetch_json_data(
+        ROUTE_STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+    )
+    stops = fetch_json_data(
+        STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+    )
+    return _search_journeys(route_stops, stops, origin, destination, limit, lang)
+
+
+async def _asearch_bus_kmb_journeys(
+    origin: str, destination: str, limit: Optional[int] = 5, lang: Optional[str] = "en"
+) -> Dict:
+    """Asynchronous _search_bus_kmb_journeys() over the shared pooled HTTP client"""
+    route_stops, stops = await asyncio.gather(
+        afetch_json_data(
+            ROUTE_STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+        ),
+        afetch_json_data(
+            STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+        ),
+    )
+    return _search_journeys(route_stops, stops, origin, destination, limit, lang)
+
+
+@phase("filter")
+def _search_journeys(
+    route_stops: Dict,
+    stops: Dict,
+    origin: str,
+    destination: str,
+    limit: Optional[int],
+    lang: Optional[str],
+) -> Dict:
+    """Answer a journey search from the route-stop graph"""
+    for data in (route_stops, stops):
+        if "error" in data:
+            return {"type": "Error", "error": data["error"]}
+    if lang not in ["en", "tc", "sc"]:
+        lang = "en"
+    limit = min(max(limit or 5, 1), MAX_RESULTS)
+
+    graph = _route_graph(route_stops, stops)
+    origins = graph.find_stops(origin or "")
+    if not origins:
+        return {"type": "Error", "error": f"No stop matches origin {origin}"}
+    destinations = graph.find_stops(destination or "")
+    if not destinations:
+        return {"type": "Error", "error": f"No stop matches destination {destination}"}
+
+    return {
+        "type": "JourneyOptions",
+        "data": {
+            "origin_stops": [_format_stop(graph, stop, lang) for stop in origins],
+            "destination_stops": [_format_stop(graph, stop, lang) for stop in destinations],
+            "direct": [
+                _format_leg(graph, leg, lang)
+                for leg in graph.direct(origins, destinations)[:limit]
+            ],
+            "one_transfer": [
+                {
+                    "stops": first.stops + second.stops,
+                    "legs": [_format_leg(graph, first, lang), _format_leg(graph, second, lang)],
+                }
+                for first, second in graph.one_transfer(origins, destinations, limit)
+            ],
+        },
+    }
+
+
+def _format_stop(graph: RouteGraph, stop: int, lang: str) -> Dict:
+    """Describe a stop by ID and name in the requested language"""
+    return {"stop": graph.stop_ids[stop], "name": graph.names[lang][stop]}
+
+
+def _format_leg(graph: RouteGraph, leg: Leg, lang: str) -> Dict:
+    """Describe one ride with its boarding and alighting stops"""
+    route, bound, service_type = graph.patterns[leg.pattern]
+    stops = graph.pattern_stop_ids(leg.pattern)
+    return {
+        "route": route,
+        "bound": "outbound" if bound == "O" else "inbound",
+        "service_type": service_type,
+        "board": _format_stop(graph, stops[leg.board], lang),
+        "alight": _format_stop(graph, stops[leg.alight], lang),
+        "stops": leg.stops,
+    }
+
+
+def _get_bus_kmb_nearest_stops(
+    latitude: float,
+    longitude: float,
+    k: Optional[int] = 5,
+    max_distance: Optional[float] = None,
+    lang: Optional[str] = "en",
+) -> Dict:
+    """Get the bus stops nearest to a location with the routes serving them"""
+    route_stops = fetch_json_data(
+        ROUTE_STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+    )
+    stops = fetch_json_data(
+        STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+    )
+    return _nearest_stops(route_stops, stops, latitude, longitude, k, max_distance, lang)
+
+
+async def _aget_bus_kmb_nearest_stops(
+    latitude: float,
+    longitude: float,
+    k: Optional[int] = 5,
+    max_distance: Optional[float] = None,
+    lang: Optional[str] = "en",
+) -> Dict:
+    """Asynchronous _get_bus_kmb_nearest_stops() over the shared pooled HTTP client"""
+    route_stops, stops = await asyncio.gather(
+        afetch_json_data(
+            ROUTE_STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+        ),
+        afetch_json_data(
+            STOP_URL, timeout=30, ttl=NETWORK_TTL, max_stale=NETWORK_MAX_STALE
+        ),
+    )
+    return _nearest_stops(route_stops, stops, latitude, longitude, k, max_distance, lang)
+
+
+@phase("filter")
+def _nearest_stops(
+    route_stops: Dict,
+    stops: Dict,
+    latitude: float,
+    longitude: float,
+    k: Optional[int],
+    max_distance: Optional[float],
+    lang: Optional[str],
+) -> Dict:
+    """Answer a nearest-stop query from the stop grid and the route-stop graph"""
+    for data in (route_stops, stops):
+        if "error" in data:
+            return {"type": "Error", "error": data["error"]}
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return {"type": "Error", "error": "latitude or longitude out of range"}
+    if lang not in ["en", "tc", "sc"]:
+        lang = "en"
+    k = min(max(k or 5, 1), MAX_NEAREST)
+
+    grid = _stop_grid(stops)
+    graph = _route_graph(route_stops, stops)
+    nearby = []
+    for index, distance in grid.nearest(latitude, longitude, k, max_distance):
+        stop_id = grid.stop_ids[index]
+        stop = graph.stop(stop_id)
+        routes = [] if stop is None else sorted({graph.patterns[p] for p, _ in graph.serving(stop)})
+        nearby.append(
+            {
+                "stop": stop_id,
+                "name": graph.names[lang][stop] if stop is not None else "",
+                "lat": grid.lat[index],
+                "long": grid.lon[index],
+                "distance_m": round(distance),
+                "routes": [
+                    {
+                        "route": route,
+                        "bound": "outbound" if bound == "O" else "inbound",
+                        "service_type": service_type,
+                    }
+                    for route, bound, service_type in routes
+                ],
+            }
+        )
+    return {"type": "NearbyStops", "data": nearby}
@@ -0,0 +1,204 @@
+"""
+Compact route-stop graph of the KMB/Long Win network for journey search.
+
+Stops and route patterns (route, bound, service type) are numbered with integers. The
+stop sequence of every pattern and, inversely, the patterns serving every stop are held
+in CSR form: one offsets array per relation pointing into a flat array of integers. The
+whole network fits in a few hundred kilobytes of arrays. Malformed upstream rows are
+skipped and counted, so one bad row does not take down journey search.
+"""
+
+import logging
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ("en", "tc", "sc")
+
+# (route, bound, service_type)
+Pattern = Tuple[str, str, str]
+
+
+class Leg:
+    """One ride on a route pattern, between two positions along it."""
+
+    __slots__ = ("pattern", "board", "alight")
+
+    def __init__(self, pattern: int, board: int, alight: int):
+        self.pattern = pattern
+        self.board = board
+        self.alight = alight
+
+    @property
+    def stops(self) -> int:
+        """Number of stops travelled."""
+        return self.alight - self.board
+
+
+class RouteGraph:
+    """Route patterns and the stops they serve, in CSR adjacency arrays."""
+
+    def __init__(self, route_stops: Iterable[Dict], stops: Iterable[Dict]):
+        self.stop_ids: List[str] = []
+        self._stop_index: Dict[str, int] = {}
+        self.names: Dict[str, List[str]] = {lang: [] for lang in LANGUAGES}
+        # Casefolded names in every language, for substring search
+        self._search_names: List[str] = []
+        self.lat = array("d")
+        self.lon = array("d")
+        # Upstream rows left out because a field was missing or unparseable
+        self.skipped = 0
+        for stop in stops:
+            try:
+                self._add_stop(stop["stop"], stop)
+            except (KeyError, TypeError, ValueError):
+                self.skipped += 1
+
+        sequences: Dict[Pattern, List[Tuple[int, int]]] = {}
+        for row in route_stops:
+            try:
+                key = (row["route"], row["bound"], str(row["service_type"]))
+                seq, stop_id = int(row["seq"]), row["stop"]
+                stop = self._stop_index.get(stop_id)
+                if stop is None:
+                    stop = self._add_stop(stop_id, {})
+            except (KeyError, TypeError, ValueError):
+                self.skipped += 1
+                continue
+            sequences.setdefault(key, []).append((seq, stop))
+        if self.skipped:
+            logger.warning("Skipped %d malformed KMB stop and route-stop rows", self.skipped)
+
+        # Pattern -> stops in travel order
+        self.patterns: List[Pattern] = sorted(sequences)
+        self.pattern_offsets = array("I", [0])
+        self.pattern_stops = array("I")
+        for key in self.patterns:
+            self.pattern_stops.extend(stop for _, stop in sorted(sequences[key]))
+            self.pattern_offsets.append(len(self.pattern_stops))
+
+        # Stop -> (pattern, position along it), built by counting sort
+        counts = [0] * (len(self.stop_ids) + 1)
+        for stop in self.pattern_stops:
+            counts[stop + 1] += 1
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        self.stop_offsets = array("I", counts)
+        self.stop_patterns = array("I", bytes(4 * len(self.pattern_stops)))
+        self.stop_positions = array("I", bytes(4 * len(self.pattern_stops)))
+        cursor = list(counts[:-1])
+        for pattern in range(len(self.patterns)):
+            start = self.pattern_offsets[pattern]
+            for position in range(self.pattern_offsets[pattern + 1] - start):
+                stop = self.pattern_stops[start + position]
+                slot = cursor[stop]
+                self.stop_patterns[slot] = pattern
+                self.stop_positions[slot] = position
+                cursor[stop] = slot + 1
+
+    def _add_stop(self, stop_id: str, stop: Dict) -> int:
+        # Parse the coordinates first, so a malformed stop adds nothing
+        if not isinstance(stop_id, str):
+            raise TypeError("stop ID must be a string")
+        lat, lon = float(stop.get("lat") or 0.0), float(stop.get("long") or 0.0)
+        index = len(self.stop_ids)
+        self.stop_ids.append(stop_id)
+        self._stop_index[stop_id] = index
+        for lang in LANGUAGES:
+            self.names[lang].append(stop.get(f"name_{lang}") or "")
+        self._search_names.append(
+            "\n".join(self.names[lang][index] for lang in LANGUAGES).casefold()
+        )
+        self.lat.append(lat)
+        self.lon.append(lon)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
+    def stop(self, stop_id: str) -> Optional[int]:
+        """Return the integer ID of a stop, or None if unknown."""
+        return self._stop_index.get(stop_id)
+
+    def find_stops(self, text: str, limit: int = 20) -> List[int]:
+        """Resolve a stop ID, or stops whose name contains text in any language."""
+        exact = self._stop_index.get(text.strip())
+        if exact is not None:
+            return [exact]
+        needle = text.strip().casefold()
+        if not needle:
+            return []
+        matches = []
+        for i, names in enumerate(self._search_names):
+            if needle in names:
+                matches.append(i)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def pattern_stop_ids(self, pattern: int) -> Sequence[int]:
+        """Stops of a pattern in travel order."""
+        start, end = self.pattern_offsets[pattern], self.pattern_offsets[pattern + 1]
+        return self.pattern_stops[start:end]
+
+    def serving(self, stop: int) -> Iterable[Tuple[int, int]]:
+        """Yield (pattern, position) for every pattern calling at stop."""
+        for slot in range(self.stop_offsets[stop], self.stop_offsets[stop + 1]):
+            yield self.stop_patterns[slot], self.stop_positions[slot]
+
+    def direct(self, origins: Sequence[int], destinations: Sequence[int]) -> List[Leg]:
+        """Shortest ride on each pattern that calls at an origin and later at a destination."""
+        boarding: Dict[int, List[int]] = {}
+        for stop in origins:
+            for pattern, position in self.serving(stop):
+                boarding.setdefault(pattern, []).append(position)
+
+        best: Dict[int, Leg] = {}
+        for stop in destinations:
+            for pattern, position in self.serving(stop):
+                earlier = [p for p in boarding.get(pattern, ()) if p < position]
+                if not earlier:
+                    continue
+                leg = Leg(pattern, max(earlier), position)
+                if pattern not in best or leg.stops < best[pattern].stops:
+                    best[pattern] = leg
+        return sorted(best.values(), key=lambda leg: (leg.stops, self.patterns[leg.pattern]))
+
+    def one_transfer(
+        self, origins: Sequence[int], destinations: Sequence[int], limit: int = 5
+    ) -> List[Tuple[Leg, Leg]]:
+        """
+        Fewest-stop journeys changing once between two patterns at a shared stop.
+
+        At most one journey is returned per pair of patterns.
+        """
+        # Fewest stops from any origin to every stop reachable on one pattern
+        reach: Dict[int, Leg] = {}
+        for stop in origins:
+            for pattern, position in self.serving(stop):
+                start = self.pattern_offsets[pattern]
+                end = self.pattern_offsets[pattern + 1]
+                for offset in range(position + 1, end - start):
+                    transfer = self.pattern_stops[start + offset]
+                    known = reach.get(transfer)
+                    if known is None or offset - position < known.stops:
+                        reach[transfer] = Leg(pattern, position, offset)
+
+        best: Dict[Tuple[int, int], Tuple[Leg, Leg]] = {}
+        for stop in destinations:
+            for pattern, position in self.serving(stop):
+                start = self.pattern_offsets[pattern]
+                for offset in range(position):
+                    first = reach.get(self.pattern_stops[start + offset])
+                    if first is None or first.pattern == pattern:
+                        continue
+                    second = Leg(pattern, offset, position)
+                    key = (first.pattern, pattern)
+                    total = first.stops + second.stops
+                    if key not in best or total < best[key][0].stops + best[key][1].stops:
+                        best[key] = (first, second)
+        return sorted(
+            best.values(),
+            key=lambda legs: (legs[0].stops + legs[1].stops, legs[0].pattern, legs[1].pattern),
+        )[:limit]
@@ -0,0 +1,151 @@
+"""
+Lookup indexes over the KMB/Long Win route list.
+
+The route list is indexed once per upstream payload: route numbers are kept sorted for
+exact and prefix lookups, and the origin and destination names in every language are
+indexed by character and character bigram so substring searches only verify a few
+candidate rows.
+"""
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+LANGUAGES = ("en", "tc", "sc")
+BOUNDS = {"O": "outbound", "I": "inbound"}
+FIELDS = {"origin": "orig", "destination": "dest"}
+
+
+def _grams(text: str) -> Set[str]:
+    """Return the character bigrams of a query token, or its only character."""
+    if len(text) == 1:
+        return {text}
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def _indexed_grams(text: str) -> Set[str]:
+    """Return every character and character bigram of an indexed name."""
+    return set(text) | _grams(text)
+
+
+def normalize_bound(bound: Optional[str]) -> Optional[str]:
+    """Map outbound/inbound (or O/I) to the upstream bound code, None if unrecognised."""
+    if bound is None:
+        return None
+    value = bound.strip().upper()
+    if value in BOUNDS:
+        return value
+    for code, name in BOUNDS.items():
+        if value == name.upper():
+            return code
+    return None
+
+
+class RouteIndex:
+    """Prebuilt indexes over one decoded route list payload."""
+
+    def __init__(self, routes: List[Dict]):
+        self.routes = routes
+        self._by_route: Dict[str, List[int]] = {}
+        self._text: Dict[str, List[str]] = {field: [] for field in FIELDS}
+        self._grams: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FIELDS}
+        for i, route in enumerate(routes):
+            self._by_route.setdefault(route["route"].upper(), []).append(i)
+            for field, prefix in FIELDS.items():
+                names = [
+                    str(route.get(f"{prefix}_{lang}") or "").casefold() for lang in LANGUAGES
+                ]
+                self._text[field].append("\n".join(names))
+                index = self._grams[field]
+                for name in names:
+                    for gram in _indexed_grams(name):
+                        index.setdefault(gram, set()).add(i)
+        self._route_keys = sorted(self._by_route)
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def route_rows(self, route: str) -> List[int]:
+        """Rows whose route number equals route (case-insensitive)."""
+        return list(self._by_route.get(route.strip().upper(), ()))
+
+    def prefix_rows(self, prefix: str) -> List[int]:
+        """Rows whose route number starts with prefix (case-insensitive)."""
+        prefix = prefix.strip().upper()
+        rows = []
+        for key in self._route_keys[bisect_left(self._route_keys, prefix) :]:
+            if not key.startswith(prefix):
+                break
+            rows.extend(self._by_route[key])
+        return rows
+
+    def text_rows(self, field: str, query: str) -> Set[int]:
+        """
+        Rows whose field ('origin' or 'destination') contains every whitespace-separated
+        token of query as a substring, in any language.
+        """
+        tokens = query.casefold().split()
+        if not tokens:
+            return set(range(len(self.routes)))
+        index = self._grams[field]
+        text = self._text[field]
+        rows: Optional[Set[int]] = None
+        for token in tokens:
+            candidates = None
+            for gram in _grams(token):
+                posting = index.get(gram, set())
+                candidates = posting if candidates is None else candidates & posting
+                if not candidates:
+                    return set()
+            matched = {i for i in candidates if token in text[i]}
+            rows = matched if rows is None else rows & matched
+            if not rows:
+                return set()
+        return rows
+
+    def search(
+        self,
+        route: Optional[str] = None,
+        route_prefix: Optional[str] = None,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        bound: Optional[str] = None,
+        service_type: Optional[str] = None,
+    ) -> List[Dict]:
+        """Return the upstream rows matching every given criterion, in upstream order."""
+        return [
+            self.routes[i]
+            for i in self.match(route, route_prefix, origin, destination, bound, service_type)
+        ]
+
+    def match(
+        self,
+        route: Optional[str] = None,
+        route_prefix: Optional[str] = None,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        bound: Optional[str] = None,
+        service_type: Optional[str] = None,
+    ) -> List[int]:
+        """Return the positions of the rows matching every given criterion, ascending."""
+        candidates: Optional[Iterable[int]] = None
+        if route:
+            candidates = self.route_rows(route)
+        if route_prefix:
+            rows = self.prefix_rows(route_prefix)
+            candidates = rows if candidates is None else set(candidates) & set(rows)
+        for field, query in (("origin", origin), ("destination", destination)):
+            if query:
+                rows = self.text_rows(field, query)
+                candidates = rows if candidates is None else set(candidates) & rows
+        if candidates is None:
+            candidates = range(len(self.routes))
+
+        results = []
+        for i in sorted(candidates):
+            row = self.routes[i]
+            if bound is not None and row["bound"] != bound:
+                continue
+            if service_type is not None and str(row["service_type"]) != service_type:
+                continue
+            results.append(i)
+        return results
@@ -0,0 +1,115 @@
+"""
+Uniform grid spatial index over KMB stop coordinates for nearest-stop queries.
+
+Stops are bucketed into cells of CELL_DEGREES on each side. A query scans rings of cells
+around its own cell and stops as soon as no unscanned cell can hold a closer stop, so a
+lookup touches a handful of cells rather than the whole stop list.
+"""
+
+import heapq
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# About 550 m of latitude; a Hong Kong cell holds a few dozen stops at most
+CELL_DEGREES = 0.005
+METERS_PER_DEGREE = 6371000 * math.pi / 180
+
+
+class StopGrid:
+    """Grid buckets of stop positions, keyed by (latitude cell, longitude cell)."""
+
+    def __init__(self, stops: Iterable[Dict]):
+        self.stop_ids: List[str] = []
+        self.lat = array("d")
+        self.lon = array("d")
+        self._cells: Dict[Tuple[int, int], array] = {}
+        for stop in stops:
+            try:
+                lat, lon = float(stop["lat"]), float(stop["long"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            index = len(self.stop_ids)
+            self.stop_ids.append(stop["stop"])
+            self.lat.append(lat)
+            self.lon.append(lon)
+            self._cells.setdefault(self._cell(lat, lon), array("I")).append(index)
+        rows = [cell[0] for cell in self._cells] or [0]
+        cols = [cell[1] for cell in self._cells] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES)
+
+    def _ring(self, row: int, col: int, radius: int) -> Iterable[array]:
+        """Yield the buckets of the cells exactly radius cells away from (row, col)."""
+        cells = self._cells
+        if radius == 0:
+            bucket = cells.get((row, col))
+            if bucket is not None:
+                yield bucket
+            return
+        for r in range(row - radius, row + radius + 1):
+            step = 1 if r in (row - radius, row + radius) else 2 * radius
+            for c in range(col - radius, col + radius + 1, step):
+                bucket = cells.get((r, c))
+                if bucket is not None:
+                    yield bucket
+
+    def _distance(self, index: int, lat: float, lon: float, lon_scale: float) -> float:
+        # Equirectangular distances are accurate to well under a metre at city scale
+        dy = self.lat[index] - lat
+        dx = (self.lon[index] - lon) * lon_scale
+        return math.hypot(dx, dy) * METERS_PER_DEGREE
+
+    def nearest(
+        self, lat: float, lon: float, k: int, max_distance: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (stop index, distance in metres) pairs, nearest first."""
+        if not self.stop_ids or k <= 0:
+            return []
+        lon_scale = math.cos(math.radians(lat))
+        row, col = self._cell(lat, lon)
+        min_row, max_row, min_col, max_col = self._bounds
+        max_radius = max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+        # Distance covered by each ring in the narrower of the two cell dimensions
+        ring_width = CELL_DEGREES * min(1.0, lon_scale) * METERS_PER_DEGREE
+
+        best: List[Tuple[float, int]] = []
+        for radius in range(max_radius + 1):
+            # Far from every stop the rings are mostly empty; scanning all stops is cheaper
+            if (2 * radius + 1) ** 2 > 4 * len(self._cells) + 9:
+                return self._scan(lat, lon, k, max_distance)
+            for bucket in self._ring(row, col, radius):
+                for index in bucket:
+                    distance = self._distance(index, lat, lon, lon_scale)
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, index))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, index))
+            # Stops in later rings are at least radius * ring_width away
+            reach = radius * ring_width
+            if len(best) == k and -best[0][0] <= reach:
+                break
+            if max_distance is not None and reach > max_distance:
+                break
+        return [(index, -negative) for negative, index in sorted(best, reverse=True)]
+
+    def _scan(
+        self, lat: float, lon: float, k: int, max_distance: Optional[float]
+    ) -> List[Tuple[int, float]]:
+        """nearest() by measuring every stop."""
+        lon_scale = math.cos(math.radians(lat))
+        distances = (
+            (index, self._distance(index, lat, lon, lon_scale))
+            for index in range(len(self.stop_ids))
+        )
+        if max_distance is not None:
+            distances = (item for item in distances if item[1] <= max_distance)
+        return heapq.nsmallest(k, distances, key=lambda item: item[1])
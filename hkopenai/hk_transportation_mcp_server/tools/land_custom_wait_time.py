@@ -1,61 +1,207 @@
 """Tool for fetching Land Boundary Control Points Waiting Time in Hong Kong."""
 
-from typing import Dict, Annotated, Optional
-from pydantic import Field
-from hkopenai_common.json_utils import fetch_json_data
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from ..http_cache import afetch_json_data, fetch_json_data, http_cache, mark_stale, warm_json_data
+from ..metrics import phase
+from ..storage import data_dir
+from .schemas.land_custom_wait_time import (  # pylint: disable=unused-import
+    CONTROL_POINTS,
+    POLL_INTERVAL,
+    register,
+)
+from .wait_time_history import DIRECTIONS, HISTORY_PERSIST, MISSING, WaitTimeHistory
 
+logger = logging.getLogger(__name__)
 
-def register(mcp):
-    """Register the get_land_boundary_wait_times tool with the MCP server."""
+URL = "https://secure1.info.gov.hk/immd/mobileapps/2bb9ae17/data/CPQueueTimeR.json"
+
+# The queue status feed changes every few minutes, so keep it fresher than the default TTL
+WAIT_TIMES_TTL = 30
+# A queue status this far past its TTL no longer says much, so stop serving it stale
+WAIT_TIMES_MAX_STALE = 60
+
+http_cache.persist(URL)
+
+# Upper bound on the retry delay while the upstream keeps failing
+POLL_MAX_BACKOFF = float(os.environ.get("HK_TRANSPORT_WAIT_TIMES_MAX_BACKOFF", "300"))
+
+LANGUAGES = ("en", "tc", "sc")
+HONG_KONG_TIME = timezone(timedelta(hours=8))
+
+STATUS_CODES = {
+    0: "Normal (Generally less than 15 mins)",
+    1: "Busy (Generally less than 30 mins)",
+    2: "Very Busy (Generally 30 mins or above)",
+    4: "System Under Maintenance",
+    99: "Non Service Hours",
+}
+
+
+class WaitTimesSnapshot:
+    """Decoded queue feed with responses pre-rendered for every supported language."""
+
+    __slots__ = ("data", "rendered", "fetched_at")
+
+    def __init__(self, data: Dict, fetched_at: float):
+        self.data = data
+        self.rendered = {lang: _format_wait_times(data, lang) for lang in LANGUAGES}
+        self.fetched_at = fetched_at
+
+    @phase("filter")
+    def response(self, lang: str) -> Dict:
+        """Return the response for lang annotated with the snapshot age in seconds."""
+        rendered = self.rendered.get(lang) or _format_wait_times(self.data, lang)
+        age = time.monotonic() - self.fetched_at
+        return {
+            "type": rendered["type"],
+            "data": {**rendered["data"], "snapshot_age_seconds": round(age, 1)},
+        }
+
+
+class WaitTimesPoller:
+    """
+    Background thread that keeps the latest queue feed snapshot in memory.
+
+    Polls every interval seconds while the upstream is healthy and backs off
+    exponentially, up to max_backoff seconds, while it keeps failing.
+    """
+
+    def __init__(self, interval: float = POLL_INTERVAL, max_backoff: float = POLL_MAX_BACKOFF):
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.snapshot: Optional[WaitTimesSnapshot] = None
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the polling thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start polling in a daemon thread if not already running."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="wait-times-poller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop polling and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def poll_once(self) -> float:
+        """Fetch the feed once, update the snapshot and return the delay before the next poll."""
+        # A zero TTL always revalidates, which costs only a 304 when nothing changed
+        data = fetch_json_data(URL, timeout=10, ttl=0)
+        if "error" in data:
+            return self._backoff()
+        self.failures = 0
+        self.snapshot = WaitTimesSnapshot(data, time.monotonic())
+        _record(data, every_poll=True)
+        return self.interval
+
+    def _backoff(self) -> float:
+        """Count a failed poll and return the delay before the next one."""
+        self.failures += 1
+        # The exponent is capped so a long outage cannot overflow the float multiply
+        return min(self.interval * 2 ** min(self.failures, 32), self.max_backoff)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                delay = self.poll_once()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Keep polling: a dead thread would freeze the snapshot until a restart
+                logger.exception("Polling the land boundary queue feed failed")
+                delay = self._backoff()
+            self._stop.wait(delay)
 
-    @mcp.tool(
-        description="Fetch current waiting times at land boundary control points in Hong Kong."
-    )
-    def get_land_boundary_wait_times(
-        lang: Annotated[
-            Optional[str],
-            Field(
-                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
-                json_schema_extra={"enum": ["en", "tc", "sc"]},
-            ),
-        ] = "en",
-    ) -> Dict:
-        """Get current waiting times at land boundary control points in Hong Kong."""
-        return _get_land_boundary_wait_times(str(lang))
+
+poller = WaitTimesPoller()
+
+
+def _history_path() -> Optional[str]:
+    """Return the history file path when persistence is enabled."""
+    directory = data_dir("wait_times") if HISTORY_PERSIST else None
+    return os.path.join(directory, "history.bin") if directory else None
+
+
+history = WaitTimeHistory(CONTROL_POINTS, path=_history_path())
+_last_recorded: Optional[Dict] = None
+
+
+def _record(data: Dict, every_poll: bool = False) -> None:
+    """
+    Record a decoded feed in the history buffer.
+
+    Polls are recorded every time so samples stay evenly spaced; on-demand fetches are
+    only recorded when they returned a new payload rather than a cached one.
+    """
+    global _last_recorded  # pylint: disable=global-statement
+    if "error" in data or (not every_poll and data is _last_recorded):
+        return
+    _last_recorded = data
+    history.record(time.time(), data)
+
+
+def warm_start() -> None:
+    """Load the queue feed snapshot, revalidating it in the background if expired."""
+    global _last_recorded  # pylint: disable=global-statement
+    data = warm_json_data(URL, timeout=10, ttl=WAIT_TIMES_TTL)
+    if data is not None:
+        # The snapshot was sampled by an earlier process; do not record it as a new sample
+        _last_recorded = data
 
 
 def _get_land_boundary_wait_times(lang: str) -> Dict:
     """Fetch land boundary control points waiting times."""
-    control_points = {
-        "HYW": "Heung Yuen Wai",
-        "HZM": "Hong Kong-Zhuhai-Macao Bridge",
-        "LMC": "Lok Ma Chau",
-        "LSC": "Lok Ma Chau Spur Line",
-        "LWS": "Lo Wu",
-        "MKT": "Man Kam To",
-        "SBC": "Shenzhen Bay",
-        "STK": "Sha Tau Kok",
-    }
-    status_codes = {
-        0: "Normal (Generally less than 15 mins)",
-        1: "Busy (Generally less than 30 mins)",
-        2: "Very Busy (Generally 30 mins or above)",
-        4: "System Under Maintenance",
-        99: "Non Service Hours",
-    }
-    url = "https://secure1.info.gov.hk/immd/mobileapps/2bb9ae17/data/CPQueueTimeR.json"
-    data = fetch_json_data(url, timeout=10)
+    snapshot = poller.snapshot
+    if snapshot is not None:
+        return snapshot.response(lang)
+    data = fetch_json_data(
+        URL, timeout=10, ttl=WAIT_TIMES_TTL, max_stale=WAIT_TIMES_MAX_STALE
+    )
+    _record(data)
+    return mark_stale(_format_wait_times(data, lang), URL, WAIT_TIMES_TTL)
+
+
+async def _aget_land_boundary_wait_times(lang: str) -> Dict:
+    """Asynchronous _get_land_boundary_wait_times() over the shared pooled HTTP client."""
+    snapshot = poller.snapshot
+    if snapshot is not None:
+        return snapshot.response(lang)
+    data = await afetch_json_data(
+        URL, timeout=10, ttl=WAIT_TIMES_TTL, max_stale=WAIT_TIMES_MAX_STALE
+    )
+    _record(data)
+    return mark_stale(_format_wait_times(data, lang), URL, WAIT_TIMES_TTL)
 
+
+@phase("filter")
+def _format_wait_times(data: Dict, lang: str) -> Dict:
+    """Map upstream queue status codes to descriptions for every control point."""
     if "error" in data:
         return {"type": "Error", "error": data["error"]}
 
     wait_times = []
-    for code, name in control_points.items():
+    for code, name in CONTROL_POINTS.items():
         if code in data:
             arr_status = data[code].get("arrQueue", 99)
             dep_status = data[code].get("depQueue", 99)
-            arr_desc = status_codes.get(arr_status, "Unknown")
-            dep_desc = status_codes.get(dep_status, "Unknown")
+            arr_desc = STATUS_CODES.get(arr_status, "Unknown")
+            dep_desc = STATUS_CODES.get(dep_status, "Unknown")
             wait_times.append(
                 {
                     "name": name,
@@ -79,4 +225,61 @@ def _get_land_boundary_wait_times(lang: str) -> Dict:
     }
 
 
+def _describe_status(status: Optional[int]) -> Optional[str]:
+    """Describe a recorded status code."""
+    if status is None:
+        return None
+    if status == MISSING:
+        return "Data not available"
+    return STATUS_CODES.get(status, "Unknown")
+
+
+def _format_time(timestamp: float) -> str:
+    """Format a UNIX timestamp as ISO 8601 in Hong Kong time."""
+    return datetime.fromtimestamp(timestamp, HONG_KONG_TIME).isoformat(timespec="seconds")
+
+
+@phase("filter")
+def _get_land_boundary_wait_time_history(
+    code: str, hours: Optional[float] = 6, bucket_minutes: Optional[int] = None
+) -> Dict:
+    """Answer a history query from the in-memory ring buffer without any upstream call."""
+    if code not in CONTROL_POINTS:
+        return {
+            "type": "Error",
+            "error": f"Unknown control point code {code}. Use one of {', '.join(CONTROL_POINTS)}",
+        }
+    if hours is None or hours <= 0:
+        hours = 6
+    if bucket_minutes is not None and bucket_minutes <= 0:
+        return {"type": "Error", "error": "bucket_minutes must be a positive integer"}
 
+    since = time.time() - hours * 3600
+    data = {"name": CONTROL_POINTS[code], "code": code, "window_hours": hours}
+    if bucket_minutes:
+        data["bucket_minutes"] = bucket_minutes
+        data["buckets"] = [
+            {
+                "start": _format_time(bucket["start"]),
+                "samples": bucket["samples"],
+                **{
+                    direction: {
+                        "busiest": _describe_status(bucket[direction]["busiest"]),
+                        "mean_level": bucket[direction]["mean_level"],
+                        "last": _describe_status(bucket[direction]["last"]),
+                    }
+                    for direction in DIRECTIONS
+                },
+            }
+            for bucket in history.buckets(code, since, bucket_minutes * 60)
+        ]
+    else:
+        data["samples"] = [
+            {
+                "time": _format_time(timestamp),
+                "arrival": _describe_status(arrival),
+                "departure": _describe_status(departure),
+            }
+            for timestamp, arrival, departure in history.samples(code, since)
+        ]
+    return {"type": "WaitTimeHistory", "data": data}
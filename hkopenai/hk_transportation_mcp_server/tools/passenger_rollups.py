@@ -0,0 +1,206 @@
+"""
+Materialized rollups of the daily passenger traffic rows by period.
+
+For each period (day, week, month and year) the rollups keep the sums of the count
+columns and the number of days with data, per control point and direction, per control
+point over both directions, per direction over all control points and over everything.
+Each combination is a series of periods in date order held in arrays. Rows are added in
+date order, one whole day at a time, so a refresh only touches the periods of its new
+days and reading a rollup never scans the rows behind it.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+PERIODS = ("day", "week", "month", "year")
+# Series key code standing for every control point or both directions
+ALL = -1
+
+
+def period_start(ordinal: int, period: str) -> int:
+    """Return the ordinal of the first day of the period containing ordinal."""
+    if period == "day":
+        return ordinal
+    if period == "week":
+        return ordinal - date.fromordinal(ordinal).weekday()
+    d = date.fromordinal(ordinal)
+    if period == "month":
+        return date(d.year, d.month, 1).toordinal()
+    return date(d.year, 1, 1).toordinal()
+
+
+def period_label(start: int, period: str) -> str:
+    """Format a period starting at the given ordinal (DD-MM-YYYY, YYYY-Www, YYYY-MM, YYYY)."""
+    d = date.fromordinal(start)
+    if period == "day":
+        return f"{d.day:02d}-{d.month:02d}-{d.year:04d}"
+    if period == "week":
+        year, week, _ = d.isocalendar()
+        return f"{year:04d}-W{week:02d}"
+    if period == "month":
+        return f"{d.year:04d}-{d.month:02d}"
+    return f"{d.year:04d}"
+
+
+def next_period_start(start: int, period: str) -> int:
+    """Return the ordinal of the first day of the period after the one starting at start."""
+    if period == "day":
+        return start + 1
+    if period == "week":
+        return start + 7
+    d = date.fromordinal(start)
+    if period == "month":
+        return date(d.year + d.month // 12, d.month % 12 + 1, 1).toordinal()
+    return date(d.year + 1, 1, 1).toordinal()
+
+
+def period_blocks(first: int, last: int, periods: Sequence[str]) -> Iterator[Tuple[str, int]]:
+    """
+    Cover the days first..last with whole periods, yielding each period and its start.
+
+    periods is ordered longest first and ends with day; each step takes the longest
+    period that starts on the next uncovered day and ends by last.
+    """
+    day = first
+    while day <= last:
+        for period in periods:
+            if period_start(day, period) == day:
+                following = next_period_start(day, period)
+                if following - 1 <= last:
+                    break
+        yield period, day
+        day = following
+
+
+def period_starts(ordinal: int, period: str, count: int) -> List[int]:
+    """Return the starts of count consecutive periods ending with the one holding ordinal."""
+    starts = [period_start(ordinal, period)]
+    while len(starts) < count:
+        starts.append(period_start(starts[-1] - 1, period))
+    return starts
+
+
+class Series:
+    """Sums and day counts of one (control point, direction) key, one slot per period."""
+
+    __slots__ = ("starts", "values", "width")
+
+    def __init__(self, width: int, typecode: str = "q"):
+        self.width = width
+        self.starts = array("i")
+        # Per period the sums of the count columns followed by the number of days
+        self.values = array(typecode)
+
+    def add(self, start: int, sums: Sequence[int]) -> None:
+        """Add sums and a day count to the period at start, which must not precede the last."""
+        if self.starts and self.starts[-1] == start:
+            values = self.values
+            base = len(values) - len(sums)
+            for offset, value in enumerate(sums):
+                values[base + offset] += value
+        else:
+            self.starts.append(start)
+            self.values.extend(sums)
+
+    def get(self, start: int) -> Optional[Tuple[List[int], int]]:
+        """Return the sums and day count of the period starting at start, if it has data."""
+        index = bisect_left(self.starts, start)
+        if index == len(self.starts) or self.starts[index] != start:
+            return None
+        base = index * (self.width + 1)
+        return self.values[base : base + self.width].tolist(), self.values[base + self.width]
+
+
+class PassengerRollups:
+    """Series of every period and (control point, direction) key, grown day by day."""
+
+    def __init__(self, width: int):
+        self.width = width
+        self.series: Dict[str, Dict[Tuple[int, int], Series]] = {p: {} for p in PERIODS}
+        self.last_day = 0
+
+    def add_rows(
+        self,
+        days: Sequence[int],
+        control_points: Sequence[int],
+        directions: Sequence[int],
+        counts: Sequence[Sequence[int]],
+        lo: int,
+        hi: int,
+    ) -> None:
+        """
+        Add rows lo..hi of the columns, whose days must all follow the last day added.
+
+        counts holds one column per count; control points and directions are codes.
+        """
+        width = self.width
+        # Sums of the unfinished period of each period length, written out when it ends
+        pending: Dict[str, Tuple[int, Dict[Tuple[int, int], List[int]]]] = {}
+        while lo < hi:
+            day = days[lo]
+            if day <= self.last_day:
+                raise ValueError("rollup rows must be added in date order")
+            end = bisect_right(days, day, lo, hi)
+            totals: Dict[Tuple[int, int], List[int]] = {}
+            for row in range(lo, end):
+                values = [column[row] for column in counts]
+                control_point, direction = control_points[row], directions[row]
+                for key in (
+                    (control_point, direction),
+                    (control_point, ALL),
+                    (ALL, direction),
+                    (ALL, ALL),
+                ):
+                    acc = totals.get(key)
+                    if acc is None:
+                        totals[key] = values + [1]
+                    else:
+                        for offset in range(width):
+                            acc[offset] += values[offset]
+            for period in PERIODS:
+                start = period_start(day, period)
+                current = pending.get(period)
+                if current is None or current[0] != start:
+                    if current is not None:
+                        self._write(period, *current)
+                    if period == "day":
+                        # A day never continues, so its totals are written out as they are
+                        pending[period] = (start, totals)
+                        continue
+                    current = pending[period] = (start, {})
+                sums = current[1]
+                for key, acc in totals.items():
+                    target = sums.get(key)
+                    if target is None:
+                        sums[key] = acc[:]
+                    else:
+                        for offset in range(width + 1):
+                            target[offset] += acc[offset]
+            self.last_day = day
+            lo = end
+        for period, current in pending.items():
+            self._write(period, *current)
+
+    def _write(self, period: str, start: int, sums: Dict[Tuple[int, int], List[int]]) -> None:
+        series = self.series[period]
+        for key, values in sums.items():
+            target = series.get(key)
+            if target is None:
+                # Daily sums stay far below 2**31, so day series take half the space
+                target = series[key] = Series(self.width, "i" if period == "day" else "q")
+            target.add(start, values)
+
+    def keys(self, period: str, by_control_point: bool, by_direction: bool) -> Iterator[tuple]:
+        """Yield the series keys of period at the requested grouping."""
+        for control_point, direction in self.series[period]:
+            if (control_point != ALL) == by_control_point and (direction != ALL) == by_direction:
+                yield control_point, direction
+
+    def get(
+        self, period: str, start: int, control_point: int = ALL, direction: int = ALL
+    ) -> Optional[Tuple[List[int], int]]:
+        """Return the sums and day count of one period and key, or None without data."""
+        series = self.series[period].get((control_point, direction))
+        return series.get(start) if series is not None else None
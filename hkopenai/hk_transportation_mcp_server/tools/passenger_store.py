@@ -0,0 +1,724 @@
+"""
+Incremental local store for the daily passenger traffic statistics CSV.
+
+Rows are held in memory as date-ordered columns, with control points and directions
+dictionary-encoded and counts stored as integers. The columns are mirrored to
+append-only files on disk. A refresh only decodes CSV lines dated after the store's
+high-water mark, so per-call cost does not grow with the amount of history upstream.
+The period rollups (see passenger_rollups) are built from the columns on first use and
+then extended with the rows each refresh appends.
+
+A store whose files cannot be written logs the failure and carries on in memory only.
+
+A reader store, used by the workers of the multi-worker mode, never writes the files:
+it reloads them whenever the refreshing process has committed new rows.
+"""
+
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Set
+
+from ..http_cache import FETCH_ERRORS, CacheEntry, http_cache
+from ..metrics import phase
+from ..storage import SHARED_READER, atomic_write, data_dir
+from .passenger_rollups import (
+    ALL,
+    PERIODS,
+    PassengerRollups,
+    period_blocks,
+    period_label,
+    period_start,
+    period_starts,
+)
+from .schemas.passenger_traffic import ROW_FIELDS
+
+logger = logging.getLogger(__name__)
+
+URL = "https://www.immd.gov.hk/opendata/eng/transport/immigration_clearance/statistics_on_daily_passenger_traffic.csv"
+
+# The upstream file gains one day of rows per day, so an hourly refresh is plenty
+REFRESH_INTERVAL = float(os.environ.get("HK_TRANSPORT_PASSENGER_REFRESH", "3600"))
+
+# Every row field after the date, control point and direction is a passenger count
+COUNT_COLUMNS = ROW_FIELDS[3:]
+GROUP_BY_OPTIONS = ("control_point", "direction") + PERIODS
+
+_CSV_HEADERS = {
+    "day": "Date",
+    "control_point": "Control Point",
+    "direction": "Arrival / Departure",
+    "hk_residents": "Hong Kong Residents",
+    "mainland_visitors": "Mainland Visitors",
+    "other_visitors": "Other Visitors",
+    "total": "Total",
+}
+_COLUMN_TYPES = {
+    "day": "i",
+    "control_point": "H",
+    "direction": "B",
+    "hk_residents": "i",
+    "mainland_visitors": "i",
+    "other_visitors": "i",
+    "total": "i",
+}
+_META_VERSION = 1
+# Rollup periods that tile each grouping period, longest first
+_BLOCK_PERIODS = {
+    None: ("year", "month", "day"),
+    "year": ("year", "month", "day"),
+    "month": ("month", "day"),
+    "week": ("week", "day"),
+    "day": ("day",),
+}
+
+
+def parse_date(value: str) -> int:
+    """Convert a DD-MM-YYYY string to a proleptic Gregorian day ordinal."""
+    day, month, year = value.split("-")
+    return date(int(year), int(month), int(day)).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def format_date(ordinal: int) -> str:
+    """Convert a day ordinal back to the DD-MM-YYYY format used upstream."""
+    d = date.fromordinal(ordinal)
+    return f"{d.day:02d}-{d.month:02d}-{d.year:04d}"
+
+
+class PassengerStore:
+    """
+    Date-ordered columnar store of passenger traffic rows with optional persistence.
+
+    Rows are sorted by day ordinal, so date ranges are located by bisecting the day
+    column and only the rows in range are touched. A reader store follows the files
+    another store at the same path writes, and only fetches the upstream itself while
+    there are none.
+    """
+
+    def __init__(self, path: Optional[str] = None, reader: bool = False):
+        self.path = path
+        self.reader = reader and bool(path)
+        self._lock = threading.RLock()
+        self._content: Optional[bytes] = None
+        self._refreshing = False
+        self._loaded_meta: Optional[tuple] = None
+        self.refreshed_at = 0.0
+        self._reset()
+        if path:
+            self._load()
+
+    def _reset(self) -> None:
+        self.columns: Dict[str, array] = {
+            name: array(typecode) for name, typecode in _COLUMN_TYPES.items()
+        }
+        self.control_points: List[str] = []
+        self.directions: List[str] = []
+        self._control_point_codes: Dict[str, int] = {}
+        self._direction_codes: Dict[str, int] = {}
+        self._rollups: Optional[PassengerRollups] = None
+
+    def __len__(self) -> int:
+        return len(self.columns["day"])
+
+    @property
+    def high_water(self) -> int:
+        """Ordinal of the newest day held by the store, or 0 when empty."""
+        days = self.columns["day"]
+        return days[-1] if days else 0
+
+    def needs_refresh(self) -> bool:
+        """Whether the last successful refresh is older than REFRESH_INTERVAL."""
+        return time.time() - self.refreshed_at >= REFRESH_INTERVAL
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Bring the store up to date with the upstream CSV and return the number of new rows.
+
+        A reader store with shared files instead picks up whatever rows were committed to
+        them since it last looked, however recent its refresh.
+
+        Raises requests.exceptions.RequestException if the download fails and ValueError
+        if the new rows cannot be decoded.
+        """
+        if self._follow():
+            return self._followed_rows()
+        if not force and not self.needs_refresh():
+            return 0
+        # The store is its own stale copy, so always wait for the upstream here
+        return self._apply(http_cache.fetch(URL, ttl=REFRESH_INTERVAL, max_stale=0))
+
+    async def arefresh(self, force: bool = False) -> int:
+        """Asynchronous refresh() over the shared pooled HTTP client."""
+        if self._follow():
+            return self._followed_rows()
+        if not force and not self.needs_refresh():
+            return 0
+        return self._apply(await http_cache.afetch(URL, ttl=REFRESH_INTERVAL, max_stale=0))
+
+    def refresh_in_background(self) -> bool:
+        """
+        Start refresh() in a daemon thread unless one is already running.
+
+        A failed refresh leaves the store as it was. Returns whether a thread was started;
+        a reader store with shared files reloads them in the calling thread instead.
+        """
+        if self._follow():
+            self._followed_rows()
+            return False
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except (*FETCH_ERRORS, ValueError):
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="passenger-store-refresh", daemon=True).start()
+        return True
+
+    def _follow(self) -> bool:
+        """Whether this is a reader store and the refreshing process has written files."""
+        return self.reader and os.path.exists(self._meta_path())
+
+    def _followed_rows(self) -> int:
+        """Reload the files once their metadata changed and return the number of new rows."""
+        try:
+            stat = os.stat(self._meta_path())
+        except OSError:
+            return 0
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if version == self._loaded_meta:
+                return 0
+            rows = len(self)
+            if not self._load_appended():
+                self._reset()
+                self._load()
+            return max(0, len(self) - rows)
+
+    def _apply(self, entry: CacheEntry) -> int:
+        """Append rows from a fetched CSV body that are newer than the high-water mark."""
+        with self._lock:
+            added = 0
+            if entry.content is not self._content:
+                with phase("parse"):
+                    rows = self._decode_new_rows(entry.content)
+                    if rows:
+                        self._append(rows)
+                        added = len(rows)
+                self._content = entry.content
+            self.refreshed_at = time.time()
+            self._save_meta()
+            return added
+
+    def _decode_new_rows(self, content: bytes) -> List[tuple]:
+        """Decode CSV lines newer than the high-water mark, scanning from the end."""
+        lines = content.decode("utf-8-sig").splitlines()
+        if not lines:
+            return []
+        header = [h.strip() for h in next(csv.reader(lines[:1]))]
+        try:
+            positions = {name: header.index(title) for name, title in _CSV_HEADERS.items()}
+        except ValueError as e:
+            raise ValueError(f"unexpected CSV header {header}: {e}") from e
+        date_pos = positions["day"]
+
+        high_water = self.high_water
+        rows = []
+        for line in reversed(lines[1:]):
+            if not line.strip():
+                continue
+            values = next(csv.reader([line])) if '"' in line else line.split(",")
+            try:
+                day = parse_date(values[date_pos])
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{type(e).__name__} in row {line!r}: {e}") from e
+            if day <= high_water:
+                break
+            rows.append((day, values))
+        rows.reverse()
+        # Keep file order within a day while guaranteeing ascending dates overall
+        rows.sort(key=itemgetter(0))
+
+        decoded = []
+        for day, values in rows:
+            try:
+                decoded.append(
+                    (
+                        day,
+                        values[positions["control_point"]],
+                        values[positions["direction"]],
+                        *(int(values[positions[name]]) for name in COUNT_COLUMNS),
+                    )
+                )
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{type(e).__name__} in row {values!r}: {e}") from e
+        return decoded
+
+    def _code(self, value: str, codes: Dict[str, int], values: List[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _append(self, rows: List[tuple]) -> None:
+        first = len(self)
+        new_columns = {name: array(typecode) for name, typecode in _COLUMN_TYPES.items()}
+        for day, control_point, direction, *counts in rows:
+            new_columns["day"].append(day)
+            new_columns["control_point"].append(
+                self._code(control_point, self._control_point_codes, self.control_points)
+            )
+            new_columns["direction"].append(
+                self._code(direction, self._direction_codes, self.directions)
+            )
+            for name, count in zip(COUNT_COLUMNS, counts):
+                new_columns[name].append(count)
+
+        for name, column in new_columns.items():
+            self.columns[name].extend(column)
+        if self.path and not self.reader:
+            try:
+                for name, column in new_columns.items():
+                    with open(self._column_path(name), "ab") as f:
+                        f.write(column.tobytes())
+            except OSError as e:
+                self._stop_persisting(e)
+        self._roll_up(first)
+
+    def _stop_persisting(self, error: OSError) -> None:
+        """Keep the rows in memory only after the files could not be written."""
+        logger.warning(
+            "Cannot write the passenger traffic store in %s, keeping it in memory: %s",
+            self.path,
+            error,
+        )
+        self.path = None
+
+    def _roll_up(self, first: int) -> None:
+        """Add the rows from index first on to the rollups, once they are materialized."""
+        if self._rollups is not None:
+            columns = self.columns
+            self._rollups.add_rows(
+                columns["day"],
+                columns["control_point"],
+                columns["direction"],
+                [columns[name] for name in COUNT_COLUMNS],
+                first,
+                len(self),
+            )
+
+    def _materialized_rollups(self) -> PassengerRollups:
+        """Return the rollups, building them from every row on first use."""
+        if self._rollups is None:
+            with phase("parse"):
+                self._rollups = PassengerRollups(len(COUNT_COLUMNS))
+                self._roll_up(0)
+        return self._rollups
+
+    def row(self, index: int, fields: Optional[Sequence[str]] = None) -> Dict:
+        """Materialize the row at index as a result dictionary, optionally only some fields."""
+        columns = self.columns
+        if fields is not None:
+            return {name: self._value(name, index) for name in fields}
+        return {
+            "date": format_date(columns["day"][index]),
+            "control_point": self.control_points[columns["control_point"][index]],
+            "direction": self.directions[columns["direction"][index]],
+            "hk_residents": columns["hk_residents"][index],
+            "mainland_visitors": columns["mainland_visitors"][index],
+            "other_visitors": columns["other_visitors"][index],
+            "total": columns["total"][index],
+        }
+
+    def _value(self, name: str, index: int):
+        """Decode one field of the row at index."""
+        columns = self.columns
+        if name == "date":
+            return format_date(columns["day"][index])
+        if name == "control_point":
+            return self.control_points[columns["control_point"][index]]
+        if name == "direction":
+            return self.directions[columns["direction"][index]]
+        return columns[name][index]
+
+    def day_range(self, start: Optional[int] = None, end: Optional[int] = None) -> range:
+        """Return the row index range covering start..end (inclusive day ordinals)."""
+        days = self.columns["day"]
+        lo = 0 if start is None else bisect_left(days, start)
+        hi = len(days) if end is None else bisect_right(days, end)
+        return range(lo, max(lo, hi))
+
+    @staticmethod
+    def _codes(names: Sequence[str], value: Optional[str]) -> Optional[Set[int]]:
+        """Return the codes of the names equal to value ignoring case, or None without value."""
+        if value is None:
+            return None
+        value = value.strip().casefold()
+        return {code for code, name in enumerate(names) if name.casefold() == value}
+
+    def _page(
+        self,
+        start: Optional[int],
+        end: Optional[int],
+        limit: Optional[int],
+        offset: int,
+        stop: Optional[int],
+        control_point: Optional[str] = None,
+        direction: Optional[str] = None,
+    ) -> List[Sequence[int]]:
+        """
+        Return the row indices of a page of the newest-first listing, in order.
+
+        Rows of other control points or directions are skipped by their codes, so they
+        are never decoded and offset and limit count matching rows only.
+        """
+        days = self.columns["day"]
+        span = self.day_range(start, end)
+        lo, hi = span.start, span.stop if stop is None else min(span.stop, stop)
+        remaining = hi - lo if limit is None else limit
+        control_point_codes = self._codes(self.control_points, control_point)
+        direction_codes = self._codes(self.directions, direction)
+        if control_point_codes is not None or direction_codes is not None:
+            control_points = self.columns["control_point"]
+            directions = self.columns["direction"]
+            if control_point_codes is None:
+                control_point_codes = set(range(len(self.control_points)))
+            if direction_codes is None:
+                direction_codes = set(range(len(self.directions)))
+        ranges: List[Sequence[int]] = []
+        # Walk whole days backwards so each day keeps its file order without a sort
+        while hi > lo and remaining > 0:
+            day_start = bisect_left(days, days[hi - 1], lo, hi)
+            rows: Sequence[int] = range(day_start, hi)
+            if control_point_codes is not None:
+                rows = [
+                    i
+                    for i in rows
+                    if control_points[i] in control_point_codes
+                    and directions[i] in direction_codes
+                ]
+            if offset >= len(rows):
+                offset -= len(rows)
+            else:
+                selected = rows[offset : offset + remaining]
+                ranges.append(selected)
+                remaining -= len(selected)
+                offset = 0
+            hi = day_start
+        return ranges
+
+    def query(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        stop: Optional[int] = None,
+        control_point: Optional[str] = None,
+        direction: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Return rows between the start and end day ordinals (inclusive), newest first.
+
+        control_point and direction, matched ignoring case, keep only their rows.
+        offset and limit select a page of that listing. Rows only ever get appended, so
+        passing the same stop (an upper bound on row indices) keeps the listing fixed
+        across pages while refreshes add newer days.
+        """
+        with self._lock:
+            return [
+                self.row(i, fields)
+                for rows in self._page(
+                    start, end, limit, offset, stop, control_point, direction
+                )
+                for i in rows
+            ]
+
+    def table(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        stop: Optional[int] = None,
+        control_point: Optional[str] = None,
+        direction: Optional[str] = None,
+    ) -> List[List]:
+        """
+        query() as value lists in the order of fields (default ROW_FIELDS).
+
+        Each row is read straight from the columns, without building a dictionary.
+        """
+        with self._lock:
+            columns = self.columns
+            getters = []
+            for name in fields or ROW_FIELDS:
+                if name == "date":
+                    getters.append(lambda i, days=columns["day"]: format_date(days[i]))
+                elif name == "control_point":
+                    getters.append(
+                        lambda i, codes=columns["control_point"]: self.control_points[codes[i]]
+                    )
+                elif name == "direction":
+                    getters.append(
+                        lambda i, codes=columns["direction"]: self.directions[codes[i]]
+                    )
+                else:
+                    getters.append(columns[name].__getitem__)
+            return [
+                [get(i) for get in getters]
+                for rows in self._page(
+                    start, end, limit, offset, stop, control_point, direction
+                )
+                for i in rows
+            ]
+
+    def aggregate(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        group_by: Sequence[str] = (),
+    ) -> List[Dict]:
+        """
+        Sum and average the count columns over start..end, grouped by group_by keys.
+
+        group_by may contain control_point, direction and at most one period from
+        PERIODS. Means are daily means: each group's sum divided by its number of days.
+        Groups are returned newest period first. The range is tiled with whole years,
+        months or weeks of the materialized rollups and single days at its edges, so
+        the cost depends on the number of groups, not on the rows in the range.
+        """
+        period = next((g for g in group_by if g in PERIODS), None)
+        by_control_point = "control_point" in group_by
+        by_direction = "direction" in group_by
+        with self._lock:
+            span = self.day_range(start, end)
+            if not span:
+                return []
+            days = self.columns["day"]
+            rollups = self._materialized_rollups()
+            keys = list(rollups.keys("day", by_control_point, by_direction))
+            groups: Dict[tuple, list] = {}
+            for block, block_start in period_blocks(
+                days[span.start], days[span.stop - 1], _BLOCK_PERIODS[period]
+            ):
+                start_of_period = period_start(block_start, period) if period else 0
+                for control_point, direction in keys:
+                    found = rollups.get(block, block_start, control_point, direction)
+                    if found is None:
+                        continue
+                    sums, day_count = found
+                    key = (start_of_period, control_point, direction)
+                    acc = groups.get(key)
+                    if acc is None:
+                        # The sums, then the number of days
+                        groups[key] = [*sums, day_count]
+                    else:
+                        for offset, value in enumerate(sums):
+                            acc[offset] += value
+                        acc[-1] += day_count
+
+            return [
+                self._group(period, *key, groups[key][:-1], groups[key][-1])
+                for key in sorted(groups, key=lambda k: (-k[0], k[1], k[2]))
+            ]
+
+    def rollup(
+        self,
+        period: str,
+        end: Optional[int] = None,
+        count: int = 1,
+        group_by: Sequence[str] = (),
+    ) -> List[Dict]:
+        """
+        Return the materialized sums and daily means of count periods of PERIODS.
+
+        The periods end with the one holding the end day ordinal, default the newest day
+        in the store. group_by may contain control_point and direction. Groups are
+        returned as by aggregate(), newest period first but busiest group first within
+        a period, and only for periods with data. Each group is one lookup, so the cost
+        depends on count and the number of groups, not on the days the periods span.
+        """
+        by_control_point = "control_point" in group_by
+        by_direction = "direction" in group_by
+        with self._lock:
+            if not len(self):
+                return []
+            rollups = self._materialized_rollups()
+            keys = list(rollups.keys(period, by_control_point, by_direction))
+            results = []
+            for start in period_starts(end or self.high_water, period, count):
+                groups = []
+                for control_point, direction in keys:
+                    found = rollups.get(period, start, control_point, direction)
+                    if found is not None:
+                        groups.append(self._group(period, start, control_point, direction, *found))
+                groups.sort(key=lambda group: -group["sum"]["total"])
+                results.extend(groups)
+            return results
+
+    def _group(
+        self,
+        period: Optional[str],
+        start: int,
+        control_point: int,
+        direction: int,
+        sums: Sequence[int],
+        days: int,
+    ) -> Dict:
+        """Format the sums of one group; ALL codes leave their key out."""
+        group: Dict = {}
+        if period:
+            group[period] = period_label(start, period)
+        if control_point != ALL:
+            group["control_point"] = self.control_points[control_point]
+        if direction != ALL:
+            group["direction"] = self.directions[direction]
+        group["days"] = days
+        group["sum"] = dict(zip(COUNT_COLUMNS, sums))
+        group["daily_mean"] = {
+            name: round(value / days, 2) for name, value in zip(COUNT_COLUMNS, sums)
+        }
+        return group
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _save_meta(self) -> None:
+        if not self.path or self.reader:
+            return
+        meta = {
+            "version": _META_VERSION,
+            "rows": len(self),
+            "control_points": self.control_points,
+            "directions": self.directions,
+            "refreshed_at": self.refreshed_at,
+        }
+        try:
+            atomic_write(self._meta_path(), json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            self._stop_persisting(e)
+
+    def _load(self) -> None:
+        """Load persisted columns, discarding bytes from an interrupted append."""
+        try:
+            with open(self._meta_path(), "rb") as f:
+                stat = os.fstat(f.fileno())
+                meta = json.loads(f.read())
+            if meta.get("version") != _META_VERSION:
+                raise ValueError("unsupported store version")
+            rows = meta["rows"]
+            for name, column in self.columns.items():
+                with open(self._column_path(name), "rb") as f:
+                    column.frombytes(f.read(rows * column.itemsize))
+                if len(column) != rows:
+                    raise ValueError(f"column {name} is truncated")
+        except (OSError, ValueError, KeyError):
+            self._reset()
+            if not self.reader:
+                try:
+                    self._discard_files()
+                except OSError as e:
+                    self._stop_persisting(e)
+            return
+        self.control_points = meta["control_points"]
+        self.directions = meta["directions"]
+        self._control_point_codes = {v: i for i, v in enumerate(self.control_points)}
+        self._direction_codes = {v: i for i, v in enumerate(self.directions)}
+        self.refreshed_at = meta.get("refreshed_at", 0.0)
+        self._loaded_meta = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self.reader:
+            return
+        # Drop trailing bytes beyond the committed row count
+        try:
+            for name, column in self.columns.items():
+                with open(self._column_path(name), "r+b") as f:
+                    f.truncate(len(column) * column.itemsize)
+        except OSError as e:
+            self._stop_persisting(e)
+
+    def _load_appended(self) -> bool:
+        """
+        Load only the rows committed since the last load, as a reader store.
+
+        Returns False, with nothing loaded, if the files no longer extend the rows held,
+        for instance because the writing store discarded them.
+        """
+        rows = len(self)
+        if not rows:
+            return False
+        try:
+            with open(self._meta_path(), "rb") as f:
+                stat = os.fstat(f.fileno())
+                meta = json.loads(f.read())
+            count = meta["rows"] - rows + 1
+            if (
+                meta.get("version") != _META_VERSION
+                or count < 1
+                or meta["control_points"][: len(self.control_points)] != self.control_points
+                or meta["directions"][: len(self.directions)] != self.directions
+            ):
+                return False
+            appended = {}
+            for name, column in self.columns.items():
+                new_column = array(column.typecode)
+                # Read from the last row held, which must be unchanged
+                with open(self._column_path(name), "rb") as f:
+                    f.seek((rows - 1) * column.itemsize)
+                    new_column.frombytes(f.read(count * column.itemsize))
+                if len(new_column) != count or new_column[0] != column[-1]:
+                    return False
+                appended[name] = new_column
+        except (OSError, ValueError, KeyError):
+            return False
+        for name, column in appended.items():
+            self.columns[name].extend(column[1:])
+        self.control_points = meta["control_points"]
+        self.directions = meta["directions"]
+        self._control_point_codes = {v: i for i, v in enumerate(self.control_points)}
+        self._direction_codes = {v: i for i, v in enumerate(self.directions)}
+        self.refreshed_at = meta.get("refreshed_at", 0.0)
+        self._loaded_meta = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self._roll_up(rows)
+        return True
+
+    def _discard_files(self) -> None:
+        for name in list(_COLUMN_TYPES) + ["meta"]:
+            path = self._meta_path() if name == "meta" else self._column_path(name)
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+_store: Optional[PassengerStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> PassengerStore:
+    """Return the process-wide passenger store, loading it from disk on first use."""
+    global _store  # pylint: disable=global-statement
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PassengerStore(data_dir("passenger_traffic"), reader=SHARED_READER)
+    return _store
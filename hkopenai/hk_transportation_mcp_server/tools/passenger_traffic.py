@@ -5,104 +5,360 @@ This module provides functionality to retrieve and process daily passenger traff
 from the Hong Kong Immigration Department, including breakdowns by resident type and date range.
 """
 
-from typing import List, Dict, Optional, Union, Annotated
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from pydantic import Field
-from hkopenai_common.csv_utils import fetch_csv_from_url
+from ..http_cache import FETCH_ERRORS, describe_request_error
+from ..metrics import phase
+from ..pagination import encode_cursor, parse_page, table, validate_format
+from .passenger_store import (
+    GROUP_BY_OPTIONS,
+    PERIODS,
+    ROW_FIELDS,
+    URL,
+    PassengerStore,
+    get_store,
+)
+from .schemas.passenger_traffic import (  # pylint: disable=unused-import
+    MAX_ROLLUP_PERIODS,
+    register,
+)
 
+ROLLUP_GROUP_BY_OPTIONS = ("control_point", "direction")
+DIRECTIONS = ("Arrival", "Departure")
 
-def register(mcp):
-    """Registers the get_passenger_stats tool with the MCP server."""
 
-    @mcp.tool(
-        description="The statistics on daily passenger traffic provides figures concerning daily statistics on inbound and outbound passenger trips at all control points since 2021 (with breakdown by Hong Kong Residents, Mainland Visitors and Other Visitors). Return last 7 days data if no date range is specified."
-    )
-    def get_passenger_stats(
-        start_date: Annotated[
-            Optional[str], Field(description="Start date in DD-MM-YYYY format")
-        ] = None,
-        end_date: Annotated[
-            Optional[str], Field(description="End date in DD-MM-YYYY format")
-        ] = None,
-    ) -> Dict:
-        """Get passenger traffic statistics."""
-        return _get_passenger_stats(start_date, end_date)
+def _parse_date_range(
+    start_date: Optional[str], end_date: Optional[str]
+) -> Tuple[Optional[int], Optional[int]]:
+    """Convert DD-MM-YYYY bounds to day ordinals, raising ValueError with a user message."""
+    start_day = None
+    end_day = None
+    if start_date:
+        try:
+            start_day = datetime.strptime(start_date, "%d-%m-%Y").toordinal()
+        except ValueError as e:
+            raise ValueError("Invalid date format for start_date. Use DD-MM-YYYY") from e
+    if end_date:
+        try:
+            end_day = datetime.strptime(end_date, "%d-%m-%Y").toordinal()
+        except ValueError as e:
+            raise ValueError("Invalid date format for end_date. Use DD-MM-YYYY") from e
+    return start_day, end_day
+
+
+def _validate_direction(direction: Optional[str]) -> Optional[str]:
+    """Check a direction filter, raising ValueError with a user message if invalid."""
+    if direction is not None and direction.strip().casefold() not in (
+        d.casefold() for d in DIRECTIONS
+    ):
+        raise ValueError(f"Invalid direction {direction!r}. Use {' or '.join(DIRECTIONS)}")
+    return direction
+
+
+def _default_range(
+    start_date: Optional[str], end_date: Optional[str]
+) -> Tuple[Optional[str], Optional[str]]:
+    """Get last 7 days if no dates specified (including today)"""
+    if not start_date and not end_date:
+        end_date = datetime.now().strftime("%d-%m-%Y")
+        start_date = (datetime.now() - timedelta(days=6)).strftime("%d-%m-%Y")
+    return start_date, end_date
 
 
+@phase("filter")
+def _stats_response(
+    store: PassengerStore,
+    start_day: Optional[int],
+    end_day: Optional[int],
+    limit: Optional[int],
+    position: Optional[Dict],
+    fields: Optional[Tuple[str, ...]],
+    response_format: str = "records",
+    control_point: Optional[str] = None,
+    direction: Optional[str] = None,
+) -> Dict:
+    """Serve one page of the stats listing from the store."""
+    span = store.day_range(start_day, end_day)
+    stop, offset = (position["stop"], position["offset"]) if position else (span.stop, 0)
+    # One row past the page tells whether another page follows
+    fetch = None if limit is None else limit + 1
+    args = (start_day, end_day, fields, fetch, offset, stop, control_point, direction)
+    rows = store.table(*args) if response_format == "columnar" else store.query(*args)
+    more = limit is not None and len(rows) > limit
+    rows = rows[:limit]
+    if response_format == "columnar":
+        response = {"type": "PassengerStats", "data": table(fields or ROW_FIELDS, rows)}
+    else:
+        response = {"type": "PassengerStats", "data": rows}
+    if more:
+        response["next_cursor"] = encode_cursor({"stop": stop, "offset": offset + len(rows)})
+    return response
+
+
+def _validate_group_by(group_by: Optional[List[str]]) -> List[str]:
+    """Apply the default grouping, raising ValueError with a user message if invalid."""
+    group_by = list(group_by or ["control_point"])
+    unknown = [g for g in group_by if g not in GROUP_BY_OPTIONS]
+    if unknown:
+        raise ValueError(
+            f"Invalid group_by {unknown}. Use any of {', '.join(GROUP_BY_OPTIONS)}"
+        )
+    if len([g for g in group_by if g in PERIODS]) > 1:
+        raise ValueError(f"group_by may contain at most one of {', '.join(PERIODS)}")
+    return group_by
 
 
+def _refresh_failure(e: Exception) -> Dict:
+    """Convert a failed store refresh into an error response."""
+    if isinstance(e, ValueError):
+        return {"type": "Error", "error": f"Malformed CSV data: {e}"}
+    return {"type": "Error", "error": describe_request_error(URL, e)}
+
+
+def warm_start() -> None:
+    """Load the persisted store and start refreshing it in the background if it is due."""
+    store = get_store()
+    if store.needs_refresh():
+        store.refresh_in_background()
+
+
+def _serve_stale(store: PassengerStore) -> bool:
+    """
+    Whether the store can answer now while it refreshes in the background.
+
+    Only an empty store makes the caller wait for the upstream.
+    """
+    if len(store) and store.needs_refresh():
+        store.refresh_in_background()
+        return True
+    return False
+
+
+def _mark_stale(store: PassengerStore, response: Dict) -> Dict:
+    """Flag a response served from a store whose refresh is overdue."""
+    if store.needs_refresh():
+        response["stale"] = True
+        response["data_age_seconds"] = round(time.time() - store.refreshed_at)
+    return response
+
 
 def _get_passenger_stats(
-    start_date: Optional[str] = None, end_date: Optional[str] = None
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    response_format: Optional[str] = "records",
+    control_point: Optional[str] = None,
+    direction: Optional[str] = None,
 ) -> Dict:
     """Get passenger traffic statistics"""
-    url = "https://www.immd.gov.hk/opendata/eng/transport/immigration_clearance/statistics_on_daily_passenger_traffic.csv"
-    data = fetch_csv_from_url(url, encoding="utf-8-sig")
+    try:
+        start_day, end_day = _parse_date_range(*_default_range(start_date, end_date))
+        limit, position, fields = parse_page(
+            limit, cursor, fields, ("stop", "offset"), ROW_FIELDS
+        )
+        response_format = validate_format(response_format)
+        direction = _validate_direction(direction)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
 
-    if "error" in data:
-        return {"type": "Error", "error": data["error"]}
+    store = get_store()
+    if not _serve_stale(store):
+        try:
+            store.refresh()
+        except (*FETCH_ERRORS, ValueError) as e:
+            return _refresh_failure(e)
+    response = _stats_response(
+        store,
+        start_day,
+        end_day,
+        limit,
+        position,
+        fields,
+        response_format,
+        control_point,
+        direction,
+    )
+    return _mark_stale(store, response)
 
-    # Get last 7 days if no dates specified (including today)
-    if not start_date and not end_date:
-        end_date = datetime.now().strftime("%d-%m-%Y")
-        start_date = (datetime.now() - timedelta(days=6)).strftime("%d-%m-%Y")
 
-    # Read all data first
-    all_data = []
-    for row in data:
-        # Handle both 'Date' and '\ufeffDate' from BOM
-        date_key = "Date" if "Date" in row else "\ufeffDate"
-        if date_key not in row:
-            continue
-        current_date = row[date_key]
-        current_dt = datetime.strptime(current_date, "%d-%m-%Y")
-        all_data.append(
-            {
-                "dt": current_dt,
-                "data": {
-                    "date": current_date,
-                    "control_point": row["Control Point"],
-                    "direction": row["Arrival / Departure"],
-                    "hk_residents": int(row["Hong Kong Residents"]),
-                    "mainland_visitors": int(row["Mainland Visitors"]),
-                    "other_visitors": int(row["Other Visitors"]),
-                    "total": int(row["Total"]),
-                },
-            }
+async def _aget_passenger_stats(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    response_format: Optional[str] = "records",
+    control_point: Optional[str] = None,
+    direction: Optional[str] = None,
+) -> Dict:
+    """Asynchronous _get_passenger_stats() over the shared pooled HTTP client"""
+    try:
+        start_day, end_day = _parse_date_range(*_default_range(start_date, end_date))
+        limit, position, fields = parse_page(
+            limit, cursor, fields, ("stop", "offset"), ROW_FIELDS
         )
+        response_format = validate_format(response_format)
+        direction = _validate_direction(direction)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
 
-    # Filter by date range
-    start_dt = None
-    end_dt = None
-    if start_date:
+    store = get_store()
+    if not _serve_stale(store):
         try:
-            start_dt = datetime.strptime(start_date, "%d-%m-%Y")
-        except ValueError:
-            return {
-                "type": "Error",
-                "error": "Invalid date format for start_date. Use DD-MM-YYYY",
-            }
-    if end_date:
+            await store.arefresh()
+        except (*FETCH_ERRORS, ValueError) as e:
+            return _refresh_failure(e)
+    response = _stats_response(
+        store,
+        start_day,
+        end_day,
+        limit,
+        position,
+        fields,
+        response_format,
+        control_point,
+        direction,
+    )
+    return _mark_stale(store, response)
+
+
+@phase("filter")
+def _aggregate_response(store: PassengerStore, group_by, start_day, end_day) -> Dict:
+    """Build the aggregate response from a refreshed store."""
+    return {
+        "type": "PassengerStatsAggregate",
+        "data": {
+            "group_by": group_by,
+            "groups": store.aggregate(start_day, end_day, group_by),
+        },
+    }
+
+
+def _aggregate_passenger_stats(
+    group_by: Optional[List[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict:
+    """Aggregate passenger traffic statistics over the columnar store"""
+    try:
+        group_by = _validate_group_by(group_by)
+        start_day, end_day = _parse_date_range(start_date, end_date)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    store = get_store()
+    if not _serve_stale(store):
+        try:
+            store.refresh()
+        except (*FETCH_ERRORS, ValueError) as e:
+            return _refresh_failure(e)
+    return _mark_stale(store, _aggregate_response(store, group_by, start_day, end_day))
+
+
+async def _aaggregate_passenger_stats(
+    group_by: Optional[List[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict:
+    """Asynchronous _aggregate_passenger_stats() over the shared pooled HTTP client"""
+    try:
+        group_by = _validate_group_by(group_by)
+        start_day, end_day = _parse_date_range(start_date, end_date)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    store = get_store()
+    if not _serve_stale(store):
+        try:
+            await store.arefresh()
+        except (*FETCH_ERRORS, ValueError) as e:
+            return _refresh_failure(e)
+    return _mark_stale(store, _aggregate_response(store, group_by, start_day, end_day))
+
+
+def _validate_rollup(
+    period: Optional[str],
+    date: Optional[str],
+    periods: Optional[int],
+    group_by: Optional[List[str]],
+) -> Tuple[str, Optional[int], int, List[str]]:
+    """Apply the rollup defaults, raising ValueError with a user message if invalid."""
+    end_day = None
+    if date:
         try:
-            end_dt = datetime.strptime(end_date, "%d-%m-%Y")
-        except ValueError:
-            return {
-                "type": "Error",
-                "error": "Invalid date format for end_date. Use DD-MM-YYYY",
-            }
-
-    filtered_data = []
-    for item in all_data:
-        if start_dt and item["dt"] < start_dt:
-            continue
-        if end_dt and item["dt"] > end_dt:
-            continue
-        filtered_data.append(item)
-
-    # Sort by date (newest first)
-    filtered_data.sort(key=lambda x: x["dt"], reverse=True)
-
-    # Extract just the data dictionaries
-    results = [item["data"] for item in filtered_data]
-    return {"type": "PassengerStats", "data": results}
+            end_day = datetime.strptime(date, "%d-%m-%Y").toordinal()
+        except ValueError as e:
+            raise ValueError("Invalid date format for date. Use DD-MM-YYYY") from e
+    period = period or "month"
+    if period not in PERIODS:
+        raise ValueError(f"Invalid period {period}. Use any of {', '.join(PERIODS)}")
+    periods = 1 if periods is None else periods
+    if not 1 <= periods <= MAX_ROLLUP_PERIODS:
+        raise ValueError(f"periods must be between 1 and {MAX_ROLLUP_PERIODS}")
+    group_by = list(group_by or [])
+    unknown = [g for g in group_by if g not in ROLLUP_GROUP_BY_OPTIONS]
+    if unknown:
+        raise ValueError(
+            f"Invalid group_by {unknown}. Use any of {', '.join(ROLLUP_GROUP_BY_OPTIONS)}"
+        )
+    return period, end_day, periods, group_by
+
 
+@phase("filter")
+def _rollups_response(
+    store: PassengerStore, period: str, end_day: Optional[int], periods: int, group_by
+) -> Dict:
+    """Build the rollups response from a refreshed store."""
+    return {
+        "type": "PassengerRollups",
+        "data": {
+            "period": period,
+            "group_by": group_by,
+            "groups": store.rollup(period, end_day, periods, group_by),
+        },
+    }
+
+
+def _get_passenger_rollups(
+    period: Optional[str] = "month",
+    date: Optional[str] = None,
+    periods: Optional[int] = 1,
+    group_by: Optional[List[str]] = None,
+) -> Dict:
+    """Get precomputed passenger traffic rollups"""
+    try:
+        period, end_day, periods, group_by = _validate_rollup(period, date, periods, group_by)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    store = get_store()
+    if not _serve_stale(store):
+        try:
+            store.refresh()
+        except (*FETCH_ERRORS, ValueError) as e:
+            return _refresh_failure(e)
+    return _mark_stale(store, _rollups_response(store, period, end_day, periods, group_by))
+
+
+async def _aget_passenger_rollups(
+    period: Optional[str] = "month",
+    date: Optional[str] = None,
+    periods: Optional[int] = 1,
+    group_by: Optional[List[str]] = None,
+) -> Dict:
+    """Asynchronous _get_passenger_rollups() over the shared pooled HTTP client"""
+    try:
+        period, end_day, periods, group_by = _validate_rollup(period, date, periods, group_by)
+    except ValueError as e:
+        return {"type": "Error", "error": str(e)}
+
+    store = get_store()
+    if not _serve_stale(store):
+        try:
+            await store.arefresh()
+        except (*FETCH_ERRORS, ValueError) as e:
+            return _refresh_failure(e)
+    return _mark_stale(store, _rollups_response(store, period, end_day, periods, group_by))
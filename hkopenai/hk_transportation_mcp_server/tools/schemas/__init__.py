@@ -0,0 +1,9 @@
+"""
+Tool definitions registered with the MCP server at startup.
+
+Each module here declares the tools of the implementation module of the same name in
+tools: their names, descriptions and parameter schemas, and the interface limits those
+schemas mention. The tool bodies import their implementation on the first call, so
+listing tools never loads the HTTP client, the upstream datasets or the indexes built
+over them.
+"""
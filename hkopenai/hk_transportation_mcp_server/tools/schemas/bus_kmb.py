@@ -0,0 +1,101 @@
+"""Tool definitions for the KMB bus route tools."""
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+from typing import Dict, List, Optional, Union
+from pydantic import Field
+from typing_extensions import Annotated
+from ...pagination import MAX_LIMIT
+
+ROUTE_FIELDS = ("route", "bound", "service_type", "origin", "destination")
+
+
+def register(mcp):
+    """Registers the KMB bus route tools with the MCP server."""
+
+    @mcp.tool(
+        description="All bus routes of Kowloon Motor Bus (KMB) and Long Win Bus Services Hong Kong. Data source: Kowloon Motor Bus and Long Win Bus Services"
+    )
+    async def get_bus_kmb(
+        lang: Annotated[
+            Optional[Union[str, List[str]]],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese, or a list of them to receive one route list per language. Default English",
+            ),
+        ] = "en",
+        limit: Annotated[
+            Optional[int],
+            Field(
+                description=f"Maximum routes per page, up to {MAX_LIMIT}. Default all routes; when more remain the response has a next_cursor"
+            ),
+        ] = None,
+        cursor: Annotated[
+            Optional[str],
+            Field(description="next_cursor of the previous page, to continue the listing"),
+        ] = None,
+        fields: Annotated[
+            Optional[List[str]],
+            Field(
+                description=f"Fields to return for each route, any of {', '.join(ROUTE_FIELDS)}. Default all fields"
+            ),
+        ] = None,
+        format: Annotated[  # pylint: disable=redefined-builtin
+            Optional[str],
+            Field(
+                description="records returns one object per route; columnar returns the column names once and one value list per route, a much smaller response. Default records",
+                json_schema_extra={"enum": ["records", "columnar"]},
+            ),
+        ] = "records",
+    ) -> Dict:
+        from .. import bus_kmb
+
+        return await bus_kmb._aget_bus_kmb(lang, limit, cursor, fields, format)
+
+    @mcp.tool(
+        description="Search bus routes of Kowloon Motor Bus (KMB) and Long Win Bus Services Hong Kong and return only the matching routes. Match a route number exactly or by prefix, and/or search origin and destination names in English, Traditional or Simplified Chinese. Data source: Kowloon Motor Bus and Long Win Bus Services"
+    )
+    async def search_bus_kmb_routes(
+        route: Annotated[
+            Optional[str], Field(description="Exact route number, e.g. 1A")
+        ] = None,
+        route_prefix: Annotated[
+            Optional[str], Field(description="Route number prefix, e.g. 26 matches 260, 268C")
+        ] = None,
+        origin: Annotated[
+            Optional[str],
+            Field(description="Text contained in the origin name, in any language"),
+        ] = None,
+        destination: Annotated[
+            Optional[str],
+            Field(description="Text contained in the destination name, in any language"),
+        ] = None,
+        bound: Annotated[
+            Optional[str],
+            Field(
+                description="Direction of travel",
+                json_schema_extra={"enum": ["outbound", "inbound"]},
+            ),
+        ] = None,
+        service_type: Annotated[
+            Optional[str], Field(description="Service type, e.g. 1 for the normal service")
+        ] = None,
+        lang: Annotated[
+            Optional[Union[str, List[str]]],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese, or a list of them to receive one route list per language. Default English",
+            ),
+        ] = "en",
+        format: Annotated[  # pylint: disable=redefined-builtin
+            Optional[str],
+            Field(
+                description="records returns one object per route; columnar returns the column names once and one value list per route, a much smaller response. Default records",
+                json_schema_extra={"enum": ["records", "columnar"]},
+            ),
+        ] = "records",
+    ) -> Dict:
+        """Search KMB and Long Win bus routes."""
+        from .. import bus_kmb
+
+        return await bus_kmb._asearch_bus_kmb_routes(
+            route, route_prefix, origin, destination, bound, service_type, lang, format
+        )
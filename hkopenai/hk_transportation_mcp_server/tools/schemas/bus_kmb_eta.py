@@ -0,0 +1,63 @@
+"""Tool definitions for the KMB arrival estimate tools."""
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from typing_extensions import Annotated
+
+MAX_BATCH = 50
+
+
+class EtaKey(BaseModel):
+    """One ETA lookup in a batch."""
+
+    stop: str = Field(description="Stop ID, e.g. 18492910339410B1")
+    route: str = Field(description="Route number, e.g. 1A")
+    service_type: str = Field(default="1", description="Service type. Default 1")
+
+
+def register(mcp):
+    """Registers the KMB ETA tools with the MCP server."""
+
+    @mcp.tool(
+        description="Real-time estimated arrival times of Kowloon Motor Bus (KMB) and Long Win Bus Services Hong Kong for a batch of (stop, route, service type) lookups, fetched concurrently and returned together. Data source: Kowloon Motor Bus and Long Win Bus Services"
+    )
+    async def get_bus_kmb_eta(
+        lookups: Annotated[
+            List[EtaKey],
+            Field(description=f"Stop, route and service type lookups, at most {MAX_BATCH}"),
+        ],
+        lang: Annotated[
+            Optional[str],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
+                json_schema_extra={"enum": ["en", "tc", "sc"]},
+            ),
+        ] = "en",
+    ) -> Dict:
+        """Get estimated arrival times for a batch of stops and routes."""
+        from .. import bus_kmb_eta
+
+        return await bus_kmb_eta._aget_bus_kmb_eta(lookups, lang)
+
+    @mcp.tool(
+        description="Real-time estimated arrival times at every stop of a Kowloon Motor Bus (KMB) or Long Win Bus Services route in Hong Kong. Data source: Kowloon Motor Bus and Long Win Bus Services"
+    )
+    async def get_bus_kmb_route_eta(
+        route: Annotated[str, Field(description="Route number, e.g. 1A")],
+        service_type: Annotated[
+            Optional[str], Field(description="Service type. Default 1")
+        ] = "1",
+        lang: Annotated[
+            Optional[str],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
+                json_schema_extra={"enum": ["en", "tc", "sc"]},
+            ),
+        ] = "en",
+    ) -> Dict:
+        """Get estimated arrival times along a whole route."""
+        from .. import bus_kmb_eta
+
+        return await bus_kmb_eta._aget_bus_kmb_route_eta(route, service_type, lang)
@@ -0,0 +1,73 @@
+"""Tool definitions for the KMB journey planning and nearby stop tools."""
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+from typing import Dict, Optional
+from pydantic import Field
+from typing_extensions import Annotated
+
+MAX_RESULTS = 20
+MAX_NEAREST = 50
+
+
+def register(mcp):
+    """Registers the KMB journey planning and nearby stop tools with the MCP server."""
+
+    @mcp.tool(
+        description="Find Kowloon Motor Bus (KMB) and Long Win Bus Services routes from one stop to another in Hong Kong: direct routes and journeys with one transfer, ordered by number of stops. Stops can be given as stop IDs or as part of a stop name in English, Traditional or Simplified Chinese. Data source: Kowloon Motor Bus and Long Win Bus Services"
+    )
+    async def search_bus_kmb_journeys(
+        origin: Annotated[
+            str, Field(description="Origin stop ID or part of the origin stop name")
+        ],
+        destination: Annotated[
+            str,
+            Field(description="Destination stop ID or part of the destination stop name"),
+        ],
+        limit: Annotated[
+            Optional[int],
+            Field(description=f"Maximum journeys of each kind, up to {MAX_RESULTS}. Default 5"),
+        ] = 5,
+        lang: Annotated[
+            Optional[str],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
+                json_schema_extra={"enum": ["en", "tc", "sc"]},
+            ),
+        ] = "en",
+    ) -> Dict:
+        """Search direct and one-transfer bus journeys between two stops."""
+        from .. import bus_kmb_journey
+
+        return await bus_kmb_journey._asearch_bus_kmb_journeys(origin, destination, limit, lang)
+
+    @mcp.tool(
+        description="Find the Kowloon Motor Bus (KMB) and Long Win Bus Services stops nearest to a location in Hong Kong, with their distance and the routes serving them. Data source: Kowloon Motor Bus and Long Win Bus Services"
+    )
+    async def get_bus_kmb_nearest_stops(
+        latitude: Annotated[float, Field(description="Latitude in decimal degrees (WGS84)")],
+        longitude: Annotated[
+            float, Field(description="Longitude in decimal degrees (WGS84)")
+        ],
+        k: Annotated[
+            Optional[int],
+            Field(description=f"Number of stops to return, up to {MAX_NEAREST}. Default 5"),
+        ] = 5,
+        max_distance: Annotated[
+            Optional[float],
+            Field(description="Only return stops within this many metres. Default no limit"),
+        ] = None,
+        lang: Annotated[
+            Optional[str],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
+                json_schema_extra={"enum": ["en", "tc", "sc"]},
+            ),
+        ] = "en",
+    ) -> Dict:
+        """Get the bus stops nearest to a location."""
+        from .. import bus_kmb_journey
+
+        return await bus_kmb_journey._aget_bus_kmb_nearest_stops(
+            latitude, longitude, k, max_distance, lang
+        )
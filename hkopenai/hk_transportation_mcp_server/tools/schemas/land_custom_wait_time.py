@@ -0,0 +1,77 @@
+"""Tool definitions for the land boundary wait time tools."""
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+import os
+from typing import Annotated, Dict, Optional
+from pydantic import Field
+
+# Seconds between background polls of the queue feed; 0 disables the poller
+POLL_INTERVAL = float(os.environ.get("HK_TRANSPORT_WAIT_TIMES_POLL", "0"))
+
+CONTROL_POINTS = {
+    "HYW": "Heung Yuen Wai",
+    "HZM": "Hong Kong-Zhuhai-Macao Bridge",
+    "LMC": "Lok Ma Chau",
+    "LSC": "Lok Ma Chau Spur Line",
+    "LWS": "Lo Wu",
+    "MKT": "Man Kam To",
+    "SBC": "Shenzhen Bay",
+    "STK": "Sha Tau Kok",
+}
+
+
+def register(mcp):
+    """Register the land boundary wait time tools with the MCP server."""
+
+    @mcp.tool(
+        description="Fetch current waiting times at land boundary control points in Hong Kong."
+    )
+    async def get_land_boundary_wait_times(
+        lang: Annotated[
+            Optional[str],
+            Field(
+                description="Language (en/tc/sc) English, Traditional Chinese, Simplified Chinese. Default English",
+                json_schema_extra={"enum": ["en", "tc", "sc"]},
+            ),
+        ] = "en",
+    ) -> Dict:
+        """Get current waiting times at land boundary control points in Hong Kong."""
+        from .. import land_custom_wait_time
+
+        return await land_custom_wait_time._aget_land_boundary_wait_times(str(lang))
+
+    @mcp.tool(
+        description="Recorded history of waiting time status at a land boundary control point in Hong Kong, for trends such as how busy a crossing has been over the last hours. Returns raw samples, or per-bucket summaries when bucket_minutes is given."
+    )
+    async def get_land_boundary_wait_time_history(
+        code: Annotated[
+            str,
+            Field(
+                description="Control point code",
+                json_schema_extra={"enum": list(CONTROL_POINTS)},
+            ),
+        ],
+        hours: Annotated[
+            Optional[float],
+            Field(description="Length of the window ending now, in hours. Default 6"),
+        ] = 6,
+        bucket_minutes: Annotated[
+            Optional[int],
+            Field(
+                description="Downsample into buckets of this many minutes. Default returns raw samples"
+            ),
+        ] = None,
+    ) -> Dict:
+        """Get recorded waiting time history for a control point."""
+        from .. import land_custom_wait_time
+
+        return land_custom_wait_time._get_land_boundary_wait_time_history(
+            code, hours, bucket_minutes
+        )
+
+    if POLL_INTERVAL > 0:
+        # The poller samples the feed from startup, so it cannot wait for a first call
+        from .. import land_custom_wait_time
+
+        land_custom_wait_time.poller.start()
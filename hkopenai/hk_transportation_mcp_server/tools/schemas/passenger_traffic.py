@@ -0,0 +1,138 @@
+"""Tool definitions for the passenger traffic statistics tools."""
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+from typing import Annotated, Dict, List, Optional
+from pydantic import Field
+from ...pagination import MAX_LIMIT
+
+ROW_FIELDS = (
+    "date",
+    "control_point",
+    "direction",
+    "hk_residents",
+    "mainland_visitors",
+    "other_visitors",
+    "total",
+)
+# Most consecutive periods one rollup lookup returns
+MAX_ROLLUP_PERIODS = 366
+
+
+def register(mcp):
+    """Registers the passenger traffic tools with the MCP server."""
+
+    @mcp.tool(
+        description="The statistics on daily passenger traffic provides figures concerning daily statistics on inbound and outbound passenger trips at all control points since 2021 (with breakdown by Hong Kong Residents, Mainland Visitors and Other Visitors). Return last 7 days data if no date range is specified."
+    )
+    async def get_passenger_stats(
+        start_date: Annotated[
+            Optional[str], Field(description="Start date in DD-MM-YYYY format")
+        ] = None,
+        end_date: Annotated[
+            Optional[str], Field(description="End date in DD-MM-YYYY format")
+        ] = None,
+        limit: Annotated[
+            Optional[int],
+            Field(
+                description=f"Maximum rows per page, up to {MAX_LIMIT}. Default all rows; when more remain the response has a next_cursor"
+            ),
+        ] = None,
+        cursor: Annotated[
+            Optional[str],
+            Field(
+                description="next_cursor of the previous page, passed with the same dates to continue the listing"
+            ),
+        ] = None,
+        fields: Annotated[
+            Optional[List[str]],
+            Field(
+                description=f"Fields to return for each row, any of {', '.join(ROW_FIELDS)}. Default all fields"
+            ),
+        ] = None,
+        format: Annotated[  # pylint: disable=redefined-builtin
+            Optional[str],
+            Field(
+                description="records returns one object per row; columnar returns the column names once and one value list per row, a much smaller response. Default records",
+                json_schema_extra={"enum": ["records", "columnar"]},
+            ),
+        ] = "records",
+        control_point: Annotated[
+            Optional[str],
+            Field(
+                description="Only rows of this control point, e.g. Lo Wu or Airport (case-insensitive). Default all control points"
+            ),
+        ] = None,
+        direction: Annotated[
+            Optional[str],
+            Field(
+                description="Only rows of this direction. Default both directions",
+                json_schema_extra={"enum": ["Arrival", "Departure"]},
+            ),
+        ] = None,
+    ) -> Dict:
+        """Get passenger traffic statistics."""
+        from .. import passenger_traffic
+
+        return await passenger_traffic._aget_passenger_stats(
+            start_date, end_date, limit, cursor, fields, format, control_point, direction
+        )
+
+    @mcp.tool(
+        description="Aggregate daily passenger traffic at Hong Kong control points since 2021. Returns sums and daily means of Hong Kong Residents, Mainland Visitors, Other Visitors and total trips, grouped by control point, direction and/or one period (day, week, month, year). Covers all available dates if no date range is specified."
+    )
+    async def aggregate_passenger_stats(
+        group_by: Annotated[
+            Optional[List[str]],
+            Field(
+                description="Grouping keys: any of control_point, direction and at most one of day, week, month, year. Default groups by control_point"
+            ),
+        ] = None,
+        start_date: Annotated[
+            Optional[str], Field(description="Start date in DD-MM-YYYY format")
+        ] = None,
+        end_date: Annotated[
+            Optional[str], Field(description="End date in DD-MM-YYYY format")
+        ] = None,
+    ) -> Dict:
+        """Aggregate passenger traffic statistics."""
+        from .. import passenger_traffic
+
+        return await passenger_traffic._aaggregate_passenger_stats(
+            group_by, start_date, end_date
+        )
+
+    @mcp.tool(
+        description="Precomputed daily, weekly, monthly and yearly totals of passenger traffic at Hong Kong control points since 2021, kept up to date as new days arrive, so answers are instant however long the history. Returns sums and daily means of Hong Kong Residents, Mainland Visitors, Other Visitors and total trips for the latest period, or for a number of consecutive periods ending at a given date, across all control points or per control point and/or direction, busiest first. Use aggregate_passenger_stats for arbitrary date ranges."
+    )
+    async def get_passenger_rollups(
+        period: Annotated[
+            Optional[str],
+            Field(
+                description="Period length. Default month",
+                json_schema_extra={"enum": ["day", "week", "month", "year"]},
+            ),
+        ] = "month",
+        date: Annotated[
+            Optional[str],
+            Field(
+                description="Any date in DD-MM-YYYY format within the last period to return. Default the newest date with data"
+            ),
+        ] = None,
+        periods: Annotated[
+            Optional[int],
+            Field(
+                description=f"Number of consecutive periods to return, newest first, up to {MAX_ROLLUP_PERIODS}. Default 1"
+            ),
+        ] = 1,
+        group_by: Annotated[
+            Optional[List[str]],
+            Field(
+                description="Breakdown keys: any of control_point and direction. Default totals across all control points and both directions"
+            ),
+        ] = None,
+    ) -> Dict:
+        """Get precomputed passenger traffic rollups."""
+        from .. import passenger_traffic
+
+        return await passenger_traffic._aget_passenger_rollups(period, date, periods, group_by)
@@ -0,0 +1,152 @@
+"""
+Fixed-size time series of land boundary control point queue status codes.
+
+Each recorded snapshot stores one timestamp and one status code per control point and
+direction in preallocated arrays used as a ring buffer, so memory stays bounded no
+matter how long the server runs. The buffer can optionally be persisted to disk.
+"""
+
+import json
+import os
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..storage import atomic_write
+
+# Samples kept per series; 2880 covers 24 hours at a 30 second poll interval
+HISTORY_CAPACITY = int(os.environ.get("HK_TRANSPORT_WAIT_TIMES_HISTORY", "2880"))
+HISTORY_PERSIST = os.environ.get("HK_TRANSPORT_WAIT_TIMES_HISTORY_PERSIST", "0") == "1"
+
+DIRECTIONS = ("arrival", "departure")
+_UPSTREAM_KEYS = {"arrival": "arrQueue", "departure": "depQueue"}
+# Status code stored when a control point is missing from a snapshot
+MISSING = 255
+# Status codes that describe queue length, as opposed to maintenance or closure
+QUEUE_LEVELS = (0, 1, 2)
+
+
+class WaitTimeHistory:
+    """Ring buffer of status codes for every (control point, direction) series."""
+
+    def __init__(
+        self,
+        codes: Sequence[str],
+        capacity: int = HISTORY_CAPACITY,
+        path: Optional[str] = None,
+    ):
+        self.codes = tuple(codes)
+        self.capacity = capacity
+        self.path = path
+        self._lock = threading.Lock()
+        self.times = array("d", bytes(8 * capacity))
+        self.status: Dict[Tuple[str, str], array] = {
+            (code, direction): array("B", [MISSING]) * capacity
+            for code in self.codes
+            for direction in DIRECTIONS
+        }
+        self._head = 0
+        self._count = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, timestamp: float, data: Dict) -> None:
+        """Append the status codes of one decoded upstream snapshot."""
+        with self._lock:
+            slot = self._head
+            self.times[slot] = timestamp
+            for (code, direction), column in self.status.items():
+                value = data.get(code, {}).get(_UPSTREAM_KEYS[direction], MISSING)
+                if not isinstance(value, int) or not 0 <= value < MISSING:
+                    value = MISSING
+                column[slot] = value
+            self._head = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            if self.path:
+                self._save()
+
+    def _slots(self) -> Iterator[int]:
+        """Yield buffer slots from oldest to newest."""
+        start = (self._head - self._count) % self.capacity
+        for offset in range(self._count):
+            yield (start + offset) % self.capacity
+
+    def samples(
+        self, code: str, since: float, until: Optional[float] = None
+    ) -> List[Tuple[float, int, int]]:
+        """Return (timestamp, arrival, departure) samples for code within the window."""
+        arrival = self.status[(code, "arrival")]
+        departure = self.status[(code, "departure")]
+        with self._lock:
+            return [
+                (self.times[slot], arrival[slot], departure[slot])
+                for slot in self._slots()
+                if self.times[slot] >= since and (until is None or self.times[slot] <= until)
+            ]
+
+    def buckets(
+        self, code: str, since: float, bucket_seconds: float, until: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Downsample the samples of code into fixed-width buckets.
+
+        Each bucket reports its sample count and, per direction, the busiest queue level
+        seen and the mean queue level over samples that were in service.
+        """
+        buckets: Dict[int, List[Tuple[float, int, int]]] = {}
+        for sample in self.samples(code, since, until):
+            buckets.setdefault(int((sample[0] - since) // bucket_seconds), []).append(sample)
+        results = []
+        for index in sorted(buckets):
+            items = buckets[index]
+            bucket = {
+                "start": since + index * bucket_seconds,
+                "samples": len(items),
+            }
+            for position, direction in enumerate(DIRECTIONS, start=1):
+                levels = [item[position] for item in items if item[position] in QUEUE_LEVELS]
+                bucket[direction] = {
+                    "busiest": max(levels) if levels else None,
+                    "mean_level": round(sum(levels) / len(levels), 2) if levels else None,
+                    "last": items[-1][position],
+                }
+            results.append(bucket)
+        return results
+
+    def _save(self) -> None:
+        """Write the header, timestamps and status columns to path atomically."""
+        header = {
+            "codes": list(self.codes),
+            "capacity": self.capacity,
+            "head": self._head,
+            "count": self._count,
+        }
+        payload = [json.dumps(header).encode("utf-8"), b"\n", self.times.tobytes()]
+        payload.extend(self.status[key].tobytes() for key in sorted(self.status))
+        atomic_write(self.path, b"".join(payload))
+
+    def _load(self) -> None:
+        """Restore a persisted buffer, ignoring files written with another layout."""
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                if header["codes"] != list(self.codes) or header["capacity"] != self.capacity:
+                    return
+                times = array("d")
+                times.frombytes(f.read(8 * self.capacity))
+                status = {}
+                for key in sorted(self.status):
+                    column = array("B")
+                    column.frombytes(f.read(self.capacity))
+                    status[key] = column
+        except (OSError, ValueError, KeyError):
+            return
+        if len(times) != self.capacity or any(len(c) != self.capacity for c in status.values()):
+            return
+        self.times = times
+        self.status = status
+        self._head = header["head"]
+        self._count = header["count"]
@@ -0,0 +1,232 @@
+"""
+Opt-in tracing and profiling of tool calls, written to local files.
+
+A trace holds one span for the tool call and a child span for every phase run during it
+(see metrics.phase): waiting for an upstream fetch, each upstream HTTP request, decoding
+an upstream body and building the response rows. Finished traces are appended to a
+file, one OTLP/JSON export request per line, so they can be read offline or replayed
+into any OpenTelemetry collector.
+
+A profiled call runs under cProfile and its stats are written as a .prof file (open
+with python -m pstats or snakeviz) when the call is slower than the threshold. Only one
+call is profiled at a time. cProfile follows the thread of the event loop, so the
+profile of an async call also holds the work of other calls interleaved with it.
+
+Both are off unless enabled by environment variable for every call, or per call by the
+client through the request _meta keys TRACE_META_KEY and PROFILE_META_KEY. Clients can
+only switch them on when the operator allows it with HK_TRANSPORT_TRACE_ALLOW_CLIENT, so
+a remote caller cannot make the server profile calls and write files at will. The trace
+file is rotated once it reaches MAX_TRACE_BYTES, keeping one previous file.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .storage import data_dir
+
+# Set to 1 to trace every tool call
+TRACE_ENABLED = os.environ.get("HK_TRANSPORT_TRACE", "0") == "1"
+# Profile every tool call and keep the profiles of calls slower than this many seconds
+PROFILE_THRESHOLD = float(os.environ.get("HK_TRANSPORT_PROFILE_THRESHOLD", "0"))
+# Profiles kept in the diagnostics directory; the oldest are deleted first
+MAX_PROFILES = 100
+# Set to 1 to let clients trace or profile single calls through the request _meta
+ALLOW_CLIENT = os.environ.get("HK_TRANSPORT_TRACE_ALLOW_CLIENT", "0") == "1"
+# Size at which the trace file is renamed to TRACE_FILE_NAME.1, replacing the last one
+MAX_TRACE_BYTES = 64 * 1024 * 1024
+
+TRACE_META_KEY = "hk_transport/trace"
+PROFILE_META_KEY = "hk_transport/profile"
+TRACE_FILE_NAME = "traces.jsonl"
+
+SERVICE_NAME = "hk-transportation-mcp-server"
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def diagnostics_dir() -> str:
+    """Return (and create) the directory for traces and profiles."""
+    path = (
+        os.environ.get("HK_TRANSPORT_DIAGNOSTICS_DIR")
+        or data_dir("diagnostics")
+        or os.path.join(tempfile.gettempdir(), "hk_transportation_mcp_server")
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "kind", "start", "end", "attributes", "token")
+
+    def __init__(
+        self, name: str, parent_id: str, kind: int, attributes: Dict, start: Optional[int] = None
+    ):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start = start or time.time_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.token = None
+
+    def to_otlp(self, trace_id: str, status: int = STATUS_OK) -> Dict:
+        """The span in the OTLP/JSON encoding."""
+        span = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+_span: ContextVar[Optional[Span]] = ContextVar("hk_transport_span", default=None)
+
+
+class Trace:
+    """Spans of one tool call, exported together when the call finishes."""
+
+    def __init__(self, tool: str):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(f"tools/call {tool}", "", SPAN_KIND_SERVER, {"mcp.tool.name": tool})
+        self.spans: List[Span] = []
+        self.finished = False
+
+    def start(self, name: str, attributes: Optional[Dict] = None) -> Span:
+        """Open a span as a child of the innermost open span of this context."""
+        parent = _span.get() or self.root
+        span = Span(name, parent.span_id, SPAN_KIND_INTERNAL, attributes or {})
+        span.token = _span.set(span)
+        return span
+
+    def end(self, span: Span) -> None:
+        """Close a span opened by start(); spans closed after the call are dropped."""
+        span.end = time.time_ns()
+        _span.reset(span.token)
+        if not self.finished:
+            self.spans.append(span)
+
+    def add(self, name: str, seconds: float, attributes: Dict, kind: int = SPAN_KIND_CLIENT):
+        """Add a span that ended now and took the given time."""
+        if self.finished:
+            return
+        parent = _span.get() or self.root
+        end = time.time_ns()
+        span = Span(name, parent.span_id, kind, attributes, end - int(seconds * 1e9))
+        span.end = end
+        self.spans.append(span)
+
+    def finish(self, outcome: str, response_bytes: Optional[int] = None) -> None:
+        """Close the call span and append the trace to the trace file."""
+        self.finished = True
+        self.root.end = time.time_ns()
+        self.root.attributes["outcome"] = outcome
+        if response_bytes is not None:
+            self.root.attributes["response.bytes"] = response_bytes
+        status = STATUS_OK if outcome == "ok" else STATUS_ERROR
+        spans = [self.root.to_otlp(self.trace_id, status)]
+        spans.extend(span.to_otlp(self.trace_id) for span in self.spans)
+        export(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+                        "scopeSpans": [{"scope": {"name": __package__}, "spans": spans}],
+                    }
+                ]
+            }
+        )
+
+
+_export_lock = threading.Lock()
+
+
+def export(request: Dict) -> None:
+    """Append an export request as one line of the trace file; failures drop the trace."""
+    line = json.dumps(request, separators=(",", ":")) + "\n"
+    try:
+        path = os.path.join(diagnostics_dir(), TRACE_FILE_NAME)
+        with _export_lock:
+            if os.path.exists(path) and os.path.getsize(path) >= MAX_TRACE_BYTES:
+                os.replace(path, f"{path}.1")
+            # One append of a whole line per trace, so processes sharing the file do not
+            # interleave
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError:
+        pass
+
+
+_profile_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def profile_call(tool: str, forced: bool = False) -> Iterator[None]:
+    """
+    Profile the enclosed call if profiling is on or forced and no other call is profiled.
+
+    The profile is written when the call, failed or not, took at least PROFILE_THRESHOLD
+    seconds, or always when forced.
+    """
+    if not (forced or PROFILE_THRESHOLD > 0) or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        try:
+            if forced or elapsed >= PROFILE_THRESHOLD:
+                _write_profile(profiler, tool, elapsed)
+        except OSError:
+            pass
+        finally:
+            _profile_lock.release()
+
+
+def _write_profile(profiler: cProfile.Profile, tool: str, elapsed: float) -> None:
+    directory = diagnostics_dir()
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    profiler.dump_stats(os.path.join(directory, f"{stamp}-{tool}-{elapsed * 1000:.0f}ms.prof"))
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".prof")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:-MAX_PROFILES]:
+        os.unlink(entry.path)
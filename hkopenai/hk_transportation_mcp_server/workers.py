@@ -0,0 +1,260 @@
+"""
+Multi-worker HTTP mode sharing one refreshed copy of the upstream datasets.
+
+With HK_TRANSPORT_WORKERS above 1 the HTTP transport is served by that many worker
+processes accepting connections on one listening socket. The supervising process keeps
+the shared datasets current: a refresher thread fetches the bus route list, the queue
+feed and the bus network ahead of their TTL and writes them as snapshots, and appends new
+rows to the passenger traffic store, all under the data directory. The workers follow
+those files instead of polling the upstream themselves (see HttpCache.follow_snapshots
+and PassengerStore), so the upstream traffic and the parsing of the bulk lists do not
+grow with the number of workers.
+
+Workers serve stateless HTTP, since consecutive requests of a client may reach different
+processes. A worker that dies is replaced. The stdio transport always runs one server.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Worker processes serving the HTTP transport; 1 serves it from this process
+WORKERS = int(os.environ.get("HK_TRANSPORT_WORKERS", "1"))
+# Fraction of a dataset's TTL after which the refresher fetches it again, so the copy
+# the workers follow never expires while the upstream is healthy
+REFRESH_AHEAD = 0.5
+# Seconds between the refresher's checks of the datasets
+REFRESH_TICK = 1.0
+# Longest delay between attempts of a refresher job that keeps raising
+REFRESH_MAX_BACKOFF = 60.0
+# Seconds between checks that every worker is alive
+SUPERVISE_INTERVAL = 1.0
+
+
+def shared_datasets() -> Tuple[Tuple[str, Optional[float], float], ...]:
+    """Return (url, timeout, ttl) of every upstream document shared with the workers."""
+    from .http_cache import DEFAULT_TTL, http_cache
+    from .tools import bus_kmb, bus_kmb_journey, land_custom_wait_time
+
+    datasets = (
+        (bus_kmb.URL, None, DEFAULT_TTL),
+        (land_custom_wait_time.URL, 10, land_custom_wait_time.WAIT_TIMES_TTL),
+        (bus_kmb_journey.ROUTE_STOP_URL, 30, bus_kmb_journey.NETWORK_TTL),
+        (bus_kmb_journey.STOP_URL, 30, bus_kmb_journey.NETWORK_TTL),
+    )
+    # The bus network is only snapshotted while it is shared
+    for url, _, _ in datasets:
+        http_cache.persist(url)
+    return datasets
+
+
+class Refresher:
+    """
+    Background threads that fetch the shared datasets ahead of their expiry.
+
+    Each dataset has its own thread, so a slow download of the bus network does not hold
+    back the queue feed.
+    """
+
+    def __init__(self, tick: float = REFRESH_TICK):
+        self.tick = tick
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        """Whether any refreshing thread is alive."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def jobs(self) -> List[Callable[[], None]]:
+        """Return one refresh of every shared dataset."""
+        from .http_cache import fetch_json_data
+
+        jobs: List[Callable[[], None]] = [
+            functools.partial(
+                fetch_json_data, url, timeout=timeout, ttl=ttl * REFRESH_AHEAD, max_stale=0
+            )
+            for url, timeout, ttl in shared_datasets()
+        ]
+        jobs.append(self.refresh_passenger_store)
+        return jobs
+
+    def refresh_once(self) -> None:
+        """
+        Fetch every shared dataset that is past REFRESH_AHEAD of its TTL, one by one.
+
+        Failures leave the previous copy in place for the next tick to retry; the
+        circuit breakers of the shared cache keep a failing upstream from being hammered.
+        """
+        for job in self.jobs():
+            job()
+
+    @staticmethod
+    def refresh_passenger_store() -> None:
+        """Append new passenger traffic rows once REFRESH_AHEAD of the interval passed."""
+        from .http_cache import FETCH_ERRORS
+        from .tools.passenger_store import REFRESH_INTERVAL, get_store
+
+        store = get_store()
+        if time.time() - store.refreshed_at >= REFRESH_INTERVAL * REFRESH_AHEAD:
+            try:
+                store.refresh(force=True)
+            except (*FETCH_ERRORS, ValueError):
+                pass
+
+    def start(self) -> None:
+        """Start refreshing in daemon threads if not already running."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(job,), name=f"dataset-refresher-{index}", daemon=True
+            )
+            for index, job in enumerate(self.jobs())
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop refreshing and wait for the threads to exit."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, job: Callable[[], None]) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                job()
+                failures = 0
+                delay = self.tick
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Keep refreshing: a dead thread would leave the workers an ageing copy
+                logger.exception("Refreshing a shared dataset failed")
+                failures += 1
+                delay = min(self.tick * 2 ** min(failures, 32), REFRESH_MAX_BACKOFF)
+            self._stop.wait(delay)
+
+
+def _serve(
+    sock: socket.socket,
+    host: str,
+    port: int,
+    log_level: Optional[str],
+    initializer: Optional[Callable[[], None]],
+) -> None:
+    """Entry point of a worker process: serve MCP over the inherited listening socket."""
+    if initializer is not None:
+        initializer()
+    from .server import server
+
+    shared_datasets()
+    asyncio.run(
+        server().run_http_async(
+            show_banner=False,
+            transport="streamable-http",
+            host=host,
+            port=port,
+            log_level=log_level,
+            stateless_http=True,
+            sockets=[sock],
+        )
+    )
+
+
+class WorkerPool:
+    """
+    Stand-in for the server object the CLI runs, serving HTTP from WORKERS processes.
+
+    run() blocks until the supervising process receives SIGINT or SIGTERM. initializer,
+    a picklable callable, runs first thing in every worker process.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        self.workers = WORKERS if workers is None else workers
+        self.initializer = initializer
+        self.refresher = Refresher()
+        self._stop = threading.Event()
+
+    def run(
+        self,
+        transport: Optional[str] = None,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        log_level: Optional[str] = None,
+    ) -> None:
+        """Serve the HTTP transport from the worker processes, or stdio from this one."""
+        if transport is None or transport == "stdio":
+            from .server import server
+
+            server().run()
+            return
+
+        from .storage import data_dir
+
+        if data_dir():
+            self._serve(host, port, log_level)
+            return
+        # Workers can only share datasets through a data directory, so use a scratch one
+        with tempfile.TemporaryDirectory(prefix="hk_transport_") as scratch:
+            os.environ["HK_TRANSPORT_DATA_DIR"] = scratch
+            self._serve(host, port, log_level)
+
+    def _serve(self, host: str, port: int, log_level: Optional[str]) -> None:
+        from .http_cache import http_cache
+        from .storage import data_dir
+
+        http_cache.enable_snapshots(data_dir("snapshots"))
+        for url, _, _ in shared_datasets():
+            http_cache.load_snapshot(url)
+        self.refresher.start()
+
+        sock = socket.create_server((host, port))
+        # Read by the workers' storage module when they start
+        os.environ["HK_TRANSPORT_SHARED_READER"] = "1"
+        context = multiprocessing.get_context("spawn")
+        processes: List[multiprocessing.Process] = []
+
+        def spawn() -> multiprocessing.Process:
+            process = context.Process(
+                target=_serve,
+                args=(sock, host, port, log_level, self.initializer),
+                name="hk-transport-worker",
+                daemon=True,
+            )
+            process.start()
+            return process
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self._stop.set())
+        try:
+            processes.extend(spawn() for _ in range(self.workers))
+            while not self._stop.wait(SUPERVISE_INTERVAL):
+                for index, process in enumerate(processes):
+                    if not process.is_alive() and not self._stop.is_set():
+                        processes[index] = spawn()
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+            self.refresher.stop()
+            sock.close()
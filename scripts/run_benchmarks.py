@@ -0,0 +1,253 @@
+"""
+Script for benchmarking the tools offline against a local stub upstream.
+
+Each benchmark case calls a tool function in-process while a stub HTTP server plays
+the upstream, so results depend only on this package and the machine. For every case
+the script measures:
+
+- cold latency: caches and derived indexes dropped, so the call downloads, decodes and
+  rebuilds everything;
+- warm latency and throughput: repeated calls served from the caches;
+- peak memory: the largest traced Python allocation during one cold call.
+
+The results are written as a JSON report. Pass --compare with an earlier report to
+list the metrics that regressed by more than --threshold; the script then exits 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Benchmarks must not read or write the user's persisted datasets
+os.environ["HK_TRANSPORT_DATA_DIR"] = ""
+os.environ["HK_TRANSPORT_WARM_START"] = "0"
+
+# pylint: disable=wrong-import-position,protected-access
+from hkopenai.hk_transportation_mcp_server import __version__
+from hkopenai.hk_transportation_mcp_server.http_cache import http_cache
+from hkopenai.hk_transportation_mcp_server.tools import (
+    bus_kmb,
+    land_custom_wait_time,
+    passenger_store,
+    passenger_traffic,
+)
+from stub_upstream import (
+    StubUpstream,
+    load_fixtures,
+    record_fixtures,
+    redirect_tools,
+    synthetic_fixtures,
+)
+
+REPORT_VERSION = 1
+# Metrics compared against a baseline report; lower is better for all of them
+COMPARED_METRICS = (("cold", "p50_ms"), ("warm", "p50_ms"), ("peak_memory_kib",))
+
+
+def _year_ago() -> str:
+    return (datetime.now() - timedelta(days=365)).strftime("%d-%m-%Y")
+
+
+# Case name -> tool call, evaluated when the case runs
+CASES: Dict[str, Callable[[], Dict]] = {
+    "get_passenger_stats": lambda: passenger_traffic._get_passenger_stats(),
+    "get_passenger_stats_year_columnar": lambda: passenger_traffic._get_passenger_stats(
+        start_date=_year_ago(), response_format="columnar"
+    ),
+    "get_bus_kmb": lambda: bus_kmb._get_bus_kmb("en"),
+    "get_bus_kmb_page": lambda: bus_kmb._get_bus_kmb(
+        "tc", limit=100, fields=["route", "destination"]
+    ),
+    "get_land_boundary_wait_times": lambda: land_custom_wait_time._get_land_boundary_wait_times(
+        "en"
+    ),
+}
+
+
+def reset_caches() -> None:
+    """Drop every cached payload and everything derived from one."""
+    http_cache.clear()
+    passenger_store._store = None
+    bus_kmb._views = None
+    land_custom_wait_time._last_recorded = None
+
+
+def _call(case: str) -> float:
+    """Run one call of a case and return its latency in seconds."""
+    started = time.perf_counter()
+    response = CASES[case]()
+    elapsed = time.perf_counter() - started
+    if response.get("type") == "Error":
+        raise RuntimeError(f"{case} failed: {response['error']}")
+    return elapsed
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    """Latency distribution in milliseconds."""
+    ordered = sorted(latencies)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def run_case(case: str, cold_runs: int, warm_runs: int) -> Dict:
+    """Measure the cold latency, warm latency and throughput, and peak memory of a case."""
+    cold = []
+    for _ in range(cold_runs):
+        reset_caches()
+        cold.append(_call(case))
+
+    started = time.perf_counter()
+    warm = [_call(case) for _ in range(warm_runs)]
+    elapsed = time.perf_counter() - started
+
+    reset_caches()
+    tracemalloc.start()
+    try:
+        _call(case)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "cold": _summary(cold),
+        "warm": {**_summary(warm), "throughput_per_s": round(warm_runs / elapsed, 1)},
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> Dict:
+    """Run the selected cases against a stub serving the configured fixtures."""
+    fixtures = synthetic_fixtures(args.passenger_years, args.kmb_routes)
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures, fixtures)
+    cases = args.case or list(CASES)
+
+    results = {}
+    with StubUpstream(fixtures) as stub, redirect_tools(stub.url()):
+        for case in cases:
+            print(f"Running {case}", file=sys.stderr)
+            results[case] = run_case(case, args.cold_runs, args.warm_runs)
+    reset_caches()
+
+    return {
+        "version": REPORT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "package_version": __version__,
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "fixtures": args.fixtures or "synthetic",
+            "passenger_years": args.passenger_years,
+            "kmb_routes": args.kmb_routes,
+            "cold_runs": args.cold_runs,
+            "warm_runs": args.warm_runs,
+        },
+        "fixture_bytes": {path: len(body) for path, body in fixtures.items()},
+        "results": results,
+    }
+
+
+def _metric(result: Dict, path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Describe every metric more than threshold (a fraction) worse than the baseline."""
+    if baseline.get("config") != report["config"]:
+        print("Warning: the baseline was run with a different configuration", file=sys.stderr)
+    regressions = []
+    for case, result in report["results"].items():
+        for path in COMPARED_METRICS:
+            current = _metric(result, path)
+            previous = _metric(baseline.get("results", {}).get(case, {}), path)
+            if current is None or not previous:
+                continue
+            change = current / previous - 1
+            line = f"{case} {'.'.join(path)}: {previous} -> {current} ({change:+.1%})"
+            print(line, file=sys.stderr)
+            if change > threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Parse arguments, run the benchmarks and write the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0].strip())
+    parser.add_argument("--output", "-o", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="Run only this case")
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--warm-runs", type=int, default=200)
+    parser.add_argument("--passenger-years", type=float, default=10)
+    parser.add_argument("--kmb-routes", type=int, default=10000)
+    parser.add_argument(
+        "--fixtures", help="Directory of recorded fixtures, replacing the synthetic ones"
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Download the live upstream datasets into --fixtures first",
+    )
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Regression threshold. Default 0.2 (20%%)"
+    )
+    args = parser.parse_args(argv)
+    if args.record:
+        if not args.fixtures:
+            parser.error("--record needs --fixtures")
+        record_fixtures(args.fixtures)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+Script for load testing the MCP server over streamable HTTP against a local stub upstream.
+
+The server from server() runs in a child process on a local port, with its tools
+pointed at a stub of the upstream APIs (see stub_upstream.py), just as it runs behind
+a load balancer. N concurrent MCP clients then call a weighted mix of the passenger
+statistics, KMB route list and land boundary wait time tools for a fixed duration.
+
+With --workers N the server runs in the multi-worker mode (see workers.py), so the
+upstream requests and the memory of the server processes can be compared across N.
+
+The report gives, per tool and overall, the number of calls, errors, requests per
+second and p50/p95/p99 latency, the upstream requests per path and the proportional
+set size (PSS) of the server processes, on Linux. The clients share this process, so at high
+concurrency check that it is not the bottleneck (e.g. with --clients 1 as a baseline).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Tool name -> arguments used for every call of it
+TOOL_CALLS: Dict[str, Dict] = {
+    "get_passenger_stats": {},
+    "get_bus_kmb": {"lang": "en", "limit": 100},
+    "get_land_boundary_wait_times": {"lang": "en"},
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse a tool=weight,... mix, raising ValueError for unknown tools or bad weights."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in TOOL_CALLS:
+            raise ValueError(f"Unknown tool {name}. Use any of {', '.join(TOOL_CALLS)}")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"Weight of {name} must not be negative")
+    if not any(mix.values()):
+        raise ValueError("At least one tool needs a positive weight")
+    return mix
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+def summarize(latencies: List[float], errors: List[str], elapsed: float) -> Dict:
+    """Call count, errors, throughput and latency percentiles in milliseconds."""
+    ordered = sorted(latencies)
+    calls = len(ordered) + len(errors)
+    summary = {
+        "calls": calls,
+        "errors": len(errors),
+        "requests_per_s": round(calls / elapsed, 1),
+    }
+    if errors:
+        summary["first_error"] = errors[0]
+    if ordered:
+        summary.update(
+            {
+                f"p{int(fraction * 100)}_ms": round(percentile(ordered, fraction) * 1000, 2)
+                for fraction in (0.5, 0.95, 0.99)
+            }
+        )
+        summary["max_ms"] = round(ordered[-1] * 1000, 2)
+    return summary
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with status {process.returncode}")
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"The server did not listen on port {port} within {timeout}s")
+
+
+def _process_tree_pss_mb(pid: int) -> Optional[float]:
+    """PSS of a process and its descendants in MiB, or None where /proc is unavailable."""
+    children: Dict[int, List[int]] = {}
+    try:
+        for name in os.listdir("/proc"):
+            if name.isdigit():
+                try:
+                    with open(f"/proc/{name}/stat", encoding="utf-8") as f:
+                        parent = int(f.read().rsplit(")", 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(parent, []).append(int(name))
+    except OSError:
+        return None
+    total_kb, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/smaps_rollup", encoding="utf-8") as f:
+                total_kb += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        except (OSError, ValueError):
+            continue
+    return round(total_kb / 1024, 1)
+
+
+# Keeps the redirect of a worker process active; closing it would undo the patches
+_worker_redirect = contextlib.ExitStack()
+
+
+def _redirect_worker(upstream: str) -> None:
+    """Point a worker process's tools at the stub for the rest of its life."""
+    from stub_upstream import redirect_tools  # pylint: disable=import-outside-toplevel
+
+    _worker_redirect.enter_context(redirect_tools(upstream))
+
+
+def serve(port: int, upstream: str, workers: int = 1) -> None:
+    """Run the MCP server over streamable HTTP with its tools pointed at the stub."""
+    # pylint: disable=import-outside-toplevel
+    from hkopenai.hk_transportation_mcp_server.server import server
+    from hkopenai.hk_transportation_mcp_server.workers import WorkerPool
+    from stub_upstream import redirect_tools
+
+    with redirect_tools(upstream):
+        if workers > 1:
+            pool = WorkerPool(workers, functools.partial(_redirect_worker, upstream))
+            pool.run(
+                transport="streamable-http", host="127.0.0.1", port=port, log_level="warning"
+            )
+            return
+        server().run(
+            transport="streamable-http",
+            host="127.0.0.1",
+            port=port,
+            show_banner=False,
+            log_level="warning",
+        )
+
+
+async def _client(
+    url: str, mix: Dict[str, float], deadline: float, seed: int, results: Dict
+) -> None:
+    """Call tools drawn from the mix one after another until the deadline."""
+    from fastmcp import Client  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    async with Client(url) as client:
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            latencies, errors = results[name]
+            started = time.perf_counter()
+            try:
+                result = await client.call_tool(name, TOOL_CALLS[name], raise_on_error=False)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            content = result.structured_content or {}
+            if result.is_error or content.get("type") == "Error":
+                errors.append(str(content.get("error") or result.content))
+            else:
+                latencies.append(time.perf_counter() - started)
+
+
+async def drive(url: str, mix: Dict[str, float], clients: int, duration: float) -> Dict:
+    """Run the clients concurrently, after one warm-up call per tool, and summarize."""
+    from fastmcp import Client  # pylint: disable=import-outside-toplevel
+
+    async with Client(url) as client:
+        for name in mix:
+            await client.call_tool(name, TOOL_CALLS[name], raise_on_error=False)
+
+    results: Dict[str, Tuple[List[float], List[str]]] = {name: ([], []) for name in mix}
+    started = time.monotonic()
+    await asyncio.gather(
+        *(_client(url, mix, started + duration, seed, results) for seed in range(clients))
+    )
+    elapsed = time.monotonic() - started
+
+    tools = {
+        name: summarize(latencies, errors, elapsed) for name, (latencies, errors) in results.items()
+    }
+    every_latency = [latency for latencies, _ in results.values() for latency in latencies]
+    every_error = [error for _, errors in results.values() for error in errors]
+    overall = summarize(every_latency, every_error, elapsed)
+    return {"elapsed_s": round(elapsed, 2), "overall": overall, "tools": tools}
+
+
+def run(args) -> Dict:
+    """Start the stub and the server process, drive the load and return the report."""
+    # pylint: disable=import-outside-toplevel
+    from stub_upstream import StubUpstream, load_fixtures, synthetic_fixtures
+
+    fixtures = synthetic_fixtures(args.passenger_years, args.kmb_routes)
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures, fixtures)
+    mix = parse_mix(args.mix)
+    port = args.port or _free_port()
+    env = {**os.environ, "HK_TRANSPORT_DATA_DIR": "", "HK_TRANSPORT_WARM_START": "0"}
+
+    with StubUpstream(fixtures) as stub:
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                sys.executable,
+                __file__,
+                "--serve",
+                str(port),
+                "--upstream",
+                stub.url(),
+                "--workers",
+                str(args.workers),
+            ],
+            env=env,
+        )
+        try:
+            _wait_for_port(port, process, args.startup_timeout)
+            result = asyncio.run(
+                drive(f"http://127.0.0.1:{port}/mcp", mix, args.clients, args.duration)
+            )
+            server_pss_mb = _process_tree_pss_mb(process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        upstream_requests = dict(stub.requests)
+
+    return {
+        "config": {
+            "clients": args.clients,
+            "workers": args.workers,
+            "duration_s": args.duration,
+            "mix": mix,
+            "fixtures": args.fixtures or "synthetic",
+            "passenger_years": args.passenger_years,
+            "kmb_routes": args.kmb_routes,
+        },
+        **result,
+        "upstream_requests": upstream_requests,
+        "server_pss_mb": server_pss_mb,
+    }
+
+
+def _print_summary(report: Dict) -> None:
+    print(
+        f"{'tool':<30}{'calls':>8}{'errors':>8}{'req/s':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}",
+        file=sys.stderr,
+    )
+    rows = list(report["tools"].items()) + [("overall", report["overall"])]
+    for name, summary in rows:
+        print(
+            f"{name:<30}{summary['calls']:>8}{summary['errors']:>8}"
+            f"{summary['requests_per_s']:>9}{summary.get('p50_ms', '-'):>9}"
+            f"{summary.get('p95_ms', '-'):>9}{summary.get('p99_ms', '-'):>9}",
+            file=sys.stderr,
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse arguments, run the load test and write the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0].strip())
+    parser.add_argument("--clients", "-c", type=int, default=10, help="Concurrent MCP clients")
+    parser.add_argument("--duration", "-d", type=float, default=30, help="Seconds of load")
+    parser.add_argument(
+        "--mix",
+        default=",".join(f"{name}=1" for name in TOOL_CALLS),
+        help="Weighted tool mix as tool=weight,... Default equal weights",
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=1, help="Server worker processes. Default 1"
+    )
+    parser.add_argument("--output", "-o", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--port", type=int, help="Server port. Default a free port")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--passenger-years", type=float, default=10)
+    parser.add_argument("--kmb-routes", type=int, default=10000)
+    parser.add_argument(
+        "--fixtures", help="Directory of recorded fixtures, replacing the synthetic ones"
+    )
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--upstream", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, args.upstream, args.workers)
+        return 0
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    _print_summary(report)
+    return 1 if report["overall"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
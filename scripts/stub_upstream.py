@@ -0,0 +1,247 @@
+"""
+Local stub of the upstream open data APIs for offline benchmarks.
+
+The stub serves the passenger traffic CSV, the KMB route list and the land boundary
+queue feed from memory over HTTP on 127.0.0.1, with ETags so conditional requests get
+a 304 like they do upstream. Fixtures are either synthesized at a chosen scale or
+loaded from files recorded from the live upstream with record_fixtures().
+"""
+
+import contextlib
+import hashlib
+import os
+import random
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+from unittest.mock import patch
+
+import requests
+
+from hkopenai.hk_transportation_mcp_server.tools import (
+    bus_kmb,
+    land_custom_wait_time,
+    passenger_store,
+)
+
+PASSENGER_PATH = "/passenger_traffic.csv"
+KMB_ROUTE_PATH = "/kmb_route.json"
+WAIT_TIMES_PATH = "/wait_times.json"
+
+# Fixture file names under a recorded fixtures directory, with the live URL of each
+RECORDED = {
+    PASSENGER_PATH: ("passenger_traffic.csv", passenger_store.URL),
+    KMB_ROUTE_PATH: ("kmb_route.json", bus_kmb.URL),
+    WAIT_TIMES_PATH: ("wait_times.json", land_custom_wait_time.URL),
+}
+CONTENT_TYPES = {".csv": "text/csv; charset=utf-8", ".json": "application/json"}
+
+PASSENGER_HEADER = (
+    "Date,Control Point,Arrival / Departure,"
+    "Hong Kong Residents,Mainland Visitors,Other Visitors,Total\n"
+)
+PASSENGER_CONTROL_POINTS = (
+    "Airport",
+    "Express Rail Link West Kowloon",
+    "Hung Hom",
+    "Lo Wu",
+    "Lok Ma Chau Spur Line",
+    "Heung Yuen Wai",
+    "Hong Kong-Zhuhai-Macao Bridge",
+    "Lok Ma Chau",
+    "Man Kam To",
+    "Sha Tau Kok",
+    "Shenzhen Bay",
+    "China Ferry Terminal",
+    "Harbour Control",
+    "Kai Tak Cruise Terminal",
+    "Macau Ferry Terminal",
+    "Tuen Mun Ferry Terminal",
+)
+
+
+def passenger_csv(years: float, end: Optional[date] = None, seed: int = 0) -> bytes:
+    """Synthesize a passenger traffic CSV covering the given years up to end (default today)."""
+    rng = random.Random(seed)
+    end = end or date.today()
+    day = end - timedelta(days=int(years * 365.25) - 1)
+    lines = ["\ufeff" + PASSENGER_HEADER]
+    while day <= end:
+        stamp = day.strftime("%d-%m-%Y")
+        for point in PASSENGER_CONTROL_POINTS:
+            for direction in ("Arrival", "Departure"):
+                counts = [rng.randrange(50000), rng.randrange(50000), rng.randrange(5000)]
+                lines.append(
+                    f"{stamp},{point},{direction},{counts[0]},{counts[1]},{counts[2]},"
+                    f"{sum(counts)}\n"
+                )
+        day += timedelta(days=1)
+    return "".join(lines).encode("utf-8")
+
+
+def kmb_route_json(routes: int, seed: int = 0) -> bytes:
+    """Synthesize a KMB route list with the given number of route entries."""
+    rng = random.Random(seed)
+    places = [f"Place {n}" for n in range(max(routes // 4, 10))]
+    entries = []
+    for n in range(routes):
+        origin, destination = rng.sample(places, 2)
+        entries.append(
+            '{"route":"%d%s","bound":"%s","service_type":"%d",'
+            '"orig_en":"%s","orig_tc":"%s","orig_sc":"%s",'
+            '"dest_en":"%s","dest_tc":"%s","dest_sc":"%s"}'
+            % (
+                n // 4,
+                "ABCX"[n % 4] if n % 8 > 3 else "",
+                "IO"[n % 2],
+                1 + n % 3,
+                origin.upper(),
+                origin + "站",
+                origin + "站",
+                destination.upper(),
+                destination + "站",
+                destination + "站",
+            )
+        )
+    body = (
+        '{"type":"RouteList","version":"1.0",'
+        '"generated_timestamp":"2026-01-01T00:00:00+08:00","data":[' + ",".join(entries) + "]}"
+    )
+    return body.encode("utf-8")
+
+
+def wait_times_json(seed: int = 0) -> bytes:
+    """Synthesize a land boundary queue feed for every control point."""
+    rng = random.Random(seed)
+    statuses = (0, 0, 0, 1, 2, 99)
+    return (
+        "{"
+        + ",".join(
+            '"%s":{"arrQueue":%d,"depQueue":%d}'
+            % (code, rng.choice(statuses), rng.choice(statuses))
+            for code in land_custom_wait_time.CONTROL_POINTS
+        )
+        + "}"
+    ).encode("utf-8")
+
+
+def synthetic_fixtures(passenger_years: float = 10, kmb_routes: int = 10000) -> Dict[str, bytes]:
+    """Fixtures for every stub path, synthesized at the given scale."""
+    return {
+        PASSENGER_PATH: passenger_csv(passenger_years),
+        KMB_ROUTE_PATH: kmb_route_json(kmb_routes),
+        WAIT_TIMES_PATH: wait_times_json(),
+    }
+
+
+def load_fixtures(directory: str, fallback: Dict[str, bytes]) -> Dict[str, bytes]:
+    """Fixtures recorded in directory, using fallback for any file that is missing."""
+    fixtures = dict(fallback)
+    for path, (name, _) in RECORDED.items():
+        file = os.path.join(directory, name)
+        if os.path.exists(file):
+            with open(file, "rb") as f:
+                fixtures[path] = f.read()
+    return fixtures
+
+
+def record_fixtures(directory: str, timeout: float = 60) -> None:
+    """Download every upstream dataset once into directory, for later offline runs."""
+    os.makedirs(directory, exist_ok=True)
+    for name, url in RECORDED.values():
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(response.content)
+
+
+class StubUpstream:
+    """
+    HTTP server on an ephemeral local port serving fixtures by path.
+
+    Each response carries an ETag of its body; a matching If-None-Match gets a 304.
+    requests counts the requests served per path.
+    """
+
+    def __init__(self, fixtures: Dict[str, bytes]):
+        self.fixtures = {
+            path: (body, '"%s"' % hashlib.sha1(body).hexdigest())
+            for path, body in fixtures.items()
+        }
+        self.requests: Dict[str, int] = {path: 0 for path in fixtures}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def url(self, path: str = "") -> str:
+        """URL of a stub path, or the base URL of the stub."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serve one fixture, or a 304 when the client's ETag still matches."""
+
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; do not let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Answer a GET from the fixtures."""
+                fixture = stub.fixtures.get(self.path)
+                if fixture is None:
+                    self.send_error(404)
+                    return
+                with stub._lock:  # pylint: disable=protected-access
+                    stub.requests[self.path] += 1
+                body, etag = fixture
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPES[os.path.splitext(self.path)[1]])
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """Keep the benchmark output free of access logs."""
+
+        return Handler
+
+    def start(self) -> "StubUpstream":
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="stub-upstream", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubUpstream":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+@contextlib.contextmanager
+def redirect_tools(base_url: str) -> Iterator[Tuple[str, str, str]]:
+    """Point the passenger, KMB route and wait time tools at a stub's base URL while active."""
+    urls = (base_url + PASSENGER_PATH, base_url + KMB_ROUTE_PATH, base_url + WAIT_TIMES_PATH)
+    with patch.object(passenger_store, "URL", urls[0]), patch.object(
+        bus_kmb, "URL", urls[1]
+    ), patch.object(land_custom_wait_time, "URL", urls[2]):
+        yield urls
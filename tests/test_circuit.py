@@ -0,0 +1,81 @@
+"""
+Unit tests for per-host circuit breaking.
+
+This module tests that a breaker opens after consecutive failures, fails fast while
+open, lets one probe through after the reset timeout and closes again on success.
+"""
+
+import unittest
+from unittest.mock import patch
+from hkopenai.hk_transportation_mcp_server.circuit import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+MONOTONIC = "hkopenai.hk_transportation_mcp_server.circuit.time.monotonic"
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for CircuitBreaker."""
+
+    def test_opens_after_threshold(self):
+        """Consecutive failures up to the threshold open the breaker."""
+        breaker = CircuitBreaker("example", failure_threshold=3, reset_timeout=30)
+        for _ in range(2):
+            breaker.record_failure()
+            breaker.check()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError) as ctx:
+            breaker.check()
+        self.assertIn("example", str(ctx.exception))
+
+    def test_success_resets_failures(self):
+        """A success in between failures resets the count."""
+        breaker = CircuitBreaker("example", failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_probe_after_reset_timeout(self):
+        """After the reset timeout one probe is allowed; its outcome decides the state."""
+        with patch(MONOTONIC, return_value=100.0):
+            breaker = CircuitBreaker("example", failure_threshold=1, reset_timeout=30)
+            breaker.record_failure()
+        with patch(MONOTONIC, return_value=131.0):
+            breaker.check()
+            self.assertEqual(breaker.state, HALF_OPEN)
+            with self.assertRaises(CircuitOpenError):
+                breaker.check()
+            breaker.record_failure()
+            self.assertEqual(breaker.state, OPEN)
+        with patch(MONOTONIC, return_value=162.0):
+            breaker.check()
+            breaker.record_success()
+            self.assertEqual(breaker.state, CLOSED)
+            breaker.check()
+
+    def test_lost_probe_is_retried(self):
+        """A probe that never reports back does not keep the breaker half open forever."""
+        with patch(MONOTONIC, return_value=0.0):
+            breaker = CircuitBreaker("example", failure_threshold=1, reset_timeout=10)
+            breaker.record_failure()
+        with patch(MONOTONIC, return_value=11.0):
+            breaker.check()
+        with patch(MONOTONIC, return_value=22.0):
+            breaker.check()
+
+    def test_zero_threshold_disables(self):
+        """A threshold of zero never opens the breaker."""
+        breaker = CircuitBreaker("example", failure_threshold=0)
+        for _ in range(10):
+            breaker.record_failure()
+            breaker.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,403 @@
+"""
+Unit tests for the shared conditional-GET HTTP cache.
+
+This module tests TTL freshness, ETag/Last-Modified revalidation, LRU eviction by
+byte size and the hit/miss counters of the fetch layer used by every tool.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import httpx
+import requests
+from hkopenai.hk_transportation_mcp_server import http_cache as http_cache_module
+from hkopenai.hk_transportation_mcp_server.http_cache import (
+    HttpCache,
+    http_cache,
+    afetch_json_data,
+    fetch_json_data,
+    fetch_csv_from_url,
+    mark_stale,
+    warm_json_data,
+)
+
+
+def _response(status_code=200, content=b"", headers=None):
+    """Build a mock requests.Response."""
+    return MagicMock(status_code=status_code, content=content, headers=headers or {})
+
+
+class TestHttpCache(unittest.TestCase):
+    """Tests for HttpCache and the module-level fetch helpers."""
+
+    def setUp(self):
+        """Start every test with an empty shared cache."""
+        http_cache.clear()
+
+    def test_fresh_entry_is_served_without_network(self):
+        """A second fetch within the TTL must not hit the network."""
+        cache = HttpCache(ttl=60)
+        with patch.object(
+            cache._session, "get", return_value=_response(content=b"abc")
+        ) as mock_get:
+            first = cache.fetch("http://example/a")
+            second = cache.fetch("http://example/a")
+        self.assertIs(first, second)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_stale_entry_is_revalidated_with_validators(self):
+        """An expired entry is revalidated and reused on 304 Not Modified."""
+        cache = HttpCache(ttl=0)
+        headers = {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        with patch.object(
+            cache._session,
+            "get",
+            side_effect=[_response(content=b"abc", headers=headers), _response(304)],
+        ) as mock_get:
+            first = cache.fetch("http://example/a")
+            second = cache.fetch("http://example/a")
+        self.assertIs(first, second)
+        sent = mock_get.call_args_list[1].kwargs["headers"]
+        self.assertEqual(sent["If-None-Match"], '"v1"')
+        self.assertEqual(sent["If-Modified-Since"], "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_lru_eviction_respects_byte_cap(self):
+        """The least recently used entry is evicted once the byte cap is exceeded."""
+        cache = HttpCache(ttl=60, max_bytes=10)
+        with patch.object(cache._session, "get", return_value=_response(content=b"12345")):
+            cache.fetch("http://example/a")
+            cache.fetch("http://example/b")
+            cache.fetch("http://example/a")
+            cache.fetch("http://example/c")
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["bytes"], 10)
+        self.assertIn("http://example/a", cache._entries)
+        self.assertNotIn("http://example/b", cache._entries)
+
+    def test_decoded_payload_is_shared_until_body_changes(self):
+        """fetch_json_data returns the same object for an unchanged body."""
+        with patch.object(
+            http_cache._session, "get", return_value=_response(content=b'{"a": 1}')
+        ):
+            first = fetch_json_data("http://example/json", ttl=0)
+            second = fetch_json_data("http://example/json", ttl=0)
+        self.assertEqual(first, {"a": 1})
+        self.assertIs(first, second)
+
+    def test_csv_rows_strip_bom(self):
+        """fetch_csv_from_url strips the BOM from the header row."""
+        content = "\ufeffDate,Total\n01-01-2021,5\n".encode("utf-8")
+        with patch.object(http_cache._session, "get", return_value=_response(content=content)):
+            rows = fetch_csv_from_url("http://example/csv")
+        self.assertEqual(rows, [{"Date": "01-01-2021", "Total": "5"}])
+
+    def test_csv_rows_skip_blank_lines(self):
+        """fetch_csv_from_url skips blank lines instead of failing the download."""
+        content = b"a,b\r\n1,2\r\n\r\n3,4\r\n\r\n"
+        with patch.object(http_cache._session, "get", return_value=_response(content=content)):
+            rows = fetch_csv_from_url("http://example/blank")
+        self.assertEqual(rows, [{"a": "1", "b": "2"}, {"a": "3", "b": "4"}])
+
+    def test_afetch_shares_cache_with_fetch(self):
+        """Async fetches populate the same cache and revalidate with validators."""
+        cache = HttpCache(ttl=0)
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=b"abc", headers={"ETag": '"v1"'})
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch.object(cache, "_get_async_client", return_value=client):
+                first = await cache.afetch("http://example/a")
+                second = await cache.afetch("http://example/a")
+            await client.aclose()
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertIs(first, second)
+        self.assertEqual(seen, [None, '"v1"'])
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_async_client_closed_with_its_loop(self):
+        """Each event loop gets its own client, closed when asyncio.run shuts the loop down."""
+        cache = HttpCache()
+
+        async def client():
+            self.assertIs(cache._get_async_client(), cache._get_async_client())
+            return cache._get_async_client()
+
+        first = asyncio.run(client())
+        second = asyncio.run(client())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+        self.assertEqual(len(cache._loop_clients), 0)
+
+    def test_afetch_limits_connections_per_host(self):
+        """Concurrent async fetches to one host never exceed the per-host cap."""
+        active = {"now": 0, "peak": 0}
+
+        async def handler(request):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return httpx.Response(200, content=b'{"ok": true}')
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch.object(http_cache, "_get_async_client", return_value=client):
+                results = await asyncio.gather(
+                    *(afetch_json_data(f"http://example/{i}") for i in range(10))
+                )
+            await client.aclose()
+            return results
+
+        with patch.object(http_cache_module, "MAX_CONNECTIONS_PER_HOST", 3):
+            results = asyncio.run(run())
+        self.assertEqual(results, [{"ok": True}] * 10)
+        self.assertEqual(active["peak"], 3)
+
+    def test_afetch_error_is_reported(self):
+        """Transport failures on the async path become error dictionaries."""
+
+        def handler(request):
+            raise httpx.ConnectError("Connection error", request=request)
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch.object(http_cache, "_get_async_client", return_value=client):
+                result = await afetch_json_data("http://example/down")
+            await client.aclose()
+            return result
+
+        result = asyncio.run(run())
+        self.assertIn("Connection error", result["error"])
+
+    def _expire(self, cache, url, seconds):
+        """Age a cached entry by the given number of seconds."""
+        cache._entries[url].fetched_at -= seconds
+
+    def _wait_for_refresh(self, cache, url):
+        """Wait for a background refresh of url to finish."""
+        deadline = time.monotonic() + 2
+        while url in cache._refreshing and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def test_stale_entry_served_while_revalidating(self):
+        """Within the stale window an expired entry is returned at once and refreshed."""
+        cache = HttpCache(ttl=60, stale_window=600)
+        release = threading.Event()
+
+        def slow_get(*args, **kwargs):
+            if mock_get.call_count > 1:
+                release.wait(2)
+                return _response(content=b"new")
+            return _response(content=b"old")
+
+        with patch.object(cache._session, "get", side_effect=slow_get) as mock_get:
+            cache.fetch("http://example/a")
+            self._expire(cache, "http://example/a", 120)
+            stale = cache.fetch("http://example/a")
+            again = cache.fetch("http://example/a")
+            self.assertEqual(stale.content, b"old")
+            self.assertIs(again, stale)
+            self.assertAlmostEqual(cache.stale_age("http://example/a"), 120, delta=1)
+            release.set()
+            self._wait_for_refresh(cache, "http://example/a")
+            self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(cache.fetch("http://example/a").content, b"new")
+        self.assertIsNone(cache.stale_age("http://example/a"))
+        self.assertEqual(cache.stats()["stale"], 2)
+
+    def test_entry_beyond_stale_window_waits_for_upstream(self):
+        """An entry older than the stale window, or max_stale=0, is fetched synchronously."""
+        cache = HttpCache(ttl=60, stale_window=600)
+        with patch.object(
+            cache._session,
+            "get",
+            side_effect=[_response(content=b"v1"), _response(content=b"v2"), _response(content=b"v3")],
+        ):
+            cache.fetch("http://example/a")
+            self._expire(cache, "http://example/a", 1000)
+            self.assertEqual(cache.fetch("http://example/a").content, b"v2")
+            self._expire(cache, "http://example/a", 120)
+            self.assertEqual(cache.fetch("http://example/a", max_stale=0).content, b"v3")
+
+    def test_async_stale_entry_refreshed_in_task(self):
+        """The async path serves stale entries and revalidates them in a background task."""
+        cache = HttpCache(ttl=60, stale_window=600)
+        bodies = iter([b"old", b"new"])
+
+        def handler(request):
+            return httpx.Response(200, content=next(bodies))
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch.object(cache, "_get_async_client", return_value=client):
+                await cache.afetch("http://example/a")
+                self._expire(cache, "http://example/a", 120)
+                stale = await cache.afetch("http://example/a")
+                await asyncio.gather(*cache._background)
+                fresh = await cache.afetch("http://example/a")
+            await client.aclose()
+            return stale, fresh
+
+        stale, fresh = asyncio.run(run())
+        self.assertEqual(stale.content, b"old")
+        self.assertEqual(fresh.content, b"new")
+
+    def test_circuit_opens_after_repeated_failures(self):
+        """Once a host keeps failing, requests fail fast without touching the network."""
+        cache = HttpCache(ttl=60)
+        with patch.object(http_cache_module, "BREAKER_THRESHOLD", 2), patch.object(
+            cache._session,
+            "get",
+            side_effect=requests.exceptions.ConnectTimeout("timed out"),
+        ) as mock_get:
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.ConnectTimeout):
+                    cache.fetch("http://example/a")
+            with self.assertRaises(http_cache_module.CircuitOpenError):
+                cache.fetch("http://example/b")
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(cache.stats()["short_circuited"], 1)
+
+    def test_open_circuit_serves_stale_payload(self):
+        """A stale entry is still served while its host's circuit is open."""
+        with patch.object(http_cache_module, "BREAKER_THRESHOLD", 1), patch.object(
+            http_cache._session,
+            "get",
+            side_effect=[
+                _response(content=b'{"a": 1}'),
+                requests.exceptions.ConnectionError("down"),
+            ],
+        ):
+            fetch_json_data("http://example/json", ttl=60)
+            self.assertIn("down", fetch_json_data("http://example/other")["error"])
+            self.assertIn("Skipped", fetch_json_data("http://example/other")["error"])
+            self._expire(http_cache, "http://example/json", 120)
+            self.assertEqual(fetch_json_data("http://example/json", ttl=60), {"a": 1})
+            self._wait_for_refresh(http_cache, "http://example/json")
+            response = mark_stale({"type": "X", "data": 1}, "http://example/json", ttl=60)
+        self.assertTrue(response["stale"])
+        self.assertGreaterEqual(response["data_age_seconds"], 120)
+        self.assertEqual(mark_stale({"type": "Error"}, "http://example/json", 60), {"type": "Error"})
+
+    def test_client_errors_do_not_trip_circuit(self):
+        """4xx responses show the host is up and reset the failure count."""
+        cache = HttpCache(ttl=60)
+        not_found = _response(404)
+        not_found.raise_for_status.side_effect = requests.exceptions.HTTPError("404")
+        with patch.object(http_cache_module, "BREAKER_THRESHOLD", 1), patch.object(
+            cache._session, "get", return_value=not_found
+        ):
+            for _ in range(3):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    cache.fetch("http://example/missing")
+        self.assertEqual(cache.stats()["short_circuited"], 0)
+
+    def _snapshotting_cache(self, path, ttl=60):
+        """Build a cache that snapshots http://example/json into path."""
+        cache = HttpCache(ttl=ttl)
+        cache.enable_snapshots(path)
+        cache.persist("http://example/json")
+        return cache
+
+    def test_snapshot_warm_start(self):
+        """A new cache loads a decoded snapshot with its age and revalidates it with validators."""
+        with tempfile.TemporaryDirectory() as path:
+            writer = self._snapshotting_cache(path)
+            with patch.object(
+                writer._session,
+                "get",
+                return_value=_response(content=b'{"a": 1}', headers={"ETag": '"v1"'}),
+            ):
+                entry = writer.fetch("http://example/json")
+                writer.decode(entry, "json", http_cache_module._decode_json)
+                writer.decode(writer.fetch("http://example/other"), "json", lambda c: c)
+
+            reader = self._snapshotting_cache(path)
+            self.assertIsNone(reader.load_snapshot("http://example/other"))
+            loaded = reader.load_snapshot("http://example/json")
+            self.assertEqual(loaded.decoded, {"json": {"a": 1}})
+            self.assertEqual(loaded.etag, '"v1"')
+            self.assertIs(reader.load_snapshot("http://example/json"), loaded)
+            self.assertFalse(reader.revalidate_in_background("http://example/json"))
+
+            loaded.fetched_at -= 120
+            with patch.object(reader._session, "get", return_value=_response(304)) as mock_get:
+                self.assertTrue(reader.revalidate_in_background("http://example/json"))
+                self._wait_for_refresh(reader, "http://example/json")
+            self.assertEqual(mock_get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+            self.assertEqual(reader.stats()["revalidated"], 1)
+
+    def test_followed_snapshots(self):
+        """A follower serves the writer's snapshots instead of the upstream, and writes none."""
+        url = "http://example/json"
+
+        def fetch_json(cache):
+            return cache.decode(cache.fetch(url), "json", http_cache_module._decode_json)
+
+        with tempfile.TemporaryDirectory() as path:
+            writer = self._snapshotting_cache(path, ttl=0)
+            follower = HttpCache(ttl=60)
+            follower.follow_snapshots(path)
+            follower.persist(url)
+            # Without a snapshot to follow the upstream is fetched as usual
+            with patch.object(follower._session, "get", return_value=_response(content=b"[0]")):
+                self.assertEqual(fetch_json(follower), [0])
+            self.assertEqual(os.listdir(path), [])
+
+            with patch.object(writer._session, "get", return_value=_response(content=b"[1]")):
+                fetch_json(writer)
+            with patch.object(follower._session, "get") as mock_get:
+                follower._entries[url].fetched_at -= 120
+                followed = follower.fetch(url)
+                self.assertEqual(followed.decoded, {"json": [1]})
+                followed.fetched_at -= 120
+                self.assertFalse(follower.revalidate_in_background(url))
+                self.assertIs(follower.fetch(url), followed)
+            mock_get.assert_not_called()
+            self.assertLess(time.monotonic() - followed.fetched_at, 60)
+            self.assertEqual(follower.stats()["revalidated"], 1)
+
+    def test_snapshots_disabled_by_default(self):
+        """Without enable_snapshots nothing is loaded or written."""
+        cache = HttpCache(ttl=60)
+        cache.persist("http://example/json")
+        self.assertIsNone(cache.load_snapshot("http://example/json"))
+        with patch.object(cache._session, "get", return_value=_response(content=b"{}")):
+            cache.decode(cache.fetch("http://example/json"), "json", lambda c: c)
+
+    def test_warm_json_data(self):
+        """warm_json_data returns the snapshot payload of the shared cache without fetching."""
+        with tempfile.TemporaryDirectory() as path:
+            writer = self._snapshotting_cache(path)
+            with patch.object(writer._session, "get", return_value=_response(content=b"[1, 2]")):
+                entry = writer.fetch("http://example/json")
+                writer.decode(entry, "json", http_cache_module._decode_json)
+            self.assertIsNone(warm_json_data("http://example/json"))
+            reader = self._snapshotting_cache(path)
+            with patch.object(http_cache_module, "http_cache", reader), patch.object(
+                reader._session, "get"
+            ) as mock_get:
+                self.assertEqual(warm_json_data("http://example/json"), [1, 2])
+                self.assertEqual(fetch_json_data("http://example/json"), [1, 2])
+            mock_get.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Unit tests for the KMB route-stop graph.
+
+This module tests the CSR adjacency arrays, skipping of malformed rows, stop lookup by ID
+and name, and direct and one-transfer journey search.
+"""
+
+import unittest
+from hkopenai.hk_transportation_mcp_server.tools.kmb_route_graph import RouteGraph
+
+STOP_NAMES = [
+    ("A", "CHUK YUEN ESTATE", "竹園邨", 22.340),
+    ("B", "WONG TAI SIN", "黃大仙", 22.300),
+    ("C", "MONG KOK", "旺角", 22.310),
+    ("D", "STAR FERRY", "尖沙咀碼頭", 22.290),
+    ("E", "MEI FOO", "美孚", 22.330),
+    ("F", "TSUEN WAN", "荃灣", 22.370),
+]
+STOPS = [
+    {
+        "stop": stop_id,
+        "name_en": name_en,
+        "name_tc": name_tc,
+        "name_sc": name_tc,
+        "lat": str(lat),
+        "long": "114.1",
+    }
+    for stop_id, name_en, name_tc, lat in STOP_NAMES
+]
+
+
+def _pattern(route, bound, stops):
+    return [
+        {"route": route, "bound": bound, "service_type": "1", "seq": str(seq), "stop": stop}
+        for seq, stop in enumerate(stops, start=1)
+    ]
+
+
+# Sequences are listed out of order to check that seq, not position, orders stops
+ROUTE_STOPS = (
+    list(reversed(_pattern("1", "O", ["A", "B", "C", "D"])))
+    + _pattern("1", "I", ["D", "C", "B", "A"])
+    + _pattern("2", "O", ["B", "E", "F"])
+    + _pattern("3", "O", ["C", "E", "F"])
+)
+
+
+class TestRouteGraph(unittest.TestCase):
+    """Tests for RouteGraph."""
+
+    def setUp(self):
+        self.graph = RouteGraph(ROUTE_STOPS, STOPS)
+
+    def _ids(self, stops):
+        return [self.graph.stop_ids[s] for s in stops]
+
+    def test_malformed_rows_skipped(self):
+        """Rows missing fields or with unparseable values are counted and left out."""
+        bad_stops = [{"name_en": "NO ID"}, {"stop": "G", "lat": "north"}, None]
+        bad_route_stops = [
+            {"route": "4", "bound": "O", "service_type": "1", "seq": "x", "stop": "A"},
+            {"route": "4", "bound": "O", "seq": "1", "stop": "A"},
+            {"route": "4", "bound": "O", "service_type": "1", "seq": "2", "stop": None},
+            "4,O,1,3,A",
+        ]
+        with self.assertLogs("hkopenai.hk_transportation_mcp_server.tools.kmb_route_graph"):
+            graph = RouteGraph(ROUTE_STOPS + bad_route_stops, STOPS + bad_stops)
+        self.assertEqual(graph.skipped, 7)
+        self.assertEqual(graph.patterns, self.graph.patterns)
+        self.assertEqual(graph.stop_ids, self.graph.stop_ids)
+        self.assertEqual(len(graph.lat), len(graph))
+        self.assertEqual(self.graph.skipped, 0)
+
+    def test_csr_arrays(self):
+        """Patterns list stops in seq order and stops list the patterns serving them."""
+        self.assertEqual(self.graph.patterns[0], ("1", "I", "1"))
+        outbound = self.graph.patterns.index(("1", "O", "1"))
+        self.assertEqual(self._ids(self.graph.pattern_stop_ids(outbound)), ["A", "B", "C", "D"])
+        serving = sorted(
+            (self.graph.patterns[p], pos) for p, pos in self.graph.serving(self.graph.stop("E"))
+        )
+        self.assertEqual(serving, [(("2", "O", "1"), 1), (("3", "O", "1"), 1)])
+        self.assertEqual(len(self.graph.stop_patterns), len(ROUTE_STOPS))
+
+    def test_find_stops(self):
+        """Stops resolve by exact ID or by name in any language."""
+        self.assertEqual(self._ids(self.graph.find_stops("C")), ["C"])
+        self.assertEqual(self._ids(self.graph.find_stops("mei")), ["E"])
+        self.assertEqual(self._ids(self.graph.find_stops("荃灣")), ["F"])
+        self.assertEqual(self.graph.find_stops("nowhere"), [])
+
+    def test_direct(self):
+        """Direct legs only ride forwards along a pattern."""
+        legs = self.graph.direct([self.graph.stop("A")], [self.graph.stop("C")])
+        self.assertEqual([self.graph.patterns[leg.pattern] for leg in legs], [("1", "O", "1")])
+        self.assertEqual(legs[0].stops, 2)
+        self.assertEqual(self.graph.direct([self.graph.stop("F")], [self.graph.stop("A")]), [])
+
+    def test_one_transfer(self):
+        """One-transfer journeys are ordered by total stops."""
+        journeys = self.graph.one_transfer([self.graph.stop("A")], [self.graph.stop("F")])
+        described = [
+            (
+                self.graph.patterns[first.pattern][0],
+                self.graph.patterns[second.pattern][0],
+                first.stops + second.stops,
+            )
+            for first, second in journeys
+        ]
+        self.assertEqual(described, [("1", "2", 3), ("1", "3", 4)])
+        first, second = journeys[0]
+        transfer = self.graph.pattern_stop_ids(second.pattern)[second.board]
+        self.assertEqual(self.graph.stop_ids[transfer], "B")
+
+    def test_unknown_route_stop_is_added(self):
+        """Route stops missing from the stop list still become graph nodes."""
+        graph = RouteGraph(_pattern("9", "O", ["X", "Y"]), [])
+        self.assertEqual(len(graph), 2)
+        self.assertEqual(len(graph.direct([graph.stop("X")], [graph.stop("Y")])), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Unit tests for the KMB route lookup indexes.
+
+This module tests exact and prefix route matching, substring search over origin and
+destination names in every language, and bound and service type filters.
+"""
+
+import unittest
+from hkopenai.hk_transportation_mcp_server.tools.kmb_route_index import (
+    RouteIndex,
+    normalize_bound,
+)
+
+
+def _route(route, bound, service_type, orig, dest):
+    return {
+        "route": route,
+        "bound": bound,
+        "service_type": service_type,
+        "orig_en": orig[0],
+        "orig_tc": orig[1],
+        "orig_sc": orig[2],
+        "dest_en": dest[0],
+        "dest_tc": dest[1],
+        "dest_sc": dest[2],
+    }
+
+
+CHUK_YUEN = ("CHUK YUEN ESTATE", "竹園邨", "竹园邨")
+STAR_FERRY = ("STAR FERRY", "尖沙咀碼頭", "尖沙咀码头")
+MEI_FOO = ("MEI FOO", "美孚", "美孚")
+TUEN_MUN = ("TUEN MUN STATION", "屯門站", "屯门站")
+
+ROUTES = [
+    _route("1", "O", "1", CHUK_YUEN, STAR_FERRY),
+    _route("1", "I", "1", STAR_FERRY, CHUK_YUEN),
+    _route("1A", "O", "1", CHUK_YUEN, STAR_FERRY),
+    _route("1A", "O", "2", CHUK_YUEN, MEI_FOO),
+    _route("10", "O", "1", MEI_FOO, STAR_FERRY),
+    _route("260", "O", "1", TUEN_MUN, STAR_FERRY),
+]
+
+
+class TestRouteIndex(unittest.TestCase):
+    """Tests for RouteIndex."""
+
+    def setUp(self):
+        self.index = RouteIndex(ROUTES)
+
+    def test_exact_route(self):
+        """Exact lookups ignore case and return every bound and service type."""
+        self.assertEqual(len(self.index.search(route="1")), 2)
+        self.assertEqual(len(self.index.search(route="1a")), 2)
+        self.assertEqual(self.index.search(route="99"), [])
+
+    def test_route_prefix(self):
+        """Prefix lookups return all routes starting with the prefix, in upstream order."""
+        self.assertEqual(
+            [r["route"] for r in self.index.search(route_prefix="1")],
+            ["1", "1", "1A", "1A", "10"],
+        )
+        self.assertEqual([r["route"] for r in self.index.search(route_prefix="26")], ["260"])
+
+    def test_text_search_in_every_language(self):
+        """Origin and destination match substrings and tokens in en, tc and sc."""
+        self.assertEqual(len(self.index.search(destination="star")), 4)
+        self.assertEqual(len(self.index.search(destination="尖沙咀")), 4)
+        self.assertEqual(len(self.index.search(destination="码头")), 4)
+        self.assertEqual(len(self.index.search(origin="yuen chuk")), 3)
+        self.assertEqual(len(self.index.search(origin="屯")), 1)
+        self.assertEqual(self.index.search(origin="kowloon"), [])
+
+    def test_filters_combine(self):
+        """All criteria must match."""
+        rows = self.index.search(route="1A", destination="mei", service_type="2")
+        self.assertEqual(rows, [ROUTES[3]])
+        self.assertEqual(self.index.search(route="1", bound="I"), [ROUTES[1]])
+        self.assertEqual(self.index.search(route_prefix="1", origin="mei foo"), [ROUTES[4]])
+
+    def test_normalize_bound(self):
+        """Bounds are accepted as names or upstream codes."""
+        self.assertEqual(normalize_bound("outbound"), "O")
+        self.assertEqual(normalize_bound("I"), "I")
+        self.assertIsNone(normalize_bound("north"))
+        self.assertIsNone(normalize_bound(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Unit tests for the KMB stop spatial index.
+
+This module tests that grid nearest-stop queries agree with a full scan, honour the
+distance limit and handle queries far from every stop.
+"""
+
+import random
+import unittest
+from hkopenai.hk_transportation_mcp_server.tools.kmb_stop_grid import StopGrid
+
+
+class TestStopGrid(unittest.TestCase):
+    """Tests for StopGrid."""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(7)
+        cls.stops = [
+            {
+                "stop": f"S{i}",
+                "lat": str(22.2 + rng.random() * 0.3),
+                "long": str(113.9 + rng.random() * 0.4),
+            }
+            for i in range(2000)
+        ]
+        cls.grid = StopGrid(cls.stops)
+        cls.rng = rng
+
+    def test_matches_full_scan(self):
+        """Grid lookups return the same stops as measuring every stop."""
+        for _ in range(100):
+            lat = 22.2 + self.rng.random() * 0.3
+            lon = 113.9 + self.rng.random() * 0.4
+            nearest = self.grid.nearest(lat, lon, 5)
+            expected = self.grid._scan(lat, lon, 5, None)
+            self.assertEqual([i for i, _ in nearest], [i for i, _ in expected])
+            distances = [d for _, d in nearest]
+            self.assertEqual(distances, sorted(distances))
+
+    def test_distance(self):
+        """Distances are in metres."""
+        grid = StopGrid(
+            [
+                {"stop": "A", "lat": "22.3", "long": "114.1"},
+                {"stop": "B", "lat": "22.31", "long": "114.1"},
+            ]
+        )
+        [(index, distance)] = grid.nearest(22.3, 114.1, 1)
+        self.assertEqual(grid.stop_ids[index], "A")
+        self.assertAlmostEqual(distance, 0)
+        self.assertAlmostEqual(grid.nearest(22.3, 114.1, 2)[1][1], 1112, delta=1)
+
+    def test_max_distance(self):
+        """Stops beyond max_distance are excluded."""
+        for _, distance in self.grid.nearest(22.35, 114.1, 50, max_distance=300):
+            self.assertLessEqual(distance, 300)
+        self.assertEqual(self.grid.nearest(23.5, 114.1, 5, max_distance=1000), [])
+
+    def test_far_query(self):
+        """Queries far from every stop still return the nearest ones."""
+        nearest = self.grid.nearest(0.0, 0.0, 3)
+        self.assertEqual(
+            [i for i, _ in nearest], [i for i, _ in self.grid._scan(0.0, 0.0, 3, None)]
+        )
+
+    def test_invalid_coordinates_skipped(self):
+        """Stops without usable coordinates are left out of the index."""
+        grid = StopGrid([{"stop": "A", "lat": "", "long": "114.1"}, {"stop": "B"}])
+        self.assertEqual(len(grid), 0)
+        self.assertEqual(grid.nearest(22.3, 114.1, 5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Unit tests for the in-process metrics.
+
+This module tests the Prometheus text rendering of counters and histograms, and how
+tool call phases and upstream requests are recorded.
+"""
+
+import time
+import unittest
+from hkopenai.hk_transportation_mcp_server.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    phase,
+    record_call,
+    record_upstream,
+    tool_calls,
+    tool_phase,
+    upstream_bytes,
+    upstream_requests,
+)
+
+
+class TestMetricTypes(unittest.TestCase):
+    """Tests for Counter, Histogram and Registry."""
+
+    def test_counter(self):
+        """Counters add up per label set and render one sample each."""
+        counter = Counter("requests_total", "Requests.", ("status",))
+        counter.inc("200")
+        counter.inc("200", amount=2)
+        counter.inc('bad"label')
+        self.assertEqual(counter.value("200"), 3)
+        self.assertEqual(counter.value("500"), 0)
+        self.assertEqual(
+            counter.samples(),
+            ['requests_total{status="200"} 3', 'requests_total{status="bad\\"label"} 1'],
+        )
+
+    def test_histogram(self):
+        """Histogram buckets are cumulative, with the sum and count of observations."""
+        histogram = Histogram("latency_seconds", "Latency.", ("tool",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "a")
+        self.assertEqual(histogram.count("a"), 4)
+        self.assertEqual(histogram.count("b"), 0)
+        self.assertEqual(
+            histogram.samples(),
+            [
+                'latency_seconds_bucket{tool="a",le="0.1"} 2',
+                'latency_seconds_bucket{tool="a",le="1"} 3',
+                'latency_seconds_bucket{tool="a",le="+Inf"} 4',
+                'latency_seconds_sum{tool="a"} 3.65',
+                'latency_seconds_count{tool="a"} 4',
+            ],
+        )
+
+    def test_registry_render(self):
+        """The registry renders HELP and TYPE lines, samples and collector output."""
+        registry = Registry()
+        registry.register(Counter("events_total", "Events.")).inc()
+        registry.collectors.append(lambda: ["collected 1"])
+        self.assertEqual(
+            registry.render(),
+            "# HELP events_total Events.\n# TYPE events_total counter\n"
+            "events_total 1\ncollected 1\n",
+        )
+
+
+class TestCallRecording(unittest.TestCase):
+    """Tests for record_call(), phase() and record_upstream()."""
+
+    def test_phases(self):
+        """Phases are recorded per tool and serialize takes the unclaimed time."""
+        with record_call("test_phases") as record:
+            with phase("fetch"):
+                time.sleep(0.01)
+            with phase("filter"):
+                pass
+            time.sleep(0.01)
+            record.finish("ok", 10)
+        self.assertGreaterEqual(record.phases["fetch"], 0.01)
+        for name in ("fetch", "filter", "serialize"):
+            self.assertEqual(tool_phase.count("test_phases", name), 1)
+        self.assertEqual(tool_phase.count("test_phases", "parse"), 0)
+        self.assertEqual(tool_calls.value("test_phases", "ok"), 1)
+
+    def test_nested_phase(self):
+        """Time in a nested phase is taken out of the enclosing one."""
+
+        @phase("filter")
+        def format_response():
+            with phase("parse"):
+                time.sleep(0.02)
+
+        with record_call("test_nested_phase") as record:
+            format_response()
+        self.assertGreaterEqual(record.phases["parse"], 0.02)
+        self.assertLess(record.phases["filter"], 0.01)
+
+    def test_phase_outside_call(self):
+        """Phases outside a tool call and after it finished are not recorded."""
+        with phase("parse"):
+            pass
+        with record_call("test_phase_outside_call") as record:
+            record.finish("ok")
+            with phase("parse"):
+                pass
+        self.assertEqual(record.phases, {})
+
+    def test_record_upstream(self):
+        """Upstream requests are counted by host and status, with their body bytes."""
+        record_upstream("https://upstream.test/data.json", "200", 0.1, 100)
+        record_upstream("https://upstream.test/other.json", "error", 0.2)
+        self.assertEqual(upstream_requests.value("upstream.test", "200"), 1)
+        self.assertEqual(upstream_requests.value("upstream.test", "error"), 1)
+        self.assertEqual(upstream_bytes.value("upstream.test"), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Unit tests for serving the metrics over MCP.
+
+This module tests that tool calls are recorded by the middleware, traced and profiled
+on request where the server allows it, and that the metrics are served on the /metrics
+route and as an MCP resource.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+from fastmcp import Client, FastMCP
+from starlette.testclient import TestClient
+from hkopenai.hk_transportation_mcp_server import metrics_endpoint, tracing
+from hkopenai.hk_transportation_mcp_server.metrics import (
+    phase,
+    tool_calls,
+    tool_phase,
+    tool_response_bytes,
+)
+
+
+def _server():
+    mcp = FastMCP(name="test")
+
+    @mcp.tool()
+    def metrics_test_ok() -> dict:
+        with phase("filter"):
+            return {"type": "Result", "data": "x" * 100}
+
+    @mcp.tool()
+    def metrics_test_traced() -> dict:
+        with phase("filter"):
+            return {"type": "Result"}
+
+    @mcp.tool()
+    def metrics_test_error() -> dict:
+        return {"type": "Error", "error": "failed"}
+
+    @mcp.tool()
+    def metrics_test_raise() -> dict:
+        raise ValueError("failed")
+
+    metrics_endpoint.register(mcp)
+    return mcp
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Tests for metrics_endpoint.register()."""
+
+    def setUp(self):
+        self.mcp = _server()
+
+    async def _call_tools(self):
+        async with Client(self.mcp) as client:
+            await client.call_tool("metrics_test_ok", {})
+            await client.call_tool("metrics_test_error", {}, raise_on_error=False)
+            await client.call_tool("metrics_test_raise", {}, raise_on_error=False)
+            resource = await client.read_resource(metrics_endpoint.RESOURCE_URI)
+        return resource[0].text
+
+    def test_tool_calls_recorded(self):
+        """Calls are counted by outcome with their phases and response sizes."""
+        text = asyncio.run(self._call_tools())
+        self.assertEqual(tool_calls.value("metrics_test_ok", "ok"), 1)
+        self.assertEqual(tool_calls.value("metrics_test_error", "error"), 1)
+        self.assertEqual(tool_calls.value("metrics_test_raise", "error"), 1)
+        self.assertEqual(tool_phase.count("metrics_test_ok", "filter"), 1)
+        self.assertEqual(tool_response_bytes.count("metrics_test_ok"), 1)
+        self.assertIn('hk_transport_tool_calls_total{tool="metrics_test_ok",outcome="ok"} 1', text)
+
+    async def _call_traced(self):
+        async with Client(self.mcp) as client:
+            await client.call_tool("metrics_test_traced", {})
+            await client.call_tool(
+                "metrics_test_traced",
+                {},
+                meta={tracing.TRACE_META_KEY: True, tracing.PROFILE_META_KEY: True},
+            )
+
+    def test_traced_and_profiled_on_request(self):
+        """The request _meta switches turn on tracing and profiling for one call."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        with mock.patch.dict(
+            os.environ, {"HK_TRANSPORT_DIAGNOSTICS_DIR": tmp.name}
+        ), mock.patch.object(tracing, "ALLOW_CLIENT", True):
+            asyncio.run(self._call_traced())
+        files = os.listdir(tmp.name)
+        self.assertEqual(len([name for name in files if name.endswith(".prof")]), 1)
+        with open(os.path.join(tmp.name, tracing.TRACE_FILE_NAME), encoding="utf-8") as f:
+            traces = f.readlines()
+        self.assertEqual(len(traces), 1)
+        self.assertIn('"name":"filter"', traces[0])
+
+    def test_request_switches_need_operator_opt_in(self):
+        """Without HK_TRANSPORT_TRACE_ALLOW_CLIENT the _meta switches are ignored."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        with mock.patch.dict(
+            os.environ, {"HK_TRANSPORT_DIAGNOSTICS_DIR": tmp.name}
+        ), mock.patch.object(tracing, "ALLOW_CLIENT", False):
+            asyncio.run(self._call_traced())
+        self.assertEqual(os.listdir(tmp.name), [])
+
+    def test_http_route(self):
+        """GET /metrics serves the registry in the Prometheus text format."""
+        response = TestClient(self.mcp.http_app()).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE hk_transport_tool_duration_seconds histogram", response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Unit tests for cursor pagination and field projection helpers.
+
+This module tests cursor round trips, rejection of malformed cursors and validation of
+page sizes and field lists.
+"""
+
+import unittest
+from hkopenai.hk_transportation_mcp_server.pagination import (
+    MAX_LIMIT,
+    decode_cursor,
+    encode_cursor,
+    parse_page,
+    project,
+    table,
+    validate_fields,
+    validate_format,
+    validate_limit,
+)
+
+
+class TestPagination(unittest.TestCase):
+    """Tests for the pagination helpers."""
+
+    def test_cursor_round_trip(self):
+        """A cursor decodes to the position it was built from."""
+        cursor = encode_cursor({"stop": 1234, "offset": 56})
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor, ("stop", "offset")), {"stop": 1234, "offset": 56})
+        self.assertIsNone(decode_cursor(None, ("offset",)))
+        self.assertIsNone(decode_cursor("", ("offset",)))
+
+    def test_malformed_cursor(self):
+        """Garbage, foreign and negative cursors are rejected."""
+        for cursor in ("not a cursor", "e30", encode_cursor({"offset": -1}), "W10"):
+            with self.assertRaisesRegex(ValueError, "Invalid cursor"):
+                decode_cursor(cursor, ("offset",))
+        with self.assertRaises(ValueError):
+            decode_cursor(encode_cursor({"offset": 1}), ("stop", "offset"))
+
+    def test_limit_bounds(self):
+        """Limits must be positive and at most MAX_LIMIT."""
+        self.assertIsNone(validate_limit(None))
+        self.assertEqual(validate_limit(MAX_LIMIT), MAX_LIMIT)
+        for limit in (0, -1, MAX_LIMIT + 1):
+            with self.assertRaises(ValueError):
+                validate_limit(limit)
+
+    def test_fields(self):
+        """Fields keep the requested order, drop duplicates and reject unknown names."""
+        available = ("a", "b", "c")
+        self.assertIsNone(validate_fields(None, available))
+        self.assertIsNone(validate_fields([], available))
+        self.assertEqual(validate_fields(["c", "a", "c"], available), ("c", "a"))
+        with self.assertRaisesRegex(ValueError, "Invalid fields"):
+            validate_fields(["d"], available)
+        self.assertEqual(project([{"a": 1, "b": 2}], ("b",)), [{"b": 2}])
+        rows = ({"a": 1},)
+        self.assertEqual(project(rows, None), [{"a": 1}])
+
+    def test_format(self):
+        """Formats default to records and must be known."""
+        self.assertEqual(validate_format(None), "records")
+        self.assertEqual(validate_format("columnar"), "columnar")
+        with self.assertRaisesRegex(ValueError, "Invalid format"):
+            validate_format("csv")
+        self.assertEqual(table(("a", "b"), [[1, 2]]), {"columns": ["a", "b"], "rows": [[1, 2]]})
+
+    def test_parse_page(self):
+        """parse_page validates all three arguments together."""
+        cursor = encode_cursor({"offset": 3})
+        self.assertEqual(
+            parse_page(10, cursor, ["a"], ("offset",), ("a",)), (10, {"offset": 3}, ("a",))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
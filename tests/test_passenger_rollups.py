@@ -0,0 +1,119 @@
+"""
+Unit tests for the materialized passenger traffic rollups.
+
+This module tests that rollups grown batch by batch match one built from every row at
+once, that rows must come in date order, and the period helpers, including the tiling
+of a day range with whole periods.
+"""
+
+import unittest
+from datetime import date
+from hkopenai.hk_transportation_mcp_server.tools.passenger_rollups import (
+    ALL,
+    PassengerRollups,
+    period_blocks,
+    period_label,
+    period_start,
+    period_starts,
+)
+
+# Ten days from Wednesday 30-12-2020, two control points and two directions a day
+START = date(2020, 12, 30).toordinal()
+DAYS = [START + offset for offset in range(10) for _ in range(4)]
+CONTROL_POINTS = [0, 0, 1, 1] * 10
+DIRECTIONS = [0, 1, 0, 1] * 10
+COUNTS = [list(range(1, 41)), [2] * 40]
+
+
+def _rollups(*batches):
+    """Build rollups adding the rows in batches split at the given row indices."""
+    rollups = PassengerRollups(len(COUNTS))
+    bounds = [0, *batches, len(DAYS)]
+    for lo, hi in zip(bounds, bounds[1:]):
+        rollups.add_rows(DAYS, CONTROL_POINTS, DIRECTIONS, COUNTS, lo, hi)
+    return rollups
+
+
+class TestPeriods(unittest.TestCase):
+    """Tests for the period helpers."""
+
+    def test_period_start_and_label(self):
+        """Periods start on the day, the Monday, the first of the month and of the year."""
+        day = date(2021, 1, 6).toordinal()
+        labels = {
+            period: period_label(period_start(day, period), period)
+            for period in ("day", "week", "month", "year")
+        }
+        self.assertEqual(
+            labels, {"day": "06-01-2021", "week": "2021-W01", "month": "2021-01", "year": "2021"}
+        )
+
+    def test_period_blocks(self):
+        """A range is tiled with the longest whole periods, leaving single days at its edges."""
+        first, last = date(2020, 11, 29).toordinal(), date(2022, 2, 2).toordinal()
+        blocks = list(period_blocks(first, last, ("year", "month", "day")))
+        self.assertEqual(
+            [(period, date.fromordinal(start)) for period, start in blocks],
+            [("day", date(2020, 11, 29)), ("day", date(2020, 11, 30))]
+            + [("month", date(2020, 12, 1)), ("year", date(2021, 1, 1))]
+            + [("month", date(2022, 1, 1)), ("day", date(2022, 2, 1)), ("day", date(2022, 2, 2))],
+        )
+        first, last = date(2021, 1, 2).toordinal(), date(2021, 1, 17).toordinal()
+        weeks = list(period_blocks(first, last, ("week", "day")))
+        self.assertEqual([period for period, _ in weeks], ["day", "day", "week", "week"])
+
+    def test_period_starts(self):
+        """Consecutive periods are returned newest first."""
+        starts = period_starts(date(2021, 3, 15).toordinal(), "month", 3)
+        self.assertEqual(
+            [date.fromordinal(start) for start in starts],
+            [date(2021, 3, 1), date(2021, 2, 1), date(2021, 1, 1)],
+        )
+
+
+class TestPassengerRollups(unittest.TestCase):
+    """Tests for PassengerRollups."""
+
+    def test_incremental_matches_full_build(self):
+        """Adding rows in batches, splitting weeks and months, gives the same series."""
+        full = _rollups()
+        incremental = _rollups(4, 12, 20)
+        for period, series in full.series.items():
+            self.assertEqual(series.keys(), incremental.series[period].keys())
+            for key, values in series.items():
+                other = incremental.series[period][key]
+                self.assertEqual(values.starts, other.starts)
+                self.assertEqual(values.values, other.values)
+
+    def test_get(self):
+        """Lookups return the sums and day count of one period and key."""
+        rollups = _rollups(8)
+        monday = date(2021, 1, 4).toordinal()
+        # Rows 20..39 fall on 04-01-2021..08-01-2021
+        self.assertEqual(rollups.get("week", monday), ([sum(range(21, 41)), 40], 5))
+        self.assertEqual(
+            rollups.get("week", monday, control_point=1, direction=0),
+            ([23 + 27 + 31 + 35 + 39, 10], 5),
+        )
+        self.assertEqual(
+            rollups.get("year", date(2020, 1, 1).toordinal(), ALL, 1), ([2 + 4 + 6 + 8, 8], 2)
+        )
+        self.assertIsNone(rollups.get("day", START - 1))
+        self.assertIsNone(rollups.get("day", START, control_point=2))
+
+    def test_keys(self):
+        """Keys are filtered by the requested grouping."""
+        rollups = _rollups()
+        self.assertEqual(list(rollups.keys("month", False, False)), [(ALL, ALL)])
+        self.assertEqual(sorted(rollups.keys("month", True, False)), [(0, ALL), (1, ALL)])
+        self.assertEqual(len(list(rollups.keys("day", True, True))), 4)
+
+    def test_rows_out_of_order(self):
+        """Rows of a day already added are rejected."""
+        rollups = _rollups()
+        with self.assertRaises(ValueError):
+            rollups.add_rows(DAYS, CONTROL_POINTS, DIRECTIONS, COUNTS, 36, 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+"""
+Unit tests for the incremental passenger traffic store.
+
+This module tests that refreshes only append days newer than the high-water mark,
+that the columnar files on disk survive a process restart, that an unwritable data
+directory leaves an in-memory store, that materialized rollups keep up with the
+appended rows, and that aggregates built from them match sums over the rows.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from hkopenai.hk_transportation_mcp_server.http_cache import http_cache
+from hkopenai.hk_transportation_mcp_server.tools import passenger_store
+from hkopenai.hk_transportation_mcp_server.tools.passenger_rollups import (
+    PERIODS,
+    period_label,
+    period_start,
+)
+from hkopenai.hk_transportation_mcp_server.tools.passenger_store import (
+    COUNT_COLUMNS,
+    PassengerStore,
+    format_date,
+    parse_date,
+)
+
+HEADER = "Date,Control Point,Arrival / Departure,Hong Kong Residents,Mainland Visitors,Other Visitors,Total\n"
+DAY_1 = "01-01-2021,Airport,Arrival,341,0,9,350\n01-01-2021,Airport,Departure,803,17,28,848\n"
+DAY_2 = "02-01-2021,Lo Wu,Arrival,363,10,10,383\n02-01-2021,Lo Wu,Departure,940,22,33,995\n"
+
+
+class TestPassengerStore(unittest.TestCase):
+    """Tests for PassengerStore refresh, query and persistence."""
+
+    def setUp(self):
+        """Start every test with an empty upstream cache."""
+        http_cache.clear()
+        self.addCleanup(patch.stopall)
+
+    def _serve(self, csv_text):
+        """Serve csv_text from the mocked upstream, bypassing the HTTP cache TTL."""
+        http_cache.clear()
+        response = MagicMock(status_code=200, content=csv_text.encode("utf-8"), headers={})
+        patch.object(http_cache._session, "get", return_value=response).start()
+
+    def test_date_round_trip(self):
+        """parse_date and format_date are inverses."""
+        self.assertEqual(format_date(parse_date("08-01-2021")), "08-01-2021")
+
+    def test_refresh_appends_only_new_days(self):
+        """A second refresh only decodes rows after the high-water mark."""
+        store = PassengerStore()
+        self._serve("\ufeff" + HEADER + DAY_1)
+        self.assertEqual(store.refresh(force=True), 2)
+        self._serve(HEADER + DAY_1 + DAY_2)
+        self.assertEqual(store.refresh(force=True), 2)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.high_water, parse_date("02-01-2021"))
+        self.assertEqual(store.refresh(force=True), 0)
+
+    def test_query_returns_newest_first(self):
+        """Rows come back newest day first, keeping file order within a day."""
+        store = PassengerStore()
+        self._serve(HEADER + DAY_1 + DAY_2)
+        store.refresh()
+        rows = store.query()
+        self.assertEqual([r["date"] for r in rows], ["02-01-2021"] * 2 + ["01-01-2021"] * 2)
+        self.assertEqual(rows[0]["control_point"], "Lo Wu")
+        self.assertEqual(rows[0]["direction"], "Arrival")
+        self.assertEqual(rows[-1]["total"], 848)
+
+    def test_query_date_range_bounds(self):
+        """Start and end bounds are inclusive and may fall outside the data."""
+        store = PassengerStore()
+        self._serve(HEADER + DAY_1 + DAY_2)
+        store.refresh()
+        day_1, day_2 = parse_date("01-01-2021"), parse_date("02-01-2021")
+        self.assertEqual(store.day_range(day_2, day_2), range(2, 4))
+        self.assertEqual(len(store.query(day_1, day_1)), 2)
+        self.assertEqual(len(store.query(end=day_1 - 1)), 0)
+        self.assertEqual(len(store.query(start=day_2 + 1)), 0)
+        self.assertEqual(len(store.query(start=day_1 - 30, end=day_2 + 30)), 4)
+        self.assertEqual(store.query(start=day_2, end=day_1), [])
+
+    def test_query_pages_split_days(self):
+        """Offset and limit pages concatenate to the full listing, even mid-day."""
+        store = PassengerStore()
+        self._serve(HEADER + DAY_1 + DAY_2)
+        store.refresh()
+        full = store.query()
+        pages = [store.query(limit=3, offset=offset) for offset in (0, 3)]
+        self.assertEqual(pages[0] + pages[1], full)
+        self.assertEqual(store.query(offset=1, limit=2), full[1:3])
+        self.assertEqual(store.query(stop=2), full[2:])
+        self.assertEqual(
+            store.query(fields=("total", "control_point"), limit=1),
+            [{"total": 383, "control_point": "Lo Wu"}],
+        )
+
+    def test_table_matches_query(self):
+        """table() returns the query() rows as value lists in field order."""
+        store = PassengerStore()
+        self._serve(HEADER + DAY_1 + DAY_2)
+        store.refresh()
+        self.assertEqual(store.table(), [list(row.values()) for row in store.query()])
+        self.assertEqual(
+            store.table(fields=("direction", "total"), offset=1, limit=2),
+            [["Departure", 995], ["Arrival", 350]],
+        )
+
+    def test_malformed_row_leaves_store_unchanged(self):
+        """A malformed new row raises ValueError without appending anything."""
+        store = PassengerStore()
+        self._serve(HEADER + DAY_1 + "02-01-2021,Lo Wu,Arrival,x,10,10,383\n")
+        with self.assertRaises(ValueError):
+            store.refresh()
+        self.assertEqual(len(store), 0)
+
+    def test_persistence_across_instances(self):
+        """A new store instance loads persisted rows and skips recent refreshes."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PassengerStore(tmp)
+            self._serve(HEADER + DAY_1 + DAY_2)
+            store.refresh()
+
+            reloaded = PassengerStore(tmp)
+            self.assertEqual(len(reloaded), 4)
+            self.assertEqual(reloaded.query(), store.query())
+            self.assertEqual(reloaded.refresh(), 0)
+
+    def test_interrupted_append_is_truncated(self):
+        """Bytes written past the committed row count are discarded on load."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PassengerStore(tmp)
+            self._serve(HEADER + DAY_1)
+            store.refresh()
+            with open(os.path.join(tmp, "day.bin"), "ab") as f:
+                f.write(b"\x00\x01")
+
+            reloaded = PassengerStore(tmp)
+            self.assertEqual(len(reloaded), 2)
+            self.assertEqual(os.path.getsize(os.path.join(tmp, "day.bin")), 8)
+
+    def test_unwritable_data_dir_keeps_rows_in_memory(self):
+        """Files that cannot be written leave an in-memory store instead of failing."""
+        with tempfile.TemporaryDirectory() as tmp:
+            blocker = os.path.join(tmp, "file")
+            with open(blocker, "w", encoding="utf-8"):
+                pass
+            store = PassengerStore(os.path.join(blocker, "store"))
+            self._serve(HEADER + DAY_1)
+            with self.assertLogs(passenger_store.__name__, "WARNING"):
+                self.assertEqual(store.refresh(), 2)
+            self.assertIsNone(store.path)
+            self._serve(HEADER + DAY_1 + DAY_2)
+            self.assertEqual(store.refresh(force=True), 2)
+            self.assertEqual(len(store.query()), 4)
+
+            with patch.dict(os.environ, {"HK_TRANSPORT_DATA_DIR": blocker}), patch.object(
+                passenger_store, "_store", None
+            ):
+                self.assertIsNone(passenger_store.get_store().path)
+
+    def test_reader_follows_writer(self):
+        """A reader store picks up committed rows without fetching or writing files."""
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = PassengerStore(tmp)
+            self._serve(HEADER + DAY_1)
+            writer.refresh()
+            reader = PassengerStore(tmp, reader=True)
+            self.assertEqual(len(reader), 2)
+
+            self._serve(HEADER + DAY_1 + DAY_2)
+            writer.refresh(force=True)
+            with open(os.path.join(tmp, "day.bin"), "ab") as f:
+                f.write(b"\x00\x01")
+            with patch.object(http_cache._session, "get") as mock_get:
+                self.assertEqual(reader.refresh(), 2)
+                self.assertEqual(reader.refresh(force=True), 0)
+            mock_get.assert_not_called()
+            self.assertEqual(reader.query(), writer.query())
+            self.assertEqual(reader.refreshed_at, writer.refreshed_at)
+            self.assertEqual(os.path.getsize(os.path.join(tmp, "day.bin")), 18)
+
+    def test_rollups_follow_refreshes(self):
+        """Materialized rollups take in appended rows, on the writer and a reader alike."""
+        group_by = ["day", "control_point", "direction"]
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = PassengerStore(tmp)
+            self._serve(HEADER + DAY_1)
+            writer.refresh()
+            reader = PassengerStore(tmp, reader=True)
+            self.assertEqual(len(writer.rollup("year")), 1)
+            self.assertEqual(len(reader.rollup("year")), 1)
+
+            self._serve(HEADER + DAY_1 + DAY_2)
+            writer.refresh(force=True)
+            reader.refresh()
+            for store in (writer, reader):
+                self.assertEqual(
+                    sorted(store.rollup("day", count=2, group_by=group_by), key=str),
+                    sorted(store.aggregate(group_by=group_by), key=str),
+                )
+                self.assertEqual(store.rollup("month"), store.aggregate(group_by=["month"]))
+
+    def test_aggregate_matches_row_sums(self):
+        """Aggregates tiled from the rollups equal sums over the rows in the range."""
+        first = parse_date("20-12-2020")
+        lines = [HEADER]
+        for offset in range(420):
+            if offset % 9 == 4:
+                continue  # Leave gaps, so day counts differ from calendar days
+            day = format_date(first + offset)
+            for code, (control_point, direction) in enumerate(
+                [("Airport", "Arrival"), ("Airport", "Departure"), ("Lo Wu", "Arrival")]
+            ):
+                hk, mainland = offset + code, 2 * offset % 7
+                total = hk + mainland + 1
+                lines.append(f"{day},{control_point},{direction},{hk},{mainland},1,{total}\n")
+        store = PassengerStore()
+        self._serve("".join(lines))
+        store.refresh()
+        rows = store.query()
+
+        ranges = [(None, None), ("29-12-2020", "02-02-2022"), ("03-03-2021", "17-03-2021")]
+        for start, end in ranges:
+            start_day = parse_date(start) if start else None
+            end_day = parse_date(end) if end else None
+            selected = [
+                r for r in rows
+                if (start_day is None or parse_date(r["date"]) >= start_day)
+                and (end_day is None or parse_date(r["date"]) <= end_day)
+            ]
+            for group_by in (
+                [], ["month"], ["week", "direction"], ["year", "control_point"], ["day"]
+            ):
+                with self.subTest(start=start, end=end, group_by=group_by):
+                    expected = {}
+                    for r in selected:
+                        day = parse_date(r["date"])
+                        key = tuple(
+                            period_label(period_start(day, g), g) if g in PERIODS else r[g]
+                            for g in group_by
+                        )
+                        sums, days = expected.setdefault(key, ({}, set()))
+                        for name in COUNT_COLUMNS:
+                            sums[name] = sums.get(name, 0) + r[name]
+                        days.add(day)
+                    groups = store.aggregate(start_day, end_day, group_by)
+                    self.assertEqual(
+                        {tuple(g[key] for key in group_by): (g["sum"], g["days"]) for g in groups},
+                        {key: (sums, len(days)) for key, (sums, days) in expected.items()},
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
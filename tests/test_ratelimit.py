@@ -0,0 +1,53 @@
+"""
+Unit tests for upstream request rate limiting.
+
+This module tests that the token bucket admits a burst immediately, spaces later
+requests by the configured rate for threads and coroutines sharing a limiter, and that
+a zero rate disables limiting.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from hkopenai.hk_transportation_mcp_server.ratelimit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Tests for RateLimiter."""
+
+    def _elapsed(self, limiter, count):
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(*(limiter.aacquire() for _ in range(count)))
+            return time.monotonic() - start
+
+        return asyncio.run(run())
+
+    def test_burst_is_immediate(self):
+        """Requests within the burst are not delayed."""
+        self.assertLess(self._elapsed(RateLimiter(100, burst=10), 10), 0.05)
+
+    def test_requests_beyond_burst_are_spaced(self):
+        """Requests beyond the burst wait for tokens at the configured rate."""
+        self.assertGreaterEqual(self._elapsed(RateLimiter(50, burst=1), 6), 0.09)
+
+    def test_zero_rate_disables_limit(self):
+        """A rate of zero never waits."""
+        self.assertLess(self._elapsed(RateLimiter(0), 1000), 0.5)
+
+    def test_threads_and_coroutines_share_tokens(self):
+        """Blocking acquires in threads draw from the same bucket as coroutines."""
+        limiter = RateLimiter(50, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+        self.assertGreaterEqual(self._elapsed(limiter, 1), 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Unit tests for request coalescing.
+
+This module tests that concurrent thread and asyncio callers sharing a key wait for one
+execution and share its result or exception, that cancelling the first caller does not
+cancel the others, and that the HTTP cache coalesces misses.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from hkopenai.hk_transportation_mcp_server.http_cache import HttpCache
+from hkopenai.hk_transportation_mcp_server.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests for SingleFlight.do and SingleFlight.ado."""
+
+    def test_threads_share_one_call(self):
+        """Concurrent threads with the same key run the function once."""
+        flight = SingleFlight()
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return "payload"
+
+        def caller():
+            barrier.wait()
+            return flight.do("key", slow)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: caller(), range(8)))
+        self.assertEqual(results, ["payload"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.coalesced, 7)
+
+    def test_thread_errors_reach_every_caller(self):
+        """Followers receive the exception raised by the in-flight call."""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("upstream down")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "key", failing)
+            started.wait()
+            follower = pool.submit(flight.do, "key", failing)
+            with self.assertRaises(ValueError):
+                leader.result()
+            with self.assertRaises(ValueError):
+                follower.result()
+
+    def test_async_callers_share_one_call(self):
+        """Concurrent coroutines with the same key await one execution."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"data": []}
+
+        async def run():
+            return await asyncio.gather(*(flight.ado("key", slow) for _ in range(20)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        """Cancelling the first caller leaves the shared call running for the others."""
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "payload"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(run()), "payload")
+        self.assertEqual(flight.coalesced, 1)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """A key is released once its call completes."""
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+        self.assertEqual(flight.do("key", lambda: 2), 2)
+        self.assertEqual(flight.coalesced, 0)
+
+    def test_http_cache_coalesces_concurrent_misses(self):
+        """Concurrent fetches of one URL trigger a single upstream request."""
+        cache = HttpCache(ttl=60)
+
+        def slow_get(*args, **kwargs):
+            time.sleep(0.05)
+            return MagicMock(status_code=200, content=b'{"a": 1}', headers={})
+
+        with patch.object(cache._session, "get", side_effect=slow_get) as mock_get:
+            with ThreadPoolExecutor(max_workers=10) as pool:
+                entries = list(pool.map(lambda _: cache.fetch("http://example/a"), range(10)))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertTrue(all(e is entries[0] for e in entries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Unit tests for on-disk snapshots of cached upstream payloads.
+
+This module tests that snapshots round-trip through the marshal format, optionally
+memory-mapped, and that missing, corrupt or outdated files are ignored.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from hkopenai.hk_transportation_mcp_server import snapshot
+from hkopenai.hk_transportation_mcp_server.snapshot import SnapshotStore
+
+URL = "http://example/data.json"
+
+
+class TestSnapshotStore(unittest.TestCase):
+    """Tests for SnapshotStore."""
+
+    def setUp(self):
+        """Use a fresh temporary directory for every test."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = SnapshotStore(tmp.name)
+
+    def _save(self):
+        self.store.save(URL, b'{"a": [1]}', '"v1"', None, 1000.0, {"json": {"a": [1]}})
+
+    def test_round_trip(self):
+        """A saved snapshot loads with its body, validators and decoded forms."""
+        self._save()
+        record = self.store.load(URL)
+        self.assertEqual(record["content"], b'{"a": [1]}')
+        self.assertEqual(record["etag"], '"v1"')
+        self.assertIsNone(record["last_modified"])
+        self.assertEqual(record["fetched_at"], 1000.0)
+        self.assertEqual(record["decoded"], {"json": {"a": [1]}})
+
+    def test_memory_mapped_load(self):
+        """Memory-mapped loading returns the same record."""
+        self._save()
+        with patch.object(snapshot, "SNAPSHOT_MMAP", True):
+            self.assertEqual(self.store.load(URL)["decoded"], {"json": {"a": [1]}})
+
+    def test_missing_corrupt_and_outdated(self):
+        """Unusable snapshot files are treated as missing."""
+        self.assertIsNone(self.store.load(URL))
+        self._save()
+        with patch.object(snapshot, "_VERSION", (0, (2, 7))):
+            self.assertIsNone(self.store.load(URL))
+        with open(self.store._file(URL), "wb") as f:
+            f.write(b"\x00garbage")
+        self.assertIsNone(self.store.load(URL))
+        with open(self.store._file(URL), "wb"):
+            pass
+        with patch.object(snapshot, "SNAPSHOT_MMAP", True):
+            self.assertIsNone(self.store.load(URL))
+
+    def test_state(self):
+        """The identity changes when the snapshot is replaced; touch() only advances its time."""
+        self.assertIsNone(self.store.state(URL))
+        self._save()
+        identity, confirmed = self.store.state(URL)
+        self.store.touch(URL)
+        touched_identity, touched = self.store.state(URL)
+        self.assertEqual(touched_identity, identity)
+        self.assertGreaterEqual(touched, confirmed)
+        self._save()
+        self.assertNotEqual(self.store.state(URL)[0], identity)
+
+    def test_unmarshallable_payload(self):
+        """Decoded forms marshal cannot store raise ValueError and leave no file behind."""
+        with self.assertRaises(ValueError):
+            self.store.save(URL, b"", None, None, 0.0, {"obj": object()})
+        self.assertEqual(os.listdir(self.store.path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit tests for the startup import profile.
+
+This module tests that the profile times nested imports with self and cumulative times,
+records phases and stays out of the way unless enabled.
+"""
+
+import importlib.machinery
+import io
+import os
+import sys
+import tempfile
+import unittest
+from hkopenai.hk_transportation_mcp_server.startup_profile import StartupProfile
+
+
+class TestStartupProfile(unittest.TestCase):
+    """Tests for StartupProfile."""
+
+    def setUp(self):
+        """Provide a temporary directory of importable modules."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        sys.path.insert(0, self.path)
+        self.addCleanup(sys.path.remove, self.path)
+
+    def _module(self, name, source):
+        with open(os.path.join(self.path, f"{name}.py"), "w", encoding="utf-8") as f:
+            f.write(source)
+        self.addCleanup(sys.modules.pop, name, None)
+
+    def test_nested_imports(self):
+        """The importing module's self time excludes the modules it imports."""
+        self._module("profiled_child", "import time\ntime.sleep(0.02)\n")
+        self._module("profiled_parent", "import profiled_child\n")
+        profile = StartupProfile(enabled=True)
+        profile.install()
+        self.addCleanup(profile.uninstall)
+
+        import profiled_parent  # pylint: disable=import-outside-toplevel,unused-import
+
+        profile.uninstall()
+        child_cumulative, child_self = profile.modules["profiled_child"]
+        parent_cumulative, parent_self = profile.modules["profiled_parent"]
+        self.assertGreaterEqual(child_cumulative, 0.02)
+        self.assertAlmostEqual(child_self, child_cumulative)
+        self.assertGreaterEqual(parent_cumulative, child_cumulative)
+        self.assertLess(parent_self, 0.02)
+        # The module sees its real loader, not the timing wrapper
+        loader = sys.modules["profiled_child"].__loader__
+        self.assertIsInstance(loader, importlib.machinery.SourceFileLoader)
+
+    def test_report(self):
+        """The report lists the phases, the total and the slowest imports, then uninstalls."""
+        self._module("profiled_module", "VALUE = 1\n")
+        profile = StartupProfile(enabled=True)
+        profile.install()
+        self.addCleanup(profile.uninstall)
+        import profiled_module  # pylint: disable=import-outside-toplevel,unused-import
+
+        profile.mark("imports")
+        profile.mark("registration")
+        stream = io.StringIO()
+        profile.report(stream)
+        report = stream.getvalue()
+        self.assertFalse(profile.installed)
+        self.assertEqual([phase for phase, _ in profile.phases], ["imports", "registration"])
+        for text in ("imports", "registration", "total", "profiled_module"):
+            self.assertIn(text, report)
+
+    def test_disabled(self):
+        """A disabled profile never touches the import system and reports nothing."""
+        profile = StartupProfile(enabled=False)
+        profile.install()
+        self.assertFalse(profile.installed)
+        profile.mark("imports")
+        stream = io.StringIO()
+        profile.report(stream)
+        self.assertEqual(stream.getvalue(), "")
+        self.assertEqual(profile.phases, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
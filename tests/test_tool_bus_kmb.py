@@ -5,10 +5,20 @@ This module tests the functionality of fetching bus route data from the KMB API,
 ensuring correct handling of language preferences and error conditions.
 """
 
+import asyncio
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import json
-from hkopenai.hk_transportation_mcp_server.tools.bus_kmb import _get_bus_kmb, register
+import requests
+from hkopenai.hk_transportation_mcp_server.http_cache import http_cache
+from hkopenai.hk_transportation_mcp_server.tools import bus_kmb
+from hkopenai.hk_transportation_mcp_server.tools.bus_kmb import (
+    _aget_bus_kmb,
+    _asearch_bus_kmb_routes,
+    _get_bus_kmb,
+    _search_bus_kmb_routes,
+    register,
+)
 
 
 class TestBusKMB(unittest.TestCase):
@@ -53,11 +63,15 @@ class TestBusKMB(unittest.TestCase):
         """
         Set up test fixtures before each test method.
 
-        This method sets up a mock for the urllib.request.urlopen function to simulate
+        This method sets up a mock for the fetch_json_data function to simulate
         API responses for bus route data.
         """
-        self.mock_fetch_json_data = patch("hkopenai_common.json_utils.fetch_json_data").start()
+        http_cache.clear()
+        self.mock_fetch_json_data = patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb.fetch_json_data"
+        ).start()
         self.mock_fetch_json_data.return_value = self.API_RESPONSE
+        patch.object(bus_kmb, "_views", None).start()
         self.addCleanup(patch.stopall)
 
     def test_get_bus_kmb_default_lang(self):
@@ -104,7 +118,12 @@ class TestBusKMB(unittest.TestCase):
         """
         Test handling of API unavailability by simulating a connection error.
         """
-        with patch("urllib.request.urlopen", side_effect=Exception("Connection error")):
+        patch.stopall()
+        with patch.object(
+            http_cache._session,
+            "get",
+            side_effect=requests.exceptions.ConnectionError("Connection error"),
+        ):
             result = _get_bus_kmb()
             self.assertTrue(isinstance(result, dict))
             result_dict = result if isinstance(result, dict) else {}
@@ -117,7 +136,10 @@ class TestBusKMB(unittest.TestCase):
         """
         Test handling of invalid JSON response from the API.
         """
-        with patch("hkopenai_common.json_utils.fetch_json_data", return_value={"error": "Invalid JSON"}):
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb.fetch_json_data",
+            return_value={"error": "Invalid JSON"},
+        ):
             result = _get_bus_kmb()
             self.assertTrue(isinstance(result, dict))
             result_dict = result if isinstance(result, dict) else {}
@@ -136,7 +158,10 @@ class TestBusKMB(unittest.TestCase):
             "generated_timestamp": "2025-06-12T21:32:34+08:00",
             "data": [],
         }
-        with patch("hkopenai_common.json_utils.fetch_json_data", return_value=empty_response):
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb.fetch_json_data",
+            return_value=empty_response,
+        ):
             result = _get_bus_kmb()
             self.assertEqual(len(result["data"]), 0)
 
@@ -150,28 +175,229 @@ class TestBusKMB(unittest.TestCase):
         register(mock_mcp)
 
         # Verify that mcp.tool was called with the correct description
-        mock_mcp.tool.assert_called_once_with(
+        mock_mcp.tool.assert_any_call(
             description="All bus routes of Kowloon Motor Bus (KMB) and Long Win Bus Services Hong Kong. Data source: Kowloon Motor Bus and Long Win Bus Services"
         )
 
-        # Get the mock that represents the decorator returned by mcp.tool
+        # Collect the functions passed to the decorator returned by mcp.tool
         mock_decorator = mock_mcp.tool.return_value
+        decorated = {
+            call.args[0].__name__: call.args[0] for call in mock_decorator.call_args_list
+        }
+        self.assertEqual(set(decorated), {"get_bus_kmb", "search_bus_kmb_routes"})
+        decorated_function = decorated["get_bus_kmb"]
+
+        # Call the decorated function and verify it awaits _aget_bus_kmb
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb._aget_bus_kmb"
+        ) as mock_get_bus_kmb:
+            asyncio.run(decorated_function(lang="en"))
+            mock_get_bus_kmb.assert_awaited_once_with("en", None, None, None, "records")
+
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb._asearch_bus_kmb_routes"
+        ) as mock_search:
+            asyncio.run(decorated["search_bus_kmb_routes"](route="1", lang="tc"))
+            mock_search.assert_awaited_once_with(
+                "1", None, None, None, None, None, "tc", "records"
+            )
 
-        # Verify that the mock decorator was called once (i.e., the function was decorated)
-        mock_decorator.assert_called_once()
+    def test_aget_bus_kmb(self):
+        """
+        Test the asynchronous variant over the pooled HTTP client.
+        """
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb.afetch_json_data",
+            return_value=self.API_RESPONSE,
+        ):
+            result = asyncio.run(_aget_bus_kmb("tc"))
+        self.assertEqual(result, _get_bus_kmb("tc"))
+
+    def test_search_routes(self):
+        """
+        Test searching routes by number, origin text and bound.
+        """
+        result = _search_bus_kmb_routes(route="1", bound="inbound")
+        self.assertEqual(result["type"], "RouteList")
+        self.assertEqual(len(result["data"]), 1)
+        self.assertEqual(result["data"][0]["origin"], "STAR FERRY")
+
+        result = _search_bus_kmb_routes(origin="竹園", lang="sc")
+        self.assertEqual(
+            result["data"],
+            [
+                {
+                    "route": "1",
+                    "bound": "outbound",
+                    "service_type": "1",
+                    "origin": "竹园邨",
+                    "destination": "尖沙咀码头",
+                }
+            ],
+        )
+        self.assertEqual(_search_bus_kmb_routes(route="2")["data"], [])
 
-        # The decorated function is the first argument of the first call to the mock_decorator
-        decorated_function = mock_decorator.call_args[0][0]
+    def test_search_invalid_bound(self):
+        """
+        Test that an unknown bound returns an error.
+        """
+        result = _search_bus_kmb_routes(route="1", bound="north")
+        self.assertEqual(result["type"], "Error")
 
-        # Verify the name of the decorated function
-        self.assertEqual(decorated_function.__name__, "get_bus_kmb")
+    def test_search_index_rebuilt_only_on_change(self):
+        """
+        Test that the index is reused until a different payload is decoded.
+        """
+        with patch.object(bus_kmb, "RouteIndex", wraps=bus_kmb.RouteIndex) as mock_index:
+            _search_bus_kmb_routes(route="1")
+            _search_bus_kmb_routes(destination="star")
+            self.assertEqual(mock_index.call_count, 1)
+            self.mock_fetch_json_data.return_value = dict(self.API_RESPONSE)
+            _search_bus_kmb_routes(route="1")
+            self.assertEqual(mock_index.call_count, 2)
 
-        # Call the decorated function and verify it calls _get_bus_kmb
+    def test_asearch_routes(self):
+        """
+        Test the asynchronous search over the pooled HTTP client.
+        """
         with patch(
-            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb._get_bus_kmb"
-        ) as mock_get_bus_kmb:
-            decorated_function(lang="en")
-            mock_get_bus_kmb.assert_called_once_with("en")
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb.afetch_json_data",
+            return_value=self.API_RESPONSE,
+        ):
+            result = asyncio.run(_asearch_bus_kmb_routes(route_prefix="1"))
+        self.assertEqual(result, _search_bus_kmb_routes(route_prefix="1"))
+
+    def test_projections_shared_until_payload_changes(self):
+        """
+        Test that each language projection is built once and reused between calls.
+        """
+        _get_bus_kmb("en")
+        projection = bus_kmb._views.projections["en"]
+        _get_bus_kmb("en")
+        _get_bus_kmb("tc")
+        self.assertIs(bus_kmb._views.projections["en"], projection)
+
+        self.mock_fetch_json_data.return_value = dict(self.API_RESPONSE)
+        _get_bus_kmb("en")
+        self.assertIsNot(bus_kmb._views.projections["en"], projection)
+
+    def test_returned_rows_do_not_alias_projections(self):
+        """
+        Test that modifying returned routes leaves later responses unchanged.
+        """
+        expected = _get_bus_kmb("en")["data"]
+        for result in (
+            _get_bus_kmb("en")["data"],
+            _get_bus_kmb("en", limit=1)["data"],
+            _get_bus_kmb(["en"])["data"]["en"],
+        ):
+            self.assertIsInstance(result, list)
+            result[0]["route"] = "X"
+        search = _search_bus_kmb_routes(route="1")["data"]
+        search[0]["origin"] = "X"
+        self.assertEqual(_get_bus_kmb("en")["data"], expected)
+        self.assertEqual(_search_bus_kmb_routes(route="1")["data"][0]["origin"], "CHUK YUEN ESTATE")
+
+    def test_multi_language_request(self):
+        """
+        Test that a list of languages returns one projection per language.
+        """
+        single = {lang: _get_bus_kmb(lang)["data"] for lang in ("en", "tc")}
+        result = _get_bus_kmb(["en", "tc", "xx", "en"])
+        self.assertEqual(result["type"], "RouteList")
+        self.assertEqual(list(result["data"]), ["en", "tc"])
+        self.assertEqual(result["data"]["en"], single["en"])
+        self.assertEqual(result["data"]["tc"], single["tc"])
+        self.assertEqual(self.mock_fetch_json_data.call_count, 3)
+
+        search = _search_bus_kmb_routes(route="1", bound="O", lang=["sc", "en"])
+        self.assertEqual(search["data"]["sc"][0]["origin"], "竹园邨")
+        self.assertEqual(search["data"]["en"][0]["origin"], "CHUK YUEN ESTATE")
+
+    def test_pagination_and_fields(self):
+        """
+        Test that limit and cursor page through the shared projection, with fields applied.
+        """
+        first = _get_bus_kmb(limit=1, fields=["route", "bound"])
+        self.assertEqual(first["data"], [{"route": "1", "bound": "outbound"}])
+        second = _get_bus_kmb(limit=1, cursor=first["next_cursor"], fields=["route", "bound"])
+        self.assertEqual(second["data"], [{"route": "1", "bound": "inbound"}])
+        self.assertNotIn("next_cursor", second)
+
+        both = _get_bus_kmb(["en", "tc"], limit=1)
+        self.assertEqual(both["data"]["tc"][0]["origin"], "竹園邨")
+        self.assertEqual(len(both["data"]["en"]), 1)
+        self.assertEqual(_get_bus_kmb(limit=5)["data"], _get_bus_kmb()["data"])
+        # Every page is cut from the projections built for the first call
+        self.assertEqual(self.mock_fetch_json_data.call_count, 5)
+
+    def test_cursor_rejected_after_route_list_changes(self):
+        """
+        Test that a cursor from an earlier route list is not resumed in a rebuilt one.
+        """
+        first = _get_bus_kmb(limit=1)
+        same = dict(self.API_RESPONSE)
+        self.mock_fetch_json_data.return_value = same
+        self.assertEqual(_get_bus_kmb(limit=1, cursor=first["next_cursor"])["type"], "RouteList")
+
+        changed = dict(self.API_RESPONSE, data=list(reversed(self.API_RESPONSE["data"])))
+        self.mock_fetch_json_data.return_value = changed
+        result = _get_bus_kmb(limit=1, cursor=first["next_cursor"])
+        self.assertEqual(result["type"], "Error")
+        self.assertTrue(result["error"].startswith("Invalid cursor"))
+
+    def test_invalid_paging_arguments(self):
+        """
+        Test that bad limits, cursors and fields return errors without fetching.
+        """
+        self.assertEqual(_get_bus_kmb(limit=0)["type"], "Error")
+        self.assertEqual(_get_bus_kmb(cursor="%%%")["error"], "Invalid cursor")
+        self.assertIn("fare", _get_bus_kmb(fields=["fare"])["error"])
+        self.mock_fetch_json_data.assert_not_called()
+
+    def test_columnar_format(self):
+        """
+        Test that the columnar format names the columns once and shares its rows.
+        """
+        result = _get_bus_kmb("tc", response_format="columnar")
+        self.assertEqual(
+            result["data"]["columns"],
+            ["route", "bound", "service_type", "origin", "destination"],
+        )
+        self.assertEqual(
+            list(result["data"]["rows"][0]), ["1", "outbound", "1", "竹園邨", "尖沙咀碼頭"]
+        )
+        again = _get_bus_kmb("tc", response_format="columnar")
+        self.assertIs(again["data"]["rows"], result["data"]["rows"])
+
+        page = _get_bus_kmb(
+            ["en", "sc"], limit=1, fields=["destination", "route"], response_format="columnar"
+        )
+        self.assertEqual(
+            page["data"]["en"],
+            {"columns": ["destination", "route"], "rows": [["STAR FERRY", "1"]]},
+        )
+        self.assertEqual(page["data"]["sc"]["rows"], [["尖沙咀码头", "1"]])
+        self.assertIn("next_cursor", page)
+
+        search = _search_bus_kmb_routes(route="1", bound="I", response_format="columnar")
+        self.assertEqual(
+            [list(row) for row in search["data"]["rows"]],
+            [["1", "inbound", "1", "STAR FERRY", "CHUK YUEN ESTATE"]],
+        )
+        self.assertEqual(_get_bus_kmb(response_format="csv")["type"], "Error")
+        self.assertEqual(_search_bus_kmb_routes(route="1", response_format="csv")["type"], "Error")
+
+    def test_warm_start_builds_views(self):
+        """
+        Test that warm_start builds the index and projections of the route list snapshot.
+        """
+        with patch.object(bus_kmb, "warm_json_data", return_value=self.API_RESPONSE):
+            bus_kmb.warm_start()
+        self.assertIs(bus_kmb._views.source, self.API_RESPONSE)
+        with patch.object(bus_kmb, "warm_json_data", return_value=None):
+            bus_kmb.warm_start()
+        self.assertIs(bus_kmb._views.source, self.API_RESPONSE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+"""
+Unit tests for the KMB ETA tools.
+
+This module tests batched concurrent ETA lookups within the per-host connection cap,
+per-lookup error handling, short-TTL caching of repeated lookups and the whole-route ETA
+tool.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import httpx
+import requests
+from hkopenai.hk_transportation_mcp_server import http_cache as http_cache_module
+from hkopenai.hk_transportation_mcp_server.http_cache import http_cache
+from hkopenai.hk_transportation_mcp_server.tools.bus_kmb_eta import (
+    EtaKey,
+    MAX_BATCH,
+    _aget_bus_kmb_eta,
+    _aget_bus_kmb_route_eta,
+    _get_bus_kmb_eta,
+    _get_bus_kmb_route_eta,
+    register,
+)
+
+
+def _eta_payload(route, stop_seq, dest_en, dest_tc, etas):
+    return {
+        "type": "ETA",
+        "version": "1.0",
+        "generated_timestamp": "2025-06-12T21:32:34+08:00",
+        "data": [
+            {
+                "co": "KMB",
+                "route": route,
+                "dir": "O",
+                "service_type": 1,
+                "seq": stop_seq,
+                "dest_en": dest_en,
+                "dest_tc": dest_tc,
+                "dest_sc": dest_tc,
+                "eta_seq": i + 1,
+                "eta": eta,
+                "rmk_en": "",
+                "rmk_tc": "",
+                "rmk_sc": "",
+                "data_timestamp": "2025-06-12T21:32:00+08:00",
+            }
+            for i, eta in enumerate(etas)
+        ],
+    }
+
+
+PAYLOADS = {
+    "/v1/transport/kmb/eta/STOP1/1A/1": _eta_payload(
+        "1A", 3, "STAR FERRY", "尖沙咀碼頭", ["2025-06-12T21:35:00+08:00"]
+    ),
+    "/v1/transport/kmb/eta/STOP2/1A/1": _eta_payload(
+        "1A", 4, "STAR FERRY", "尖沙咀碼頭", []
+    ),
+    "/v1/transport/kmb/route-eta/1A/1": _eta_payload(
+        "1A",
+        1,
+        "STAR FERRY",
+        "尖沙咀碼頭",
+        ["2025-06-12T21:35:00+08:00", "2025-06-12T21:45:00+08:00"],
+    ),
+}
+
+
+def _sync_response(url, *args, **kwargs):
+    path = url.split("data.etabus.gov.hk", 1)[1]
+    if path not in PAYLOADS:
+        return MagicMock(
+            status_code=422,
+            content=b"{}",
+            headers={},
+            raise_for_status=MagicMock(side_effect=requests.HTTPError("422")),
+        )
+    return MagicMock(status_code=200, content=json.dumps(PAYLOADS[path]).encode(), headers={})
+
+
+def _async_handler(request):
+    payload = PAYLOADS.get(request.url.path)
+    if payload is None:
+        return httpx.Response(422, json={})
+    return httpx.Response(200, json=payload)
+
+
+class TestBusKMBEta(unittest.TestCase):
+    """Tests for the batched and whole-route KMB ETA tools."""
+
+    def setUp(self):
+        http_cache.clear()
+
+    def test_batch_merges_results_in_order(self):
+        """Each lookup gets its own entry, in request order."""
+        with patch.object(http_cache._session, "get", side_effect=_sync_response):
+            result = _get_bus_kmb_eta(
+                [{"stop": "STOP2", "route": "1A"}, {"stop": "STOP1", "route": "1a"}], "tc"
+            )
+        self.assertEqual(result["type"], "ETAList")
+        self.assertEqual([item["stop"] for item in result["data"]], ["STOP2", "STOP1"])
+        self.assertEqual(result["data"][0]["etas"], [])
+        eta = result["data"][1]["etas"][0]
+        self.assertEqual(eta["destination"], "尖沙咀碼頭")
+        self.assertEqual(eta["eta"], "2025-06-12T21:35:00+08:00")
+        self.assertEqual(eta["bound"], "outbound")
+        self.assertIsNone(eta["remark"])
+
+    def test_failed_lookup_does_not_fail_batch(self):
+        """An upstream error is reported on its lookup only."""
+        with patch.object(http_cache._session, "get", side_effect=_sync_response):
+            result = _get_bus_kmb_eta(
+                [EtaKey(stop="STOP1", route="1A"), EtaKey(stop="BAD", route="1A")]
+            )
+        self.assertIn("etas", result["data"][0])
+        self.assertIn("error", result["data"][1])
+
+    def test_repeated_lookups_are_cached(self):
+        """Repeated lookups within the TTL are served without another request."""
+        with patch.object(
+            http_cache._session, "get", side_effect=_sync_response
+        ) as mock_get:
+            _get_bus_kmb_eta([{"stop": "STOP1", "route": "1A"}])
+            _get_bus_kmb_eta(
+                [{"stop": "STOP1", "route": "1A"}, {"stop": "STOP1", "route": "1A"}]
+            )
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_sync_batch_limits_connections_per_host(self):
+        """The thread pool of a sync batch never exceeds the per-host connection cap."""
+        active = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def get(url, *args, **kwargs):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.01)
+            with lock:
+                active["now"] -= 1
+            return _sync_response(url)
+
+        lookups = [{"stop": f"STOP{i}", "route": "1A"} for i in range(12)]
+        with patch.object(http_cache_module, "MAX_CONNECTIONS_PER_HOST", 2), patch.dict(
+            http_cache._sync_host_limits, clear=True
+        ), patch.object(http_cache._session, "get", side_effect=get) as mock_get:
+            result = _get_bus_kmb_eta(lookups)
+        self.assertEqual(len(result["data"]), 12)
+        self.assertEqual(mock_get.call_count, 12)
+        self.assertEqual(active["peak"], 2)
+
+    def test_invalid_batches(self):
+        """Empty, oversized and incomplete batches return an error."""
+        self.assertEqual(_get_bus_kmb_eta([])["type"], "Error")
+        too_many = [{"stop": "STOP1", "route": "1A"}] * (MAX_BATCH + 1)
+        self.assertEqual(_get_bus_kmb_eta(too_many)["type"], "Error")
+        self.assertEqual(_get_bus_kmb_eta([{"stop": "STOP1"}])["type"], "Error")
+        self.assertEqual(_get_bus_kmb_eta([{"stop": " ", "route": "1A"}])["type"], "Error")
+
+    def test_malformed_lookups_report_their_index(self):
+        """Non-object, incomplete and mistyped lookups return an error naming the lookup."""
+        valid = {"stop": "STOP1", "route": "1A"}
+        for item in ["STOP1", None, ["STOP1", "1A"], {"stop": "STOP1"}, {"stop": 1, "route": []}]:
+            with self.subTest(item=item):
+                result = _get_bus_kmb_eta([valid, item])
+                self.assertEqual(result["type"], "Error")
+                self.assertTrue(result["error"].startswith("Lookup 1 is malformed"))
+                result = asyncio.run(_aget_bus_kmb_eta([item]))
+                self.assertTrue(result["error"].startswith("Lookup 0 is malformed"))
+
+    def test_async_batch_matches_sync(self):
+        """The async batch fans out over the pooled client and returns the same result."""
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(_async_handler))
+            with patch.object(http_cache, "_get_async_client", return_value=client):
+                try:
+                    return await _aget_bus_kmb_eta(
+                        [{"stop": "STOP1", "route": "1A"}, {"stop": "STOP2", "route": "1A"}]
+                    )
+                finally:
+                    await client.aclose()
+
+        result = asyncio.run(run())
+        http_cache.clear()
+        with patch.object(http_cache._session, "get", side_effect=_sync_response):
+            expected = _get_bus_kmb_eta(
+                [{"stop": "STOP1", "route": "1A"}, {"stop": "STOP2", "route": "1A"}]
+            )
+        self.assertEqual(result, expected)
+
+    def test_route_eta(self):
+        """The whole-route tool returns every ETA of the route."""
+        with patch.object(http_cache._session, "get", side_effect=_sync_response):
+            result = _get_bus_kmb_route_eta("1a")
+        self.assertEqual(result["type"], "RouteETA")
+        self.assertEqual(result["data"]["route"], "1A")
+        self.assertEqual(len(result["data"]["etas"]), 2)
+        self.assertEqual(_get_bus_kmb_route_eta(" ")["type"], "Error")
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(_async_handler))
+            with patch.object(http_cache, "_get_async_client", return_value=client):
+                try:
+                    return await _aget_bus_kmb_route_eta("99")
+                finally:
+                    await client.aclose()
+
+        self.assertEqual(asyncio.run(run())["type"], "Error")
+
+    def test_register_tool(self):
+        """Both ETA tools are registered and delegate to their async functions."""
+        mock_mcp = MagicMock()
+        register(mock_mcp)
+        mock_decorator = mock_mcp.tool.return_value
+        decorated = {
+            call.args[0].__name__: call.args[0] for call in mock_decorator.call_args_list
+        }
+        self.assertEqual(set(decorated), {"get_bus_kmb_eta", "get_bus_kmb_route_eta"})
+
+        lookups = [EtaKey(stop="STOP1", route="1A")]
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb_eta._aget_bus_kmb_eta"
+        ) as mock_eta:
+            asyncio.run(decorated["get_bus_kmb_eta"](lookups=lookups, lang="sc"))
+            mock_eta.assert_awaited_once_with(lookups, "sc")
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb_eta._aget_bus_kmb_route_eta"
+        ) as mock_route_eta:
+            asyncio.run(decorated["get_bus_kmb_route_eta"](route="1A"))
+            mock_route_eta.assert_awaited_once_with("1A", "1", "en")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Unit tests for the KMB journey planning tool.
+
+This module tests journey search responses, stop resolution errors, upstream errors and
+that the route-stop graph is rebuilt only when the upstream lists change.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import patch, MagicMock
+from hkopenai.hk_transportation_mcp_server.tools import bus_kmb_journey
+from hkopenai.hk_transportation_mcp_server.tools.bus_kmb_journey import (
+    ROUTE_STOP_URL,
+    STOP_URL,
+    _asearch_bus_kmb_journeys,
+    _get_bus_kmb_nearest_stops,
+    _search_bus_kmb_journeys,
+    register,
+)
+from tests.test_kmb_route_graph import ROUTE_STOPS, STOPS
+
+
+class TestBusKMBJourney(unittest.TestCase):
+    """Tests for search_bus_kmb_journeys."""
+
+    PAYLOADS = {
+        ROUTE_STOP_URL: {"type": "RouteStopList", "data": ROUTE_STOPS},
+        STOP_URL: {"type": "StopList", "data": STOPS},
+    }
+
+    def setUp(self):
+        self.mock_fetch = patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb_journey.fetch_json_data",
+            side_effect=lambda url, **kwargs: self.PAYLOADS[url],
+        ).start()
+        patch.object(bus_kmb_journey, "_graph", None).start()
+        patch.object(bus_kmb_journey, "_grid", None).start()
+        self.addCleanup(patch.stopall)
+
+    def test_search(self):
+        """Direct and one-transfer journeys are described with stop names."""
+        result = _search_bus_kmb_journeys("竹園", "tsuen wan", lang="tc")
+        self.assertEqual(result["type"], "JourneyOptions")
+        data = result["data"]
+        self.assertEqual(data["origin_stops"], [{"stop": "A", "name": "竹園邨"}])
+        self.assertEqual(data["direct"], [])
+        first = data["one_transfer"][0]
+        self.assertEqual(first["stops"], 3)
+        self.assertEqual([leg["route"] for leg in first["legs"]], ["1", "2"])
+        self.assertEqual(first["legs"][0]["alight"], {"stop": "B", "name": "黃大仙"})
+        self.assertEqual(first["legs"][1]["bound"], "outbound")
+
+        direct = _search_bus_kmb_journeys("A", "D")["data"]["direct"]
+        self.assertEqual(direct[0]["route"], "1")
+        self.assertEqual(direct[0]["stops"], 3)
+
+    def test_limit(self):
+        """limit caps the number of journeys of each kind."""
+        result = _search_bus_kmb_journeys("A", "F", limit=1)
+        self.assertEqual(len(result["data"]["one_transfer"]), 1)
+
+    def test_unknown_stops(self):
+        """Unmatched origin or destination returns an error."""
+        self.assertEqual(_search_bus_kmb_journeys("nowhere", "F")["type"], "Error")
+        self.assertEqual(_search_bus_kmb_journeys("A", "nowhere")["type"], "Error")
+
+    def test_upstream_error(self):
+        """A failed bulk list fetch returns an error."""
+        self.mock_fetch.side_effect = lambda url, **kwargs: {"error": "Connection error"}
+        result = _search_bus_kmb_journeys("A", "F")
+        self.assertEqual(result, {"type": "Error", "error": "Connection error"})
+
+    def test_graph_rebuilt_only_on_change(self):
+        """The graph is reused until a different payload is decoded."""
+        with patch.object(
+            bus_kmb_journey, "RouteGraph", wraps=bus_kmb_journey.RouteGraph
+        ) as mock_graph:
+            _search_bus_kmb_journeys("A", "F")
+            _search_bus_kmb_journeys("B", "D")
+            self.assertEqual(mock_graph.call_count, 1)
+            self.PAYLOADS = {**self.PAYLOADS, STOP_URL: dict(self.PAYLOADS[STOP_URL])}
+            _search_bus_kmb_journeys("A", "F")
+            self.assertEqual(mock_graph.call_count, 2)
+
+    def test_async_search(self):
+        """The async search fetches both lists over the pooled client."""
+
+        async def fake_fetch(url, **kwargs):
+            return self.PAYLOADS[url]
+
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb_journey.afetch_json_data",
+            side_effect=fake_fetch,
+        ):
+            result = asyncio.run(_asearch_bus_kmb_journeys("A", "F"))
+        self.assertEqual(result, _search_bus_kmb_journeys("A", "F"))
+
+    def test_nearest_stops(self):
+        """Nearest stops are returned with distance and serving routes."""
+        result = _get_bus_kmb_nearest_stops(22.301, 114.101, k=2, lang="tc")
+        self.assertEqual(result["type"], "NearbyStops")
+        self.assertEqual([stop["stop"] for stop in result["data"]], ["B", "C"])
+        nearest = result["data"][0]
+        self.assertEqual(nearest["name"], "黃大仙")
+        self.assertLess(nearest["distance_m"], 200)
+        self.assertEqual(
+            [(r["route"], r["bound"]) for r in nearest["routes"]],
+            [("1", "inbound"), ("1", "outbound"), ("2", "outbound")],
+        )
+
+        self.assertEqual(
+            _get_bus_kmb_nearest_stops(22.5, 114.5, max_distance=500)["data"], []
+        )
+        self.assertEqual(_get_bus_kmb_nearest_stops(91, 114.1)["type"], "Error")
+
+    def test_stop_grid_rebuilt_only_on_change(self):
+        """The stop grid is rebuilt only when the stop list changes."""
+        with patch.object(
+            bus_kmb_journey, "StopGrid", wraps=bus_kmb_journey.StopGrid
+        ) as mock_grid:
+            _get_bus_kmb_nearest_stops(22.3, 114.1)
+            self.PAYLOADS = {
+                **self.PAYLOADS,
+                ROUTE_STOP_URL: dict(self.PAYLOADS[ROUTE_STOP_URL]),
+            }
+            _get_bus_kmb_nearest_stops(22.3, 114.1)
+            self.assertEqual(mock_grid.call_count, 1)
+            self.PAYLOADS = {**self.PAYLOADS, STOP_URL: dict(self.PAYLOADS[STOP_URL])}
+            _get_bus_kmb_nearest_stops(22.3, 114.1)
+            self.assertEqual(mock_grid.call_count, 2)
+
+    def test_register_tool(self):
+        """The journey and nearest stop tools are registered and delegate to async functions."""
+        mock_mcp = MagicMock()
+        register(mock_mcp)
+        mock_decorator = mock_mcp.tool.return_value
+        decorated = {
+            call.args[0].__name__: call.args[0] for call in mock_decorator.call_args_list
+        }
+        self.assertEqual(
+            set(decorated), {"search_bus_kmb_journeys", "get_bus_kmb_nearest_stops"}
+        )
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb_journey._asearch_bus_kmb_journeys"
+        ) as mock_search:
+            asyncio.run(decorated["search_bus_kmb_journeys"](origin="A", destination="F"))
+            mock_search.assert_awaited_once_with("A", "F", 5, "en")
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.bus_kmb_journey._aget_bus_kmb_nearest_stops"
+        ) as mock_nearest:
+            asyncio.run(decorated["get_bus_kmb_nearest_stops"](latitude=22.3, longitude=114.1))
+            mock_nearest.assert_awaited_once_with(22.3, 114.1, 5, None, "en")
+
+if __name__ == "__main__":
+    unittest.main()
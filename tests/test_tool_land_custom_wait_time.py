@@ -1,8 +1,17 @@
 """Tests for the Land Boundary Control Points Waiting Time tool."""
 
+import asyncio
+import time
 import unittest
 from unittest.mock import patch, MagicMock
+import requests
+from hkopenai.hk_transportation_mcp_server.http_cache import http_cache
+from hkopenai.hk_transportation_mcp_server.tools import land_custom_wait_time
 from hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time import (
+    WaitTimeHistory,
+    WaitTimesPoller,
+    _aget_land_boundary_wait_times,
+    _get_land_boundary_wait_time_history,
     _get_land_boundary_wait_times,
     register,
 )
@@ -11,11 +20,18 @@ from hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time import (
 class TestLandCustomWaitTimeTool(unittest.TestCase):
     """Tests for the land boundary control points waiting time tool."""
 
+    FETCH_TARGET = (
+        "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time.fetch_json_data"
+    )
+
+    def setUp(self):
+        """Start every test with an empty upstream cache."""
+        http_cache.clear()
+
     def test_fetch_wait_times_en_language(self):
         """Test fetching wait times with English language."""
-        with patch("requests.get") as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.return_value = {
+        with patch(self.FETCH_TARGET) as mock_get:
+            mock_get.return_value = {
                 "HYW": {"arrQueue": 0, "depQueue": 0},
                 "HZM": {"arrQueue": 1, "depQueue": 1},
                 "LMC": {"arrQueue": 2, "depQueue": 2},
@@ -25,9 +41,8 @@ class TestLandCustomWaitTimeTool(unittest.TestCase):
                 "SBC": {"arrQueue": 0, "depQueue": 0},
                 "STK": {"arrQueue": 99, "depQueue": 99},
             }
-            mock_get.return_value = mock_response
 
-            result = _fetch_wait_times("en")
+            result = _get_land_boundary_wait_times("en")
 
             self.assertTrue(isinstance(result, dict))
             self.assertEqual(result["type"], "WaitTimes")
@@ -45,15 +60,13 @@ class TestLandCustomWaitTimeTool(unittest.TestCase):
 
     def test_fetch_wait_times_tc_language(self):
         """Test fetching wait times with Traditional Chinese language."""
-        with patch("requests.get") as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.return_value = {
+        with patch(self.FETCH_TARGET) as mock_get:
+            mock_get.return_value = {
                 "HYW": {"arrQueue": 0, "depQueue": 0},
                 "HZM": {"arrQueue": 1, "depQueue": 1},
             }
-            mock_get.return_value = mock_response
 
-            result = _fetch_wait_times("tc")
+            result = _get_land_boundary_wait_times("tc")
 
             self.assertTrue(isinstance(result, dict))
             self.assertEqual(result["type"], "WaitTimes")
@@ -66,15 +79,13 @@ class TestLandCustomWaitTimeTool(unittest.TestCase):
 
     def test_fetch_wait_times_sc_language(self):
         """Test fetching wait times with Simplified Chinese language."""
-        with patch("requests.get") as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.return_value = {
+        with patch(self.FETCH_TARGET) as mock_get:
+            mock_get.return_value = {
                 "HYW": {"arrQueue": 0, "depQueue": 0},
                 "HZM": {"arrQueue": 1, "depQueue": 1},
             }
-            mock_get.return_value = mock_response
 
-            result = _fetch_wait_times("sc")
+            result = _get_land_boundary_wait_times("sc")
 
             self.assertTrue(isinstance(result, dict))
             self.assertEqual(result["type"], "WaitTimes")
@@ -87,13 +98,11 @@ class TestLandCustomWaitTimeTool(unittest.TestCase):
 
     def test_invalid_language_code(self):
         """Test handling of invalid language codes."""
-        with patch("requests.get") as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.return_value = {"HYW": {"arrQueue": 0, "depQueue": 0}}
-            mock_get.return_value = mock_response
+        with patch(self.FETCH_TARGET) as mock_get:
+            mock_get.return_value = {"HYW": {"arrQueue": 0, "depQueue": 0}}
             _ = mock_get  # Added to satisfy pylint W0612
 
-            result = _fetch_wait_times("xx")
+            result = _get_land_boundary_wait_times("xx")
 
             self.assertTrue(isinstance(result, dict))
             self.assertEqual(result["type"], "WaitTimes")
@@ -106,27 +115,26 @@ class TestLandCustomWaitTimeTool(unittest.TestCase):
 
     def test_api_unavailable(self):
         """Test behavior when the API is unavailable."""
-        with patch(
-            "requests.get", side_effect=Exception("Connection error")
-        ) as mock_get:
-            result = _fetch_wait_times("en")
+        with patch.object(
+            http_cache._session,
+            "get",
+            side_effect=requests.exceptions.ConnectionError("Connection error"),
+        ):
+            result = _get_land_boundary_wait_times("en")
             self.assertEqual(result["type"], "Error")
             self.assertTrue("Connection error" in result["error"])
 
     def test_invalid_json_response(self):
         """Test handling of invalid JSON responses from the API."""
-        with patch("requests.get") as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.side_effect = ValueError("Invalid JSON")
-            mock_get.return_value = mock_response
-
-            result = _fetch_wait_times("en")
+        mock_response = MagicMock(status_code=200, content=b"Invalid JSON", headers={})
+        with patch.object(http_cache._session, "get", return_value=mock_response):
+            result = _get_land_boundary_wait_times("en")
             self.assertEqual(result["type"], "Error")
             self.assertTrue("Invalid JSON" in result["error"])
 
     def test_empty_data_response(self):
         """Test handling of empty data responses from the API."""
-        with patch("hkopenai_common.json_utils.fetch_json_data", return_value={}):
+        with patch(self.FETCH_TARGET, return_value={}):
             result = _get_land_boundary_wait_times("en")
             self.assertEqual(result["type"], "WaitTimes")
             self.assertEqual(len(result["data"]["control_points"]), 8)
@@ -140,15 +148,141 @@ class TestLandCustomWaitTimeTool(unittest.TestCase):
         """Test the registration of the tool with MCP server."""
         mock_mcp = MagicMock()
         register(mock_mcp)
-        mock_mcp.tool.assert_called_once_with(
+        mock_mcp.tool.assert_any_call(
             description="Fetch current waiting times at land boundary control points in Hong Kong."
         )
         mock_decorator = mock_mcp.tool.return_value
-        mock_decorator.assert_called_once()
-        decorated_function = mock_decorator.call_args[0][0]
-        self.assertEqual(decorated_function.__name__, "get_land_boundary_wait_times")
+        decorated = {
+            call.args[0].__name__: call.args[0] for call in mock_decorator.call_args_list
+        }
+        self.assertEqual(
+            set(decorated),
+            {"get_land_boundary_wait_times", "get_land_boundary_wait_time_history"},
+        )
+        decorated_function = decorated["get_land_boundary_wait_times"]
         with patch(
-            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time._get_land_boundary_wait_times"
+            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time._aget_land_boundary_wait_times"
         ) as mock_fetch_wait_times:
-            decorated_function(lang="en")
-            mock_fetch_wait_times.assert_called_once_with("en")
+            asyncio.run(decorated_function(lang="en"))
+            mock_fetch_wait_times.assert_awaited_once_with("en")
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time._get_land_boundary_wait_time_history"
+        ) as mock_history:
+            asyncio.run(decorated["get_land_boundary_wait_time_history"](code="LMC"))
+            mock_history.assert_called_once_with("LMC", 6, None)
+
+    def test_aget_wait_times(self):
+        """Test the asynchronous variant over the pooled HTTP client."""
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time.afetch_json_data",
+            return_value={"LMC": {"arrQueue": 2, "depQueue": 1}},
+        ):
+            result = asyncio.run(_aget_land_boundary_wait_times("en"))
+        lmc = next(cp for cp in result["data"]["control_points"] if cp["code"] == "LMC")
+        self.assertEqual(lmc["arrival"], "Very Busy (Generally 30 mins or above)")
+        self.assertEqual(lmc["departure"], "Busy (Generally less than 30 mins)")
+
+    def test_on_demand_fetch_bounds_staleness(self):
+        """On-demand fetches only serve the queue feed stale for a short window."""
+        with patch(self.FETCH_TARGET, return_value={}) as mock_fetch:
+            _get_land_boundary_wait_times("en")
+        self.assertEqual(
+            mock_fetch.call_args.kwargs["max_stale"], land_custom_wait_time.WAIT_TIMES_MAX_STALE
+        )
+
+    def test_poller_snapshot_serves_all_languages(self):
+        """A polled snapshot answers every language without another fetch."""
+        poller = WaitTimesPoller(interval=60)
+        with patch(self.FETCH_TARGET, return_value={"HYW": {"arrQueue": 1, "depQueue": 0}}):
+            self.assertEqual(poller.poll_once(), 60)
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time.poller",
+            poller,
+        ), patch(self.FETCH_TARGET) as mock_fetch:
+            for lang in ("en", "tc", "sc"):
+                result = _get_land_boundary_wait_times(lang)
+                self.assertEqual(result["data"]["language"], lang.upper())
+                self.assertIn("snapshot_age_seconds", result["data"])
+            result = asyncio.run(_aget_land_boundary_wait_times("xx"))
+            mock_fetch.assert_not_called()
+        hyw = next(cp for cp in result["data"]["control_points"] if cp["code"] == "HYW")
+        self.assertEqual(hyw["arrival"], "Busy (Generally less than 30 mins)")
+
+    def test_poller_backs_off_on_failure(self):
+        """Consecutive failures grow the delay up to the maximum and keep the old snapshot."""
+        poller = WaitTimesPoller(interval=10, max_backoff=35)
+        with patch(self.FETCH_TARGET, return_value={"HYW": {"arrQueue": 0, "depQueue": 0}}):
+            poller.poll_once()
+        snapshot = poller.snapshot
+        with patch(self.FETCH_TARGET, return_value={"error": "Connection error"}):
+            delays = [poller.poll_once() for _ in range(3)]
+        self.assertEqual(delays, [20, 35, 35])
+        self.assertIs(poller.snapshot, snapshot)
+        with patch(self.FETCH_TARGET, return_value={}):
+            self.assertEqual(poller.poll_once(), 10)
+        self.assertEqual(poller.failures, 0)
+
+    def test_poller_backoff_stays_capped(self):
+        """A very long outage keeps the delay at the maximum instead of overflowing."""
+        poller = WaitTimesPoller(interval=30, max_backoff=900)
+        poller.failures = 1100
+        with patch(self.FETCH_TARGET, return_value={"error": "Connection error"}):
+            self.assertEqual(poller.poll_once(), 900)
+        self.assertEqual(poller.failures, 1101)
+
+    def test_poller_thread_survives_exceptions(self):
+        """An unexpected error in a poll is logged and backed off, not fatal to the thread."""
+        poller = WaitTimesPoller(interval=0.01, max_backoff=0.01)
+        responses = [RuntimeError("boom"), {}]
+        with patch(self.FETCH_TARGET, side_effect=responses), self.assertLogs(
+            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time", "ERROR"
+        ):
+            poller.start()
+            for _ in range(100):
+                if poller.snapshot is not None:
+                    break
+                time.sleep(0.01)
+            poller.stop(timeout=1)
+        self.assertIsNotNone(poller.snapshot)
+        self.assertEqual(poller.failures, 0)
+
+    def test_poller_thread_start_stop(self):
+        """The poller thread populates a snapshot and stops cleanly."""
+        poller = WaitTimesPoller(interval=60)
+        with patch(self.FETCH_TARGET, return_value={}):
+            poller.start()
+            for _ in range(100):
+                if poller.snapshot is not None:
+                    break
+                time.sleep(0.01)
+            poller.stop(timeout=1)
+        self.assertIsNotNone(poller.snapshot)
+        self.assertFalse(poller.running)
+
+    def test_history_tool_reads_recorded_samples(self):
+        """The history tool answers from the ring buffer filled by fetches."""
+        history = WaitTimeHistory(["LMC", "LWS"], capacity=10)
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time.history",
+            history,
+        ), patch(
+            self.FETCH_TARGET, return_value={"LMC": {"arrQueue": 2, "depQueue": 0}}
+        ) as mock_fetch:
+            _get_land_boundary_wait_times("en")
+            raw = _get_land_boundary_wait_time_history("LMC", hours=1)
+            bucketed = _get_land_boundary_wait_time_history("LMC", hours=1, bucket_minutes=60)
+            self.assertEqual(mock_fetch.call_count, 1)
+
+        self.assertEqual(raw["type"], "WaitTimeHistory")
+        self.assertEqual(len(raw["data"]["samples"]), 1)
+        self.assertEqual(
+            raw["data"]["samples"][0]["arrival"], "Very Busy (Generally 30 mins or above)"
+        )
+        bucket = bucketed["data"]["buckets"][0]
+        self.assertEqual(bucket["samples"], 1)
+        self.assertEqual(bucket["departure"]["mean_level"], 0)
+
+    def test_history_tool_rejects_unknown_code(self):
+        """Unknown control point codes return an error."""
+        result = _get_land_boundary_wait_time_history("XXX")
+        self.assertEqual(result["type"], "Error")
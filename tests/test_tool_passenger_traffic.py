@@ -5,10 +5,20 @@ This module tests the functionality of fetching passenger traffic data from the
 ensuring correct handling of date filters and error conditions.
 """
 
+import asyncio
+import time
 import unittest
 from datetime import datetime
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch, MagicMock
+import requests
+from hkopenai.hk_transportation_mcp_server.http_cache import http_cache
+from hkopenai.hk_transportation_mcp_server.tools import passenger_store, passenger_traffic
+from hkopenai.hk_transportation_mcp_server.tools.passenger_store import PassengerStore
 from hkopenai.hk_transportation_mcp_server.tools.passenger_traffic import (
+    _aggregate_passenger_stats,
+    _aget_passenger_rollups,
+    _aget_passenger_stats,
+    _get_passenger_rollups,
     _get_passenger_stats,
     register,
 )
@@ -48,26 +58,34 @@ class TestPassengerTraffic(unittest.TestCase):
         This method sets up mocks for the urllib.request.urlopen function and the get_current_date
         function to simulate API responses and control the date used in tests.
         """
+        http_cache.clear()
+        patch(
+            "hkopenai.hk_transportation_mcp_server.tools.passenger_store._store",
+            PassengerStore(),
+        ).start()
         self.mock_datetime_now = patch(
             "hkopenai.hk_transportation_mcp_server.tools.passenger_traffic.datetime"
         ).start()
-        self.mock_datetime_now.return_value = datetime(
+        self.mock_datetime_now.now.return_value = datetime(
             2021, 1, 8
         )  # Matches latest date in test data
+        self.mock_datetime_now.strptime.side_effect = datetime.strptime
 
         self.addCleanup(patch.stopall)
 
-    @patch("hkopenai_common.csv_utils.fetch_csv_from_url")
-    def test_get_passenger_stats_default_lang(self, mock_fetch_csv_from_url):
+    def _mock_upstream(self, csv_text):
+        """Patch the shared HTTP session to serve csv_text as the upstream CSV."""
+        response = MagicMock(
+            status_code=200, content=csv_text.encode("utf-8"), headers={}
+        )
+        return patch.object(http_cache._session, "get", return_value=response)
+
+    def test_get_passenger_stats_default_lang(self):
         """
         Test fetching passenger traffic data with default parameters (last 7 days).
-
-        Args:
-            mock_fetch_csv_from_url: Mock object for the fetch_csv_from_url function to simulate API responses.
         """
-        mock_fetch_csv_from_url.return_value = [dict(zip(self.CSV_DATA.splitlines()[0].split(','), row.split(','))) for row in self.CSV_DATA.splitlines()[1:]]
-
-        result = _get_passenger_stats()
+        with self._mock_upstream(self.CSV_DATA):
+            result = _get_passenger_stats()
 
         # Should return last 7 days by default
         self.assertEqual(len(result["data"]), 14)  # 7 days * 2 directions
@@ -88,10 +106,7 @@ class TestPassengerTraffic(unittest.TestCase):
         """
         Test fetching passenger traffic data with a specified start date.
         """
-        with patch(
-            "urllib.request.urlopen",
-            return_value=mock_open(read_data=self.CSV_DATA.encode("utf-8"))(),
-        ):
+        with self._mock_upstream(self.CSV_DATA):
             result = _get_passenger_stats(start_date="03-01-2021")
             self.assertEqual(len(result["data"]), 12)  # 6 days * 2 directions
             self.assertEqual(result["data"][0]["date"], "08-01-2021")
@@ -100,10 +115,7 @@ class TestPassengerTraffic(unittest.TestCase):
         """
         Test fetching passenger traffic data with a specified end date.
         """
-        with patch(
-            "urllib.request.urlopen",
-            return_value=mock_open(read_data=self.CSV_DATA.encode("utf-8"))(),
-        ):
+        with self._mock_upstream(self.CSV_DATA):
             result = _get_passenger_stats(end_date="03-01-2021")
             self.assertEqual(len(result["data"]), 6)  # 3 days * 2 directions
             self.assertEqual(result["data"][-1]["date"], "01-01-2021")
@@ -112,10 +124,7 @@ class TestPassengerTraffic(unittest.TestCase):
         """
         Test fetching passenger traffic data with both start and end date filters.
         """
-        with patch(
-            "urllib.request.urlopen",
-            return_value=mock_open(read_data=self.CSV_DATA.encode("utf-8"))(),
-        ):
+        with self._mock_upstream(self.CSV_DATA):
             result = _get_passenger_stats(
                 start_date="02-01-2021",
                 end_date="04-01-2021",
@@ -128,10 +137,7 @@ class TestPassengerTraffic(unittest.TestCase):
         """
         Test handling of invalid date format in start and end date parameters.
         """
-        with patch(
-            "urllib.request.urlopen",
-            return_value=mock_open(read_data=self.CSV_DATA.encode("utf-8"))(),
-        ):
+        with self._mock_upstream(self.CSV_DATA):
             result_start = _get_passenger_stats(start_date="2021-01-02")  # Wrong format
             self.assertTrue(isinstance(result_start, dict))
             result_start_dict = result_start if isinstance(result_start, dict) else {}
@@ -158,20 +164,21 @@ class TestPassengerTraffic(unittest.TestCase):
         """
         Test handling of date filters that are out of the available data range.
         """
-        with patch(
-            "urllib.request.urlopen",
-            return_value=mock_open(read_data=self.CSV_DATA.encode("utf-8"))(),
-        ):
+        with self._mock_upstream(self.CSV_DATA):
             result = _get_passenger_stats(start_date="01-01-2020")  # Before data range
             self.assertEqual(len(result["data"]), 16)  # Should return all data
-            result = _get_passenger_stats(end_date="01-01-2022")  # After data range
+            result = _get_passenger_stats(start_date="01-01-2022")  # After data range
             self.assertEqual(len(result["data"]), 0)  # No data can be return
 
     def test_data_source_unavailable(self):
         """
         Test handling of API unavailability by simulating a connection error.
         """
-        with patch("hkopenai_common.csv_utils.fetch_csv_from_url", return_value={"error": "Connection error"}):
+        with patch.object(
+            http_cache._session,
+            "get",
+            side_effect=requests.exceptions.ConnectionError("Connection error"),
+        ):
             result = _get_passenger_stats()
             self.assertTrue(isinstance(result, dict))
             result_dict = result if isinstance(result, dict) else {}
@@ -187,7 +194,7 @@ class TestPassengerTraffic(unittest.TestCase):
         malformed_data = """\ufeffDate,Control Point,Arrival / Departure,Hong Kong Residents,Mainland Visitors,Other Visitors,Total
 01-01-2021,Airport,Arrival,invalid,0,9,350
 """
-        with patch("hkopenai_common.csv_utils.fetch_csv_from_url", return_value=[dict(zip(malformed_data.splitlines()[0].split(','), row.split(','))) for row in malformed_data.splitlines()[1:]]):
+        with self._mock_upstream(malformed_data):
             result = _get_passenger_stats()
             self.assertTrue(isinstance(result, dict))
             result_dict = result if isinstance(result, dict) else {}
@@ -202,18 +209,285 @@ class TestPassengerTraffic(unittest.TestCase):
         """Test the registration of the tool with MCP server."""
         mock_mcp = MagicMock()
         register(mock_mcp)
-        mock_mcp.tool.assert_called_once_with(
+        mock_mcp.tool.assert_any_call(
             description="The statistics on daily passenger traffic provides figures concerning daily statistics on inbound and outbound passenger trips at all control points since 2021 (with breakdown by Hong Kong Residents, Mainland Visitors and Other Visitors). Return last 7 days data if no date range is specified."
         )
         mock_decorator = mock_mcp.tool.return_value
-        mock_decorator.assert_called_once()
-        decorated_function = mock_decorator.call_args[0][0]
-        self.assertEqual(decorated_function.__name__, "get_passenger_stats")
+        decorated = {
+            call.args[0].__name__: call.args[0] for call in mock_decorator.call_args_list
+        }
+        self.assertEqual(
+            set(decorated),
+            {"get_passenger_stats", "aggregate_passenger_stats", "get_passenger_rollups"},
+        )
+        decorated_function = decorated["get_passenger_stats"]
         with patch(
-            "hkopenai.hk_transportation_mcp_server.tools.passenger_traffic._get_passenger_stats"
+            "hkopenai.hk_transportation_mcp_server.tools.passenger_traffic._aget_passenger_stats"
         ) as mock_get_passenger_stats:
-            decorated_function(start_date="01-01-2023", end_date="31-01-2023")
-            mock_get_passenger_stats.assert_called_once_with("01-01-2023", "31-01-2023")
+            asyncio.run(decorated_function(start_date="01-01-2023", end_date="31-01-2023"))
+            mock_get_passenger_stats.assert_awaited_once_with(
+                "01-01-2023", "31-01-2023", None, None, None, "records", None, None
+            )
+
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.passenger_traffic._aaggregate_passenger_stats"
+        ) as mock_aggregate:
+            asyncio.run(decorated["aggregate_passenger_stats"](group_by=["month"]))
+            mock_aggregate.assert_awaited_once_with(["month"], None, None)
+
+        with patch(
+            "hkopenai.hk_transportation_mcp_server.tools.passenger_traffic._aget_passenger_rollups"
+        ) as mock_rollups:
+            asyncio.run(decorated["get_passenger_rollups"](period="week"))
+            mock_rollups.assert_awaited_once_with("week", None, 1, None)
+
+    def test_aget_passenger_stats(self):
+        """
+        Test the asynchronous variant over the pooled HTTP client.
+        """
+
+        async def afetch(url, ttl=None, max_stale=None):
+            return MagicMock(content=self.CSV_DATA.encode("utf-8"))
+
+        with patch.object(http_cache, "afetch", side_effect=afetch):
+            result = asyncio.run(_aget_passenger_stats(start_date="07-01-2021"))
+        self.assertEqual(len(result["data"]), 4)
+        self.assertEqual(result["data"][0]["date"], "08-01-2021")
+
+    def test_aggregate_by_control_point_and_month(self):
+        """
+        Test aggregating passenger traffic by control point and month.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            result = _aggregate_passenger_stats(["control_point", "month"])
+
+        self.assertEqual(result["type"], "PassengerStatsAggregate")
+        groups = result["data"]["groups"]
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]["month"], "2021-01")
+        self.assertEqual(groups[0]["control_point"], "Airport")
+        self.assertEqual(groups[0]["days"], 8)
+        self.assertEqual(groups[0]["sum"]["total"], 11333)
+        self.assertEqual(groups[0]["daily_mean"]["total"], round(11333 / 8, 2))
+
+    def test_aggregate_by_direction_with_date_range(self):
+        """
+        Test aggregating passenger traffic by direction within a date range.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            result = _aggregate_passenger_stats(
+                ["direction"], start_date="01-01-2021", end_date="02-01-2021"
+            )
+
+        groups = {g["direction"]: g for g in result["data"]["groups"]}
+        self.assertEqual(groups["Arrival"]["sum"]["total"], 733)
+        self.assertEqual(groups["Departure"]["sum"]["hk_residents"], 1743)
+        self.assertEqual(groups["Arrival"]["days"], 2)
+
+    def test_aggregate_invalid_group_by(self):
+        """
+        Test that unknown or conflicting grouping keys return an error.
+        """
+        self.assertEqual(_aggregate_passenger_stats(["airline"])["type"], "Error")
+        self.assertEqual(_aggregate_passenger_stats(["week", "month"])["type"], "Error")
+
+    def test_rollups(self):
+        """
+        Test the precomputed weekly rollups, per control point and direction, busiest first.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            result = _get_passenger_rollups("week", periods=2, group_by=["direction"])
+
+        self.assertEqual(result["type"], "PassengerRollups")
+        groups = result["data"]["groups"]
+        self.assertEqual(
+            [(g["week"], g["direction"], g["days"]) for g in groups],
+            [
+                ("2021-W01", "Departure", 5),
+                ("2021-W01", "Arrival", 5),
+                ("2020-W53", "Departure", 3),
+                ("2020-W53", "Arrival", 3),
+            ],
+        )
+        aggregate = _aggregate_passenger_stats(
+            ["direction"], start_date="04-01-2021", end_date="10-01-2021"
+        )["data"]["groups"]
+        self.assertEqual(
+            {g["direction"]: g["sum"] for g in groups[:2]},
+            {g["direction"]: g["sum"] for g in aggregate},
+        )
+
+    def test_rollups_at_date(self):
+        """
+        Test that the rollup holding a given date is returned, and nothing for empty periods.
+        """
+
+        async def afetch(url, ttl=None, max_stale=None):
+            return MagicMock(content=self.CSV_DATA.encode("utf-8"))
+
+        with patch.object(http_cache, "afetch", side_effect=afetch):
+            result = asyncio.run(_aget_passenger_rollups("day", "02-01-2021"))
+        empty = _get_passenger_rollups("year", "01-01-2020")
+        (group,) = result["data"]["groups"]
+        self.assertEqual(group["day"], "02-01-2021")
+        self.assertEqual(group["sum"]["total"], 383 + 995)
+        self.assertEqual(empty["data"]["groups"], [])
+
+    def test_rollups_invalid_arguments(self):
+        """
+        Test that invalid rollup arguments return an error.
+        """
+        for kwargs in (
+            {"period": "decade"},
+            {"periods": 0},
+            {"group_by": ["month"]},
+            {"date": "2021-01-01"},
+        ):
+            with self.subTest(**kwargs):
+                self.assertEqual(_get_passenger_rollups(**kwargs)["type"], "Error")
+
+    def test_overdue_store_served_stale(self):
+        """
+        Test that a populated store past its refresh interval answers at once, flagged stale.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            _get_passenger_stats()
+        store = passenger_store._store
+        store.refreshed_at -= passenger_store.REFRESH_INTERVAL + 60
+        with patch.object(store, "refresh_in_background") as mock_refresh:
+            result = _get_passenger_stats()
+        mock_refresh.assert_called_once_with()
+        self.assertEqual(len(result["data"]), 14)
+        self.assertTrue(result["stale"])
+        self.assertGreaterEqual(result["data_age_seconds"], passenger_store.REFRESH_INTERVAL)
+
+    def test_pagination(self):
+        """
+        Test that limit and cursor walk the listing in pages without refetching upstream.
+        """
+        with self._mock_upstream(self.CSV_DATA) as mock_get:
+            full = _get_passenger_stats("01-01-2021", "08-01-2021")["data"]
+            pages = []
+            cursor = None
+            while True:
+                result = _get_passenger_stats("01-01-2021", "08-01-2021", limit=3, cursor=cursor)
+                pages.extend(result["data"])
+                self.assertLessEqual(len(result["data"]), 3)
+                cursor = result.get("next_cursor")
+                if cursor is None:
+                    break
+        self.assertEqual(pages, full)
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_pagination_stable_across_refresh(self):
+        """
+        Test that rows appended by a refresh between pages do not shift later pages.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            first = _get_passenger_stats("01-01-2021", "31-01-2021", limit=4)
+        with self._mock_upstream(
+            self.CSV_DATA + "09-01-2021,Airport,Arrival,1,1,1,3\n"
+        ):
+            passenger_store._store.refresh(force=True)
+            second = _get_passenger_stats(
+                "01-01-2021", "31-01-2021", limit=4, cursor=first["next_cursor"]
+            )
+        self.assertEqual(first["data"][0]["date"], "08-01-2021")
+        self.assertEqual(second["data"][0]["date"], "06-01-2021")
+
+    def test_control_point_and_direction_filters(self):
+        """
+        Test that filtered pages hold only matching rows and page through them alone.
+        """
+        csv_text = (
+            self.CSV_DATA
+            + "08-01-2021,Lo Wu,Arrival,1,2,3,6\n08-01-2021,Lo Wu,Departure,4,5,6,15\n"
+        )
+        with self._mock_upstream(csv_text):
+            full = _get_passenger_stats("01-01-2021", "08-01-2021", direction="departure")
+            pages = []
+            cursor = None
+            while True:
+                result = _get_passenger_stats(
+                    "01-01-2021",
+                    "08-01-2021",
+                    limit=3,
+                    cursor=cursor,
+                    control_point="airport",
+                    direction="Departure",
+                )
+                pages.extend(result["data"])
+                cursor = result.get("next_cursor")
+                if cursor is None:
+                    break
+            lo_wu = _get_passenger_stats(control_point="Lo Wu", response_format="columnar")
+            unknown = _get_passenger_stats(control_point="Heathrow")
+            invalid = _get_passenger_stats(direction="sideways")
+        self.assertEqual(len(full["data"]), 9)
+        self.assertEqual({row["direction"] for row in full["data"]}, {"Departure"})
+        self.assertEqual(pages, [row for row in full["data"] if row["control_point"] == "Airport"])
+        self.assertEqual(len(pages), 8)
+        self.assertEqual(
+            [row[:3] for row in lo_wu["data"]["rows"]],
+            [["08-01-2021", "Lo Wu", "Arrival"], ["08-01-2021", "Lo Wu", "Departure"]],
+        )
+        self.assertEqual(unknown["data"], [])
+        self.assertIn("Arrival or Departure", invalid["error"])
+
+    def test_fields_projection(self):
+        """
+        Test that fields limits each row to the requested keys, in the requested order.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            result = _get_passenger_stats(fields=["total", "date"], limit=2)
+        self.assertEqual(
+            result["data"], [{"total": 684, "date": "08-01-2021"}, {"total": 940, "date": "08-01-2021"}]
+        )
+        self.assertIn("next_cursor", result)
+
+    def test_invalid_paging_arguments(self):
+        """
+        Test that bad limits, cursors and fields return errors without fetching.
+        """
+        with self._mock_upstream(self.CSV_DATA) as mock_get:
+            self.assertIn("limit", _get_passenger_stats(limit=0)["error"])
+            self.assertEqual(_get_passenger_stats(cursor="nope!")["error"], "Invalid cursor")
+            self.assertIn("airline", _get_passenger_stats(fields=["airline"])["error"])
+        mock_get.assert_not_called()
+
+    def test_columnar_format(self):
+        """
+        Test that the columnar format matches the records format value for value.
+        """
+        with self._mock_upstream(self.CSV_DATA):
+            records = _get_passenger_stats(limit=5)
+            columnar = _get_passenger_stats(limit=5, response_format="columnar")
+            projected = _get_passenger_stats(
+                fields=["total", "date"], limit=1, response_format="columnar"
+            )
+            invalid = _get_passenger_stats(response_format="xml")
+        columns = columnar["data"]["columns"]
+        self.assertEqual(columns[:3], ["date", "control_point", "direction"])
+        self.assertEqual(
+            [dict(zip(columns, row)) for row in columnar["data"]["rows"]], records["data"]
+        )
+        self.assertEqual(columnar["next_cursor"], records["next_cursor"])
+        self.assertEqual(
+            projected["data"], {"columns": ["total", "date"], "rows": [[684, "08-01-2021"]]}
+        )
+        self.assertIn("Invalid format", invalid["error"])
+
+    def test_warm_start_refreshes_due_store_in_background(self):
+        """
+        Test that warm_start loads the store and refreshes it in the background only when due.
+        """
+        store = passenger_store._store
+        with patch.object(store, "refresh_in_background") as mock_refresh:
+            passenger_traffic.warm_start()
+            mock_refresh.assert_called_once_with()
+            store.refreshed_at = time.time()
+            passenger_traffic.warm_start()
+            mock_refresh.assert_called_once_with()
 
 
 if __name__ == "__main__":
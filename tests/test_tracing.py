@@ -0,0 +1,148 @@
+"""
+Unit tests for the opt-in tracing and profiling of tool calls.
+
+This module tests that traced calls export their phase and upstream request spans to
+the trace file, which is rotated once large, and that slow or requested calls leave a
+profile behind.
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from hkopenai.hk_transportation_mcp_server import tracing
+from hkopenai.hk_transportation_mcp_server.metrics import phase, record_call, record_upstream
+
+
+class TracingTestCase(unittest.TestCase):
+    """Runs each test with a temporary diagnostics directory."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        patcher = mock.patch.dict(os.environ, {"HK_TRANSPORT_DIAGNOSTICS_DIR": self.path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _exported_spans(self):
+        with open(os.path.join(self.path, tracing.TRACE_FILE_NAME), encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f]
+        return [
+            [span for scope in request["resourceSpans"][0]["scopeSpans"] for span in scope["spans"]]
+            for request in requests
+        ]
+
+
+class TestTrace(TracingTestCase):
+    """Tests for Trace and its export."""
+
+    def test_spans_of_call(self):
+        """Phases and upstream requests become nested spans of one exported trace."""
+        with record_call("traced_tool", tracing.Trace("traced_tool")) as record:
+            with phase("fetch", url="https://upstream.test/data"):
+                record_upstream("https://upstream.test/data", "200", 0.01, 42)
+            with phase("filter"):
+                with phase("parse"):
+                    pass
+            record.finish("ok", 10)
+
+        (spans,) = self._exported_spans()
+        by_name = {span["name"]: span for span in spans}
+        self.assertEqual(
+            set(by_name), {"tools/call traced_tool", "fetch", "GET", "filter", "parse"}
+        )
+        root = by_name["tools/call traced_tool"]
+        self.assertNotIn("parentSpanId", root)
+        self.assertEqual({span["traceId"] for span in spans}, {root["traceId"]})
+        self.assertEqual(by_name["fetch"]["parentSpanId"], root["spanId"])
+        self.assertEqual(by_name["GET"]["parentSpanId"], by_name["fetch"]["spanId"])
+        self.assertEqual(by_name["parse"]["parentSpanId"], by_name["filter"]["spanId"])
+        self.assertIn(
+            {"key": "http.status", "value": {"stringValue": "200"}},
+            by_name["GET"]["attributes"],
+        )
+        self.assertIn({"key": "response.bytes", "value": {"intValue": "10"}}, root["attributes"])
+        self.assertEqual(root["status"], {"code": tracing.STATUS_OK})
+
+    def test_trace_file_rotated(self):
+        """A trace file past MAX_TRACE_BYTES is renamed before the next export."""
+        with mock.patch.object(tracing, "MAX_TRACE_BYTES", 8):
+            tracing.export({"n": 1})
+            tracing.export({"n": 2})
+        with open(os.path.join(self.path, tracing.TRACE_FILE_NAME), encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"n":2}\n')
+        with open(os.path.join(self.path, f"{tracing.TRACE_FILE_NAME}.1"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"n":1}\n')
+
+    def test_error_status(self):
+        """A failed call is exported with an error status; later phases are dropped."""
+        with record_call("failed_tool", tracing.Trace("failed_tool")) as record:
+            record.finish("error")
+            with phase("parse"):
+                pass
+        (spans,) = self._exported_spans()
+        self.assertEqual([span["name"] for span in spans], ["tools/call failed_tool"])
+        self.assertEqual(spans[0]["status"], {"code": tracing.STATUS_ERROR})
+
+    def test_untraced_call(self):
+        """Calls without a trace write nothing."""
+        with record_call("untraced_tool") as record:
+            with phase("fetch"):
+                pass
+            record.finish("ok")
+        self.assertFalse(os.path.exists(os.path.join(self.path, tracing.TRACE_FILE_NAME)))
+
+
+class TestProfileCall(TracingTestCase):
+    """Tests for profile_call()."""
+
+    def _profiles(self):
+        return [name for name in os.listdir(self.path) if name.endswith(".prof")]
+
+    def test_disabled(self):
+        """Without a threshold or a request nothing is profiled."""
+        with tracing.profile_call("tool"):
+            pass
+        self.assertEqual(self._profiles(), [])
+
+    def test_threshold(self):
+        """Only calls at least as slow as the threshold leave a profile."""
+        with mock.patch.object(tracing, "PROFILE_THRESHOLD", 0.02):
+            with tracing.profile_call("fast_tool"):
+                pass
+            with tracing.profile_call("slow_tool"):
+                time.sleep(0.03)
+        (profile,) = self._profiles()
+        self.assertIn("-slow_tool-", profile)
+
+    def test_forced(self):
+        """A requested profile is written however fast the call, even if it fails."""
+        with self.assertRaises(ValueError):
+            with tracing.profile_call("failing_tool", forced=True):
+                raise ValueError("failed")
+        self.assertEqual(len(self._profiles()), 1)
+
+    def test_one_call_at_a_time(self):
+        """A call starting while another is profiled runs unprofiled."""
+        with tracing.profile_call("outer_tool", forced=True):
+            with tracing.profile_call("inner_tool", forced=True):
+                pass
+        (profile,) = self._profiles()
+        self.assertIn("-outer_tool-", profile)
+
+    def test_oldest_profiles_deleted(self):
+        """Only the newest MAX_PROFILES profiles are kept."""
+        with mock.patch.object(tracing, "MAX_PROFILES", 2):
+            for n in range(3):
+                with tracing.profile_call(f"tool{n}", forced=True):
+                    pass
+                time.sleep(0.01)
+        self.assertEqual(len(self._profiles()), 2)
+        self.assertFalse(any("-tool0-" in name for name in self._profiles()))
+
+
+if __name__ == "__main__":
+    unittest.main()
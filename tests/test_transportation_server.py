@@ -5,10 +5,18 @@ This module tests the server creation and tool registration functionality
 to ensure that the MCP server is properly initialized with the expected tools.
 """
 
+import importlib
+import os
+import subprocess
+import sys
 import unittest
 from unittest.mock import patch, Mock
 from hkopenai.hk_transportation_mcp_server.server import server
 
+PACKAGE = "hkopenai.hk_transportation_mcp_server"
+# The package exports the server() function under the name of its module
+server_module = importlib.import_module(f"{PACKAGE}.server")
+
 
 class TestApp(unittest.TestCase):
     """
@@ -18,16 +26,22 @@ class TestApp(unittest.TestCase):
     and that the tools are properly registered and functional.
     """
 
+    @patch("hkopenai.hk_transportation_mcp_server.server._warm_start")
     @patch("hkopenai.hk_transportation_mcp_server.server.FastMCP")
-    @patch("hkopenai.hk_transportation_mcp_server.tools.passenger_traffic")
-    @patch("hkopenai.hk_transportation_mcp_server.tools.bus_kmb")
-    @patch("hkopenai.hk_transportation_mcp_server.tools.land_custom_wait_time")
+    @patch("hkopenai.hk_transportation_mcp_server.server.passenger_traffic")
+    @patch("hkopenai.hk_transportation_mcp_server.server.bus_kmb")
+    @patch("hkopenai.hk_transportation_mcp_server.server.bus_kmb_eta")
+    @patch("hkopenai.hk_transportation_mcp_server.server.bus_kmb_journey")
+    @patch("hkopenai.hk_transportation_mcp_server.server.land_custom_wait_time")
     def test_create_mcp_server(
         self,
         mock_tool_land_custom_wait_time,
+        mock_tool_bus_kmb_journey,
+        mock_tool_bus_kmb_eta,
         mock_tool_bus_kmb,
         mock_tool_passenger_traffic,
         mock_fastmcp,
+        _mock_warm_start,
     ):
         """
         Test the creation of the MCP server and registration of tools.
@@ -38,6 +52,8 @@ class TestApp(unittest.TestCase):
 
         Args:
             mock_tool_land_custom_wait_time: Mock for the land custom wait time tool.
+            mock_tool_bus_kmb_journey: Mock for the bus KMB journey tool.
+            mock_tool_bus_kmb_eta: Mock for the bus KMB ETA tool.
             mock_tool_bus_kmb: Mock for the bus KMB tool.
             mock_tool_passenger_traffic: Mock for the passenger traffic tool.
             mock_fastmcp: Mock for the FastMCP server class.
@@ -48,15 +64,72 @@ class TestApp(unittest.TestCase):
         mock_fastmcp.return_value = mock_mcp
 
         # Test server creation
-        server("localhost", 8000, False)
+        server()
 
         # Verify server creation
         mock_fastmcp.assert_called_once()
 
         mock_tool_passenger_traffic.register.assert_called_once_with(mock_mcp)
         mock_tool_bus_kmb.register.assert_called_once_with(mock_mcp)
+        mock_tool_bus_kmb_eta.register.assert_called_once_with(mock_mcp)
+        mock_tool_bus_kmb_journey.register.assert_called_once_with(mock_mcp)
         mock_tool_land_custom_wait_time.register.assert_called_once_with(mock_mcp)
 
+    @patch("hkopenai.hk_transportation_mcp_server.server.threading")
+    @patch("hkopenai.hk_transportation_mcp_server.server.FastMCP")
+    def test_warm_start_runs_in_background(self, _mock_fastmcp, mock_threading):
+        """
+        Test that server startup hands the warm start to a daemon thread, unless disabled.
+        """
+        server()
+        mock_threading.Thread.assert_called_once_with(
+            target=server_module._warm_start, name="warm-start", daemon=True
+        )
+        mock_threading.Thread.return_value.start.assert_called_once_with()
+
+        mock_threading.reset_mock()
+        with patch("hkopenai.hk_transportation_mcp_server.server.WARM_START", False):
+            server()
+        mock_threading.Thread.assert_not_called()
+
+    @patch(f"{PACKAGE}.tools.land_custom_wait_time.warm_start")
+    @patch(f"{PACKAGE}.tools.bus_kmb.warm_start")
+    @patch(f"{PACKAGE}.tools.passenger_traffic.warm_start")
+    @patch(f"{PACKAGE}.http_cache.http_cache")
+    @patch(f"{PACKAGE}.storage.data_dir", return_value="/snapshots")
+    def test_warm_start(
+        self,
+        mock_data_dir,
+        mock_http_cache,
+        mock_passenger_traffic,
+        mock_bus_kmb,
+        mock_land,
+    ):
+        """
+        Test that the warm start enables snapshots and warms every persisted dataset.
+        """
+        server_module._warm_start()
+        mock_data_dir.assert_called_once_with("snapshots")
+        mock_http_cache.enable_snapshots.assert_called_once_with("/snapshots")
+        mock_passenger_traffic.assert_called_once_with()
+        mock_bus_kmb.assert_called_once_with()
+        mock_land.assert_called_once_with()
+
+    def test_startup_defers_tool_implementations(self):
+        """
+        Test that creating the server imports neither the tool implementations nor httpx.
+        """
+        script = (
+            f"import sys\nfrom {PACKAGE} import server\nserver()\n"
+            f"print(sorted(name for name in sys.modules if name == 'httpx' or name.startswith("
+            f"('{PACKAGE}.http_cache', '{PACKAGE}.tools.bus_kmb', '{PACKAGE}.tools.passenger'))))"
+        )
+        env = {**os.environ, "HK_TRANSPORT_WARM_START": "0"}
+        result = subprocess.run(
+            [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
 
 if __name__ == "__main__":
     unittest.main()
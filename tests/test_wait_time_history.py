@@ -0,0 +1,81 @@
+"""
+Unit tests for the land boundary wait time history buffer.
+
+This module tests ring buffer wraparound, window filtering, bucket downsampling and
+persistence of WaitTimeHistory.
+"""
+
+import os
+import tempfile
+import unittest
+from hkopenai.hk_transportation_mcp_server.tools.wait_time_history import (
+    MISSING,
+    WaitTimeHistory,
+)
+
+
+def _snapshot(arrival, departure):
+    return {"LMC": {"arrQueue": arrival, "depQueue": departure}}
+
+
+class TestWaitTimeHistory(unittest.TestCase):
+    """Tests for WaitTimeHistory."""
+
+    def test_ring_buffer_keeps_latest_samples(self):
+        """Recording past capacity overwrites the oldest samples."""
+        history = WaitTimeHistory(["LMC"], capacity=3)
+        for t in range(5):
+            history.record(float(t), _snapshot(t % 3, 0))
+        self.assertEqual(len(history), 3)
+        samples = history.samples("LMC", since=0)
+        self.assertEqual([s[0] for s in samples], [2.0, 3.0, 4.0])
+        self.assertEqual([s[1] for s in samples], [2, 0, 1])
+
+    def test_samples_window(self):
+        """Samples outside the window are excluded."""
+        history = WaitTimeHistory(["LMC"], capacity=10)
+        for t in range(6):
+            history.record(float(t), _snapshot(0, 0))
+        self.assertEqual([s[0] for s in history.samples("LMC", 2, 4)], [2.0, 3.0, 4.0])
+
+    def test_missing_and_invalid_codes(self):
+        """Absent control points and unexpected values are stored as MISSING."""
+        history = WaitTimeHistory(["LMC", "LWS"], capacity=2)
+        history.record(1.0, {"LMC": {"arrQueue": "busy", "depQueue": 1}})
+        self.assertEqual(history.samples("LMC", 0), [(1.0, MISSING, 1)])
+        self.assertEqual(history.samples("LWS", 0), [(1.0, MISSING, MISSING)])
+
+    def test_buckets(self):
+        """Buckets report sample counts, busiest and mean queue level."""
+        history = WaitTimeHistory(["LMC"], capacity=10)
+        history.record(0.0, _snapshot(0, 99))
+        history.record(30.0, _snapshot(2, 99))
+        history.record(70.0, _snapshot(1, 4))
+        buckets = history.buckets("LMC", since=0, bucket_seconds=60)
+        self.assertEqual([b["start"] for b in buckets], [0, 60])
+        self.assertEqual(buckets[0]["samples"], 2)
+        self.assertEqual(buckets[0]["arrival"], {"busiest": 2, "mean_level": 1.0, "last": 2})
+        self.assertEqual(
+            buckets[0]["departure"], {"busiest": None, "mean_level": None, "last": 99}
+        )
+        self.assertEqual(buckets[1]["arrival"]["busiest"], 1)
+
+    def test_persistence_round_trip(self):
+        """A persisted buffer is restored by a new instance with the same layout."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.bin")
+            history = WaitTimeHistory(["LMC"], capacity=4, path=path)
+            for t in range(6):
+                history.record(float(t), _snapshot(t % 3, 1))
+
+            restored = WaitTimeHistory(["LMC"], capacity=4, path=path)
+            self.assertEqual(restored.samples("LMC", 0), history.samples("LMC", 0))
+            restored.record(6.0, _snapshot(0, 0))
+            self.assertEqual(restored.samples("LMC", 0)[0][0], 3.0)
+
+            other = WaitTimeHistory(["LMC"], capacity=8, path=path)
+            self.assertEqual(len(other), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Unit tests for the multi-worker mode.
+
+This module tests that the refresher fetches every shared dataset ahead of its TTL and
+refreshes the passenger store only when due, that a failing refresh does not end its
+thread, and that stdio runs a single server.
+"""
+
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from hkopenai.hk_transportation_mcp_server import http_cache as http_cache_module
+from hkopenai.hk_transportation_mcp_server import workers
+from hkopenai.hk_transportation_mcp_server.tools import passenger_store
+
+
+class TestRefresher(unittest.TestCase):
+    """Tests for Refresher."""
+
+    def test_refresh_once(self):
+        """Every dataset is fetched with the TTL cut short; the store only when due."""
+        store = MagicMock(refreshed_at=time.time())
+        with patch.object(http_cache_module, "fetch_json_data") as mock_fetch, patch.object(
+            passenger_store, "get_store", return_value=store
+        ):
+            workers.Refresher().refresh_once()
+            store.refresh.assert_not_called()
+            store.refreshed_at = 0.0
+            store.refresh.side_effect = ValueError("bad row")
+            workers.Refresher().refresh_once()
+
+        store.refresh.assert_called_once_with(force=True)
+        datasets = workers.shared_datasets()
+        self.assertEqual(mock_fetch.call_count, 2 * len(datasets))
+        for (url, timeout, ttl), call in zip(datasets, mock_fetch.call_args_list):
+            self.assertEqual(call.args, (url,))
+            self.assertEqual(
+                call.kwargs,
+                {"timeout": timeout, "ttl": ttl * workers.REFRESH_AHEAD, "max_stale": 0},
+            )
+        for url, _, _ in datasets:
+            self.assertIn(url, http_cache_module.http_cache._persisted)
+
+    def test_threads(self):
+        """One thread refreshes each dataset until stopped."""
+        refresher = workers.Refresher(tick=60)
+        with patch.object(refresher, "jobs", return_value=[MagicMock(), MagicMock()]) as jobs:
+            refresher.start()
+            self.assertTrue(refresher.running)
+            refresher.stop()
+        self.assertFalse(refresher.running)
+        for job in jobs.return_value:
+            job.assert_called_once_with()
+
+    def test_thread_survives_failing_job(self):
+        """A job that raises is logged and retried instead of ending its thread."""
+        refresher = workers.Refresher(tick=0.001)
+        errors = [OSError("disk full"), RuntimeError("boom")]
+
+        def fail_twice():
+            if errors:
+                raise errors.pop(0)
+
+        job = MagicMock(side_effect=fail_twice)
+        with patch.object(refresher, "jobs", return_value=[job]), self.assertLogs(
+            workers.__name__, "ERROR"
+        ) as logs:
+            refresher.start()
+            for _ in range(200):
+                if job.call_count >= 3:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(refresher.running)
+            refresher.stop()
+        self.assertGreaterEqual(job.call_count, 3)
+        self.assertEqual(len(logs.records), 2)
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Tests for WorkerPool."""
+
+    def test_stdio_runs_one_server(self):
+        """Without an HTTP transport the pool runs the server in this process."""
+        with patch("hkopenai.hk_transportation_mcp_server.server.server") as mock_server:
+            workers.WorkerPool(4).run()
+        mock_server.return_value.run.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()